@@ -16,9 +16,13 @@ from startup.tests import test_list
 #  Display usage information in the command line.
 #  -v or --version
 #  Display Debreate version in the command line & exit
+#  -d or --direct
+#  'build' command reads files from their source locations instead of
+#  copying them into a stage directory (uses 'native' backend).
 solo_args = (
   ("h", "help"),
   ("v", "version"),
+  ("d", "direct"),
 )
 
 ## Value args
@@ -28,12 +32,28 @@ solo_args = (
 #  or equivalent numeric values of 0-4. Default is 'error' (3).
 #  -i or --log-interval
 #  Set the refresh interval, in seconds, for updating the log window.
+#  -o or --output
+#  Output directory or .deb filename used with 'build' command.
+#  -j or --jobs
+#  Number of worker threads used by 'build' command for staging files & compressing.
+#  -b or --backend
+#  Method used by 'build' command to create archive, 'dpkg' or 'native'.
+#  -Z or --compression
+#  Compression format used by 'build' command: 'gzip', 'xz', 'zstd', or 'none'.
+#  -z or --compression-level
+#  Compression level used by 'build' command: 0-9 for 'gzip' & 'xz', 1-19 for 'zstd'.
 value_args = (
   ("l", "log-level"),
   ("i", "log-interval"),
+  ("o", "output"),
+  ("j", "jobs"),
+  ("b", "backend"),
+  ("Z", "compression"),
+  ("z", "compression-level"),
 )
 
 cmds = (
+  "build",
   "clean",
   "compile",
   "test",
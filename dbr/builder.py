@@ -0,0 +1,1402 @@
+## \package dbr.builder
+#
+#  Display independent engine for building binary packages
+#
+#  Used by the build page & by the 'build' command for building
+#  packages on systems without a display server.
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+
+import gzip, hashlib, os, queue, shutil, stat, subprocess, tempfile, time, traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import util
+
+from dbr.language       import GT
+from dbr.hashcache      import GetFileSignature
+from dbr.hashcache      import HashCache
+from dbr.project        import InstalledSize
+from globals.errorcodes import dbrerrno
+from libdbr.checksum    import hashFiles
+from libdbr.debfile     import DebWriter
+from libdbr.elf         import hasSymbolTable
+from libdbr.fileio      import copyFile
+from libdbr.fileio      import makeDirs
+from libdbr.fileio      import writeFile
+from libdbr.paths       import getExecutable
+
+
+logger = util.getLogger()
+
+## Characters that should not be in filenames
+invalid_chars = (" ", "/", "\\")
+
+## Maximum number of files passed to each 'strip' command
+strip_batch_size = 64
+
+## Maximum number of files copied by each staging job
+stage_batch_size = 64
+
+## Size in bytes at which a staging job is started before batch is full
+stage_batch_bytes = 8 * 1024 * 1024
+
+## Methods used to create the .deb archive
+#
+#  'dpkg' runs 'fakeroot dpkg-deb', 'native' uses libdbr.debfile
+backends = ("dpkg", "native")
+
+## Compression formats that can be selected for the package archives
+compressors = ("gzip", "xz", "zstd", "none")
+
+## Format used by native backend when project does not set compression
+#
+#  Also passed to dpkg-deb when only a compression level is set, since
+#  dpkg-deb's default format differs between distributions.
+default_compressor = "xz"
+
+## Compression levels accepted by each format
+compression_levels = {
+  "gzip": range(0, 10),
+  "xz": range(0, 10),
+  "zstd": range(1, 20),
+  "none": range(0),
+}
+
+## Retrieves compression levels accepted by a format
+#
+#  \param compression
+#      \b \e str : Compression format or \b \e None for default format
+#  \return
+#      \b \e range of valid levels (empty if format does not use levels)
+def GetCompressionLevels(compression):
+  return compression_levels[compression or default_compressor]
+
+
+## dpkg-deb executables mapped to support for '--threads-max' option
+dpkgdeb_threads = {}
+
+
+## Checks if dpkg-deb supports the '--threads-max' option
+#
+#  \param cmd
+#      \b \e str : Path to dpkg-deb executable
+def DpkgDebHasThreads(cmd):
+  if cmd not in dpkgdeb_threads:
+    output = subprocess.run([cmd, "--help"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT).stdout
+    dpkgdeb_threads[cmd] = b"--threads-max" in output
+
+  return dpkgdeb_threads[cmd]
+
+
+## Control fields that must be defined for building
+required_fields = (
+  "Package",
+  "Version",
+  "Maintainer",
+  "Architecture",
+)
+
+
+## Checks if a file is a binary that needs stripped
+#
+#  The file's ELF section table is read directly instead of calling
+#  the 'file' command.
+#
+#  \param filename
+#      \b \e str : Path to file to check
+#  \return
+#      \b \e True if file is an ELF binary with a symbol table
+def FileUnstripped(filename):
+  return hasSymbolTable(filename)
+
+
+## Calculates hashes of files, using cached hashes of unmodified sources
+#
+#  \param file_list
+#      \b \e List of paths to files to be hashed
+#  \param algos
+#      \b \e List of hashlib algorithm names
+#  \param jobs
+#      \b \e int : Number of worker processes (0 uses number of CPU cores)
+#  \param sources
+#      \b \e dict : File paths mapped to tuples of source path & source
+#      signature from dbr.hashcache.GetFileSignature
+#  \param cache
+#      \b \e dbr.hashcache.HashCache : Cached hashes of unmodified source
+#      files are used instead of re-hashing files
+#  \return
+#      \b \e List of digest tuples in same order as \b \e file_list
+def HashFiles(file_list, algos, jobs=0, sources=None, cache=None):
+  hashes = [None] * len(file_list)
+  hash_list = []
+  uncached = []
+  for INDEX, F in enumerate(file_list):
+    source = None
+    if sources and cache != None:
+      source = sources.get(os.path.normpath(F))
+
+    if source:
+      source, signature = source
+      cached = cache.Get(source, algos, signature)
+
+      # Staged copy must match source size in case file changed during build
+      if cached and os.path.getsize(F) == signature[0]:
+        hashes[INDEX] = cached
+        continue
+
+      uncached.append((INDEX, source, signature))
+
+    hash_list.append(INDEX)
+
+  logger.debug("Hashing {} files ({} cached)".format(len(hash_list), len(file_list) - len(hash_list)))
+
+  for INDEX, H in zip(hash_list, hashFiles([file_list[I] for I in hash_list], algos, jobs)):
+    hashes[INDEX] = H
+
+  for INDEX, source, signature in uncached:
+    cache.Set(source, algos, hashes[INDEX], signature)
+
+  return hashes
+
+
+## Creates files of md5 (& optionally sha256) hashes for files within a staged directory
+#
+#  Files are hashed in-process & output is sorted by path so that
+#  package contents are reproducible.
+#
+#  \param stage_dir
+#      \b \e str : Root directory of staged package tree
+#  \param sha256
+#      \b \e bool : Also write DEBIAN/sha256sums
+#  \param jobs
+#      \b \e int : Number of worker processes (0 uses number of CPU cores)
+#  \param sources
+#      \b \e dict : Staged file paths mapped to tuples of source path &
+#      source signature from dbr.hashcache.GetFileSignature
+#  \param cache
+#      \b \e dbr.hashcache.HashCache : Cached hashes of unmodified source
+#      files are used instead of re-hashing staged copies
+#  \return
+#      \b \e True if checksum files were written
+def CreateMD5Sums(stage_dir, sha256=False, jobs=0, sources=None, cache=None):
+  file_list = []
+  for ROOT, DIRS, FILES in os.walk(stage_dir):
+    # Ignore the 'DEBIAN' directory
+    if ROOT == stage_dir and "DEBIAN" in DIRS:
+      DIRS.remove("DEBIAN")
+
+    for F in FILES:
+      F = os.path.join(ROOT, F)
+
+      # Symbolic links are not listed, same as dh_md5sums
+      if not os.path.islink(F):
+        file_list.append(F)
+
+  file_list.sort()
+
+  algos = ["md5"]
+  if sha256:
+    algos.append("sha256")
+
+  hashes = HashFiles(file_list, algos, jobs, sources, cache)
+
+  # Remove [stage_dir] from the path name so that it has a true unix path
+  # e.g., instead of "/myfolder_temp/usr/local/bin", "usr/local/bin"
+  rel_list = [os.path.relpath(F, stage_dir) for F in file_list]
+
+  for INDEX, ALGO in enumerate(algos):
+    sums = ["{}  {}".format(H[INDEX], F) for H, F in zip(hashes, rel_list)]
+
+    # NOTE: lintian ignores the last character of the file, so should end with newline character (\n)
+    writeFile("{}/DEBIAN/{}sums".format(stage_dir, ALGO), "{}\n".format("\n".join(sums)), 0o0644)
+
+  return True
+
+
+## Builds a .deb package from a dbr.project.ProjectModel instance
+class Builder:
+  ## Constructor
+  #
+  #  \param project
+  #      \b \e dbr.project.ProjectModel : Project data to be built
+  #  \param buildPath
+  #      \b \e str : Directory where .deb will be output
+  #  \param filename
+  #      \b \e str : Basename of output file without .deb extension
+  #      (defaults to <package>_<version>_<arch>)
+  #  \param onProgress
+  #      Function called as <b><i>onProgress(current, total, message)</i></b>
+  #      when build progresses. Returning \b \e False cancels the build.
+  #  \param onWarning
+  #      Function called as <b><i>onWarning(message, details)</i></b> for
+  #      errors that do not stop the build
+  #  \param jobs
+  #      \b \e int : Number of worker threads used for staging files & compressing,
+  #      & processes used for hashing (0 uses defaults)
+  #  \param hashCache
+  #      \b \e dbr.hashcache.HashCache : Checksums of previously built source
+  #      files (\b \e None uses default cache file, \b \e False disables caching)
+  #  \param backend
+  #      \b \e str : Method used to create the archive, one of \b \e backends
+  #      ('dpkg' falls back to 'native' if dpkg-deb or fakeroot is not installed)
+  def __init__(self, project, buildPath, filename=None, onProgress=None, onWarning=None, jobs=0,
+      hashCache=None, backend="dpkg"):
+    self.Project = project
+    self.BuildPath = buildPath
+    self.Filename = filename
+    self.OnProgress = onProgress
+    self.OnWarning = onWarning
+    self.Jobs = jobs
+    self.HashCache = hashCache
+    self.Backend = backend
+
+    ## Staged file paths mapped to unmodified source file & its signature
+    self.StagedSources = {}
+
+    ## Size of files added to stage directory, updated as files are written
+    self.InstalledSize = InstalledSize()
+
+    if not self.Filename:
+      self.Filename = project.GetDefaultFilename()
+
+    self.Progress = 0
+    self.Cancelled = False
+
+    ## Output from lintian if package has issues
+    self.LintianOutput = None
+
+
+  ## Retrieves the path to the output .deb package
+  def GetOutputFile(self):
+    return "{}/{}.deb".format(self.BuildPath, self.Filename)
+
+
+  ## Retrieves the temporary directory used to stage the package tree
+  def GetStageDir(self):
+    return "{}/{}__dbp__".format(self.BuildPath, self.Filename)
+
+
+  ## Converts a path in the stage directory to its install path
+  def GetInstallPath(self, filename):
+    return "/{}".format(os.path.relpath(filename, self.GetStageDir()))
+
+
+  ## Adds a staged file to the installed size
+  #
+  #  \param filename
+  #      \b \e str : Path to file in stage directory
+  #  \param size
+  #      \b \e int : Size in bytes (retrieved from file if not set)
+  def AddInstalledFile(self, filename, size=None):
+    if size == None:
+      size = os.path.getsize(filename)
+
+    self.InstalledSize.AddFile(self.GetInstallPath(filename), size)
+
+
+  ## Retrieves list of tasks that will be processed
+  #
+  #  \return
+  #      \b \e List of task string IDs
+  def GetTaskList(self):
+    project = self.Project
+
+    task_list = ["stage"]
+
+    if project.Launcher:
+      task_list.append("launcher")
+
+    if project.Files:
+      task_list.append("files")
+
+    if project.Scripts:
+      task_list.append("scripts")
+
+    if project.Changelog:
+      task_list.append("changelog")
+
+    if project.Copyright:
+      task_list.append("copyright")
+
+    for O in ("md5sums", "strip", "rmstage", "lintian"):
+      if project.HasOption(O):
+        task_list.append(O)
+
+    task_list += ["install_size", "control", "build"]
+
+    return task_list
+
+
+  ## Retrieves total number of progress steps
+  def GetTaskCount(self):
+    return len(self.GetTaskList()) + len(self.Project.Files) + len(self.Project.Scripts)
+
+
+  ## Retrieves required control fields that are not defined
+  #
+  #  \return
+  #      \b \e List of field names
+  def GetMissingFields(self):
+    return [F for F in required_fields if not self.Project.GetControlField(F)]
+
+
+  ## Retrieves menu launcher filename with invalid characters replaced
+  def GetLauncherFilename(self):
+    menu_filename = self.Project.LauncherFilename
+
+    for char in invalid_chars:
+      menu_filename = menu_filename.replace(char, "_")
+
+    return menu_filename
+
+
+  ## Updates build progress
+  #
+  #  \param message
+  #      \b \e str : Description of current task
+  #  \return
+  #      \b \e False if build was cancelled
+  def Update(self, message=None):
+    if message:
+      logger.debug("{} ({} / {})".format(message, self.Progress, self.GetTaskCount()))
+
+    if self.OnProgress and self.OnProgress(self.Progress, self.GetTaskCount(), message) == False:
+      self.Cancelled = True
+
+    return not self.Cancelled
+
+
+  ## Reports a non-fatal error
+  def Warn(self, message, details=None):
+    logger.warn(message, details)
+
+    if self.OnWarning:
+      self.OnWarning(message, details)
+
+
+  ## Builds the package
+  #
+  #  \return
+  #      \b \e tuple : Return code & path to .deb package or error details
+  def Build(self):
+    try:
+      missing = self.GetMissingFields()
+      if missing:
+        return (dbrerrno.FEMPTY, ", ".join(missing))
+
+      stage_dir = self.GetStageDir()
+      self.StagedSources = {}
+      self.InstalledSize = InstalledSize()
+
+      if os.path.isdir("{}/DEBIAN".format(stage_dir)):
+        try:
+          shutil.rmtree(stage_dir)
+
+        except OSError:
+          return (dbrerrno.EEXIST, GT("Could not free stage directory: {}").format(stage_dir))
+
+      self.Update(GT("Preparing build tree"))
+
+      # Make a fresh build tree
+      makeDirs(os.path.join(stage_dir, "DEBIAN"))
+      self.Progress += 1
+
+      steps = (
+        (self.StageFiles, "files"),
+        (self.StripFiles, "strip"),
+        (self.CreateChangelog, "changelog"),
+        (self.CreateCopyright, "copyright"),
+        (self.CreateLauncher, "launcher"),
+        (self.CreateMD5Sums, "md5sums"),
+        (self.CreateScripts, "scripts"),
+        )
+
+      task_list = self.GetTaskList()
+      for STEP, T in steps:
+        if self.Cancelled:
+          return (dbrerrno.ECNCLD, None)
+
+        if T in task_list:
+          ret_code, result = STEP()
+
+          if ret_code != dbrerrno.SUCCESS:
+            return (ret_code, result)
+
+      if self.Cancelled:
+        return (dbrerrno.ECNCLD, None)
+
+      self.CreateControl()
+
+      if self.Cancelled:
+        return (dbrerrno.ECNCLD, None)
+
+      build_status = self.Pack()
+
+      if self.Cancelled:
+        return (dbrerrno.ECNCLD, None)
+
+      if "rmstage" in task_list:
+        self.RemoveStage()
+
+      if self.Cancelled:
+        return (dbrerrno.ECNCLD, None)
+
+      if "lintian" in task_list:
+        self.CheckLintian()
+
+      self.Update()
+
+      # Build completed successfullly
+      if not build_status[0]:
+        return (dbrerrno.SUCCESS, self.GetOutputFile())
+
+      # Build failed
+      return build_status
+
+    except:
+      return (dbrerrno.EUNKNOWN, traceback.format_exc())
+
+
+  ## Copies project files into the stage directory
+  #
+  #  Target directories are created up front & file copies are spread
+  #  across a pool of \b \e self.Jobs worker threads. Symbolic links &
+  #  directory trees are handled on the calling thread, but the files
+  #  within copied directories are also passed to the pool. Installed
+  #  size is accumulated from the source sizes as copies are queued.
+  #
+  #  Copies are grouped into batches, since scheduling each small file
+  #  separately costs more than copying it. With a single worker, files
+  #  are copied on the calling thread. Progress is updated & cancelling is
+  #  checked each time a batch is submitted.
+  #
+  #  Files & directories are created with their final permissions, so
+  #  the stage tree does not need to be fixed up before packing.
+  def StageFiles(self):
+    self.Update(GT("Copying files"))
+
+    stage_dir = self.GetStageDir()
+    no_follow_link = self.Project.NoFollowLinks
+
+    # Create all target directories in bulk
+    stage_list = []
+    target_dirs = set()
+    for FILE in self.Project.Files:
+      target_file = "{}{}".format(stage_dir, FILE.GetInstallPath())
+
+      target_dirs.add(os.path.dirname(target_file))
+      stage_list.append((FILE.Source, target_file, FILE.Executable))
+
+    for D in sorted(target_dirs):
+      makeDirs(D)
+      self.InstalledSize.AddDir(self.GetInstallPath(D))
+
+    # Record source of each copy so that cached checksums can be used
+    def _addSource(f_src, f_tgt):
+      try:
+        signature = GetFileSignature(f_src)
+
+      except OSError:
+        return 0
+
+      self.StagedSources[os.path.normpath(f_tgt)] = (f_src, signature)
+      self.AddInstalledFile(f_tgt, signature[0])
+
+      return signature[0]
+
+    # Number of pending copies for each file list entry
+    pending = {}
+    # Finished jobs are passed back to calling thread
+    done_jobs = queue.SimpleQueue()
+    copy_count = 0
+    copied = 0
+
+    # Copies waiting to be submitted as (index, source, target, mode)
+    batch = []
+    batch_bytes = 0
+
+    pool = None
+    if (self.Jobs or os.cpu_count() or 1) > 1:
+      pool = ThreadPoolExecutor(self.Jobs or None)
+
+    def _copyBatch(copies):
+      for INDEX, SOURCE, TARGET, MODE in copies:
+        copyFile(SOURCE, TARGET, MODE)
+
+      return copies
+
+    # Marks copies as done & updates progress of completed entries
+    def _finish(copies):
+      nonlocal copied
+
+      for INDEX, SOURCE, TARGET, MODE in copies:
+        copied += 1
+        pending[INDEX] -= 1
+
+        if not pending[INDEX]:
+          self.Progress += 1
+
+    # Updates progress from jobs that have finished without waiting
+    def _collect():
+      while True:
+        try:
+          job = done_jobs.get_nowait()
+
+        except queue.Empty:
+          return
+
+        # Re-raise errors from worker threads
+        _finish(job.result())
+
+    def _flush():
+      nonlocal batch, batch_bytes
+
+      if batch:
+        if pool:
+          job = pool.submit(_copyBatch, batch)
+          job.add_done_callback(done_jobs.put)
+          _collect()
+
+        else:
+          _finish(_copyBatch(batch))
+
+        batch = []
+        batch_bytes = 0
+
+        # Sets self.Cancelled, which is checked while queueing
+        self.Update(GT("Copying files ({} / {})").format(copied, copy_count))
+
+    def _queue(index, f_src, f_tgt, mode=None):
+      nonlocal batch_bytes, copy_count
+
+      batch_bytes += _addSource(f_src, f_tgt)
+      batch.append((index, f_src, f_tgt, mode))
+      pending[index] += 1
+      copy_count += 1
+
+      if len(batch) >= stage_batch_size or batch_bytes >= stage_batch_bytes:
+        _flush()
+
+    # Skip formatting per-file messages if they are not shown
+    debugging = logger.debugging()
+
+    try:
+      for INDEX in range(len(stage_list)):
+        f_src, f_tgt, exe = stage_list[INDEX]
+        # Held until all copies of entry are queued
+        pending[INDEX] = 1
+
+        # FIXME: copying nested symbolic link may not work
+        if os.path.islink(f_src) and no_follow_link and os.path.exists(f_src):
+          if debugging:
+            logger.debug("Adding symbolic link to stage: {}".format(f_tgt))
+
+          link_target = os.readlink(f_src)
+          os.symlink(link_target, f_tgt)
+          self.InstalledSize.AddLink(self.GetInstallPath(f_tgt), link_target)
+
+        elif os.path.isdir(f_src):
+          if debugging:
+            logger.debug("Adding directory to stage: {}".format(f_tgt))
+
+          # Directories are created here, contents are copied by worker threads
+          # NOTE: Symbolic links within directory are followed
+          for ROOT, DIRS, FILES in os.walk(f_src, followlinks=True):
+            root_target = os.path.normpath(os.path.join(f_tgt, os.path.relpath(ROOT, f_src)))
+            makeDirs(root_target)
+            self.InstalledSize.AddDir(self.GetInstallPath(root_target))
+
+            # Mode is set from source's executable bits
+            for F in FILES:
+              _queue(INDEX, os.path.join(ROOT, F), os.path.join(root_target, F))
+
+              if self.Cancelled:
+                return (dbrerrno.ECNCLD, None)
+
+        elif os.path.isfile(f_src):
+          if debugging:
+            if exe:
+              logger.debug("Adding executable to stage: {}".format(f_tgt))
+            else:
+              logger.debug("Adding file to stage: {}".format(f_tgt))
+
+          _queue(INDEX, f_src, f_tgt, 0o0755 if exe else 0o0644)
+
+        # Entry is complete if all of its copies have finished
+        pending[INDEX] -= 1
+        if not pending[INDEX]:
+          self.Progress += 1
+
+        if self.Cancelled:
+          return (dbrerrno.ECNCLD, None)
+
+      _flush()
+
+      # Wait for workers & report aggregate progress
+      while copied < copy_count:
+        try:
+          _finish(done_jobs.get(timeout=0.1).result())
+
+        except queue.Empty:
+          pass
+
+        _collect()
+
+        if not self.Update(GT("Copying files ({} / {})").format(copied, copy_count)):
+          return (dbrerrno.ECNCLD, None)
+
+    finally:
+      if pool:
+        pool.shutdown(cancel_futures=True)
+
+    # Entire file task
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Strips debugging symbols from binaries in the stage directory
+  #
+  #  Unstripped binaries are passed to 'strip' in batches that are
+  #  processed in parallel.
+  def StripFiles(self):
+    self.Update(GT("Stripping binaries"))
+
+    CMD_strip = getExecutable("strip")
+
+    if not CMD_strip:
+      self.Warn(GT("Cannot strip binaries"), GT("\"strip\" command does not exist on system"))
+
+    else:
+      stage_dir = self.GetStageDir()
+      dir_debian = os.path.join(stage_dir, "DEBIAN")
+
+      unstripped = []
+      for ROOT, DIRS, FILES in os.walk(stage_dir):
+        # Don't check files in DEBIAN directory
+        if ROOT == dir_debian:
+          continue
+
+        for F in FILES:
+          F = os.path.join(ROOT, F)
+
+          # Symbolic links may point outside of stage directory
+          if not os.path.islink(F) and FileUnstripped(F):
+            logger.debug("Unstripped file: {}".format(F))
+
+            # Staged file no longer matches source
+            self.StagedSources.pop(os.path.normpath(F), None)
+
+            unstripped.append(F)
+
+      batches = [unstripped[I:I+strip_batch_size] for I in range(0, len(unstripped), strip_batch_size)]
+
+      def _strip(file_list):
+        return subprocess.run([CMD_strip] + file_list, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+      with ThreadPoolExecutor(self.Jobs or None) as pool:
+        for RES in pool.map(_strip, batches):
+          if RES.returncode != 0:
+            self.Warn(GT("Could not strip binaries"), RES.stdout.decode("utf-8", "replace"))
+
+      for F in unstripped:
+        self.AddInstalledFile(F)
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Retrieves the package's documentation directory in the stage directory
+  def GetDocDir(self):
+    return "{}/usr/share/doc/{}".format(self.GetStageDir(), self.Project.GetPackage())
+
+
+  ## Writes & compresses changelog file
+  def CreateChangelog(self):
+    self.Update(GT("Creating changelog"))
+
+    changelog_target, changelog_text = self.Project.Changelog
+
+    # If changelog will be installed to default directory
+    if changelog_target == "STANDARD":
+      changelog_target = self.GetDocDir()
+
+    else:
+      changelog_target = os.path.join(self.GetStageDir(), changelog_target.lstrip("/"))
+
+    makeDirs(changelog_target)
+
+    self.InstalledSize.AddDir(self.GetInstallPath(changelog_target))
+
+    changelog_file = "{}/changelog".format(changelog_target)
+    writeFile(changelog_file, changelog_text, 0o0644)
+
+    CMD_gzip = getExecutable("gzip")
+
+    if CMD_gzip:
+      self.Update(GT("Compressing changelog"))
+
+      res = subprocess.run([CMD_gzip, "-n", "--best", changelog_file],
+          stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+      if res.returncode != 0:
+        self.Warn(GT("Could not compress changelog"), res.stdout.decode("utf-8"))
+
+    if os.path.isfile(changelog_file):
+      self.AddInstalledFile(changelog_file)
+
+    else:
+      self.AddInstalledFile("{}.gz".format(changelog_file))
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Writes copyright file
+  def CreateCopyright(self):
+    self.Update(GT("Creating copyright"))
+
+    doc_dir = self.GetDocDir()
+    makeDirs(doc_dir)
+
+    writeFile("{}/copyright".format(doc_dir), self.Project.Copyright, 0o0644)
+    self.AddInstalledFile("{}/copyright".format(doc_dir))
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Writes menu launcher (.desktop) file
+  def CreateLauncher(self):
+    self.Update(GT("Creating menu launcher"))
+
+    # This might be changed later to set a custom directory
+    menu_dir = "{}/usr/share/applications".format(self.GetStageDir())
+
+    makeDirs(menu_dir)
+
+    menu_file = "{}/{}.desktop".format(menu_dir, self.GetLauncherFilename())
+    writeFile(menu_file, self.Project.Launcher, 0o0644)
+    self.AddInstalledFile(menu_file)
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Writes md5sums & sha256sums files
+  #
+  #  Good practice to create hashes before populating DEBIAN directory
+  def CreateMD5Sums(self):
+    self.Update(GT("Creating md5sums"))
+
+    if self.HashCache == None:
+      self.HashCache = HashCache()
+
+    CreateMD5Sums(self.GetStageDir(), self.Project.HasOption("sha256sums"), self.Jobs,
+        self.StagedSources, self.HashCache or None)
+
+    if self.HashCache:
+      self.HashCache.Save()
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Writes maintainer scripts
+  def CreateScripts(self):
+    self.Update(GT("Creating scripts"))
+
+    scripts = self.Project.Scripts
+    for SCRIPT in scripts:
+      script_filename = os.path.join(self.GetStageDir(), "DEBIAN", SCRIPT)
+
+      writeFile(script_filename, scripts[SCRIPT], 0o0755)
+
+      # Individual scripts
+      self.Progress += 1
+      if not self.Update():
+        return (dbrerrno.ECNCLD, None)
+
+    # Entire script task
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Retrieves installed size of staged files
+  #
+  #  Size is accumulated while files are staged, so the stage directory
+  #  does not need to be measured.
+  #
+  #  \return
+  #      \b \e int : Size in kibibytes
+  def GetInstalledSize(self):
+    return self.InstalledSize.Get()
+
+
+  ## Retrieves control file text with Installed-Size field
+  def GetControlText(self):
+    # Insert Installed-Size into control file
+    control_data = self.Project.Control.split("\n")
+    control_data.insert(2, "Installed-Size: {}".format(self.GetInstalledSize()))
+
+    # dpkg fails if there is no newline at end of file
+    control_data = "\n".join(control_data).strip("\n")
+    # Ensure there is only one empty trailing newline
+    # Two '\n' to show physical empty line, but not required
+    # Perhaps because string is not null terminated???
+    return "{}\n\n".format(control_data)
+
+
+  ## Writes control file with Installed-Size field
+  def CreateControl(self):
+    self.Update(GT("Getting installed size"))
+
+    control_data = self.GetControlText()
+
+    self.Progress += 1
+
+    if not self.Update(GT("Creating control file")):
+      return
+
+    writeFile("{}/DEBIAN/control".format(self.GetStageDir()), control_data, 0o0644)
+
+    self.Progress += 1
+
+
+  ## Creates the .deb package from the stage directory
+  #
+  #  \return
+  #      \b \e tuple : Return code & command output
+  def Pack(self):
+    if self.Backend == "native":
+      return self.PackNative()
+
+    stage_dir = self.GetStageDir()
+
+    CMD_fakeroot = getExecutable("fakeroot") or getExecutable("fakeroot-sysv")
+    CMD_dpkgdeb = getExecutable("dpkg-deb")
+
+    if not CMD_fakeroot or not CMD_dpkgdeb:
+      logger.info(GT("\"fakeroot dpkg\" not available, using built-in archive writer"))
+
+      return self.PackNative()
+
+    self.Update(GT("Running dpkg"))
+
+    cmd = [CMD_fakeroot, CMD_dpkgdeb]
+
+    compression = self.Project.Compression
+    if self.Project.CompressionLevel != None and not compression:
+      compression = default_compressor
+
+    if compression:
+      cmd.append("-Z{}".format(compression))
+
+    if self.Project.CompressionLevel != None:
+      cmd.append("-z{}".format(self.Project.CompressionLevel))
+
+    if self.Jobs and DpkgDebHasThreads(CMD_dpkgdeb):
+      cmd.append("--threads-max={}".format(self.Jobs))
+
+    start = time.monotonic()
+
+    # Run from build directory becuase dpkg seems to have problems with spaces in path
+    res = subprocess.run(cmd + ["-b", os.path.basename(stage_dir), "{}.deb".format(self.Filename)],
+        cwd=os.path.dirname(stage_dir), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    if res.returncode == 0:
+      # Size of data before compression is estimated from installed size
+      self.LogThroughput(compression or "dpkg default", time.monotonic() - start,
+          self.GetInstalledSize() * 1024, os.path.getsize(self.GetOutputFile()))
+
+    self.Progress += 1
+
+    return (res.returncode, res.stdout.decode("utf-8", "replace"))
+
+
+  ## Creates a writer for the native backend with the project's compression settings
+  #
+  #  \return
+  #      \b \e libdbr.debfile.DebWriter instance
+  def OpenDebWriter(self):
+    return DebWriter(self.GetOutputFile(), self.Project.Compression or default_compressor,
+        self.Project.CompressionLevel,
+        threads=self.Jobs)
+
+
+  ## Writes compression speed to the log
+  #
+  #  \param compression
+  #      \b \e str : Compression format
+  #  \param elapsed
+  #      \b \e float : Time spent in seconds
+  #  \param rawSize
+  #      \b \e int : Size of data before compression in bytes
+  #  \param size
+  #      \b \e int : Size of data after compression in bytes
+  def LogThroughput(self, compression, elapsed, rawSize, size):
+    mib = 1024 * 1024
+
+    logger.info(GT("Compressed {:.1f} MiB to {:.1f} MiB with {} in {:.2f}s ({:.1f} MiB/s)").format(
+        rawSize / mib, size / mib, compression, elapsed, rawSize / mib / max(elapsed, 0.001)))
+
+
+  ## Creates the .deb package from the stage directory without dpkg-deb
+  #
+  #  Files are streamed from the stage directory into the package with
+  #  root ownership, so fakeroot is not needed.
+  #
+  #  \return
+  #      \b \e tuple : Return code & error details
+  def PackNative(self):
+    self.Update(GT("Creating package"))
+
+    stage_dir = self.GetStageDir()
+    dir_debian = os.path.join(stage_dir, "DEBIAN")
+
+    control_list = []
+    for F in sorted(os.listdir(dir_debian)):
+      F = os.path.join(dir_debian, F)
+
+      with open(F, "rb") as fin:
+        control_list.append((os.path.basename(F), fin.read(), stat.S_IMODE(os.fstat(fin.fileno()).st_mode)))
+
+    try:
+      start = time.monotonic()
+
+      with self.OpenDebWriter() as deb:
+        deb.writeControl(control_list)
+        deb.openData()
+        deb.addTree(stage_dir, exclude=("DEBIAN",))
+
+    except (OSError, ValueError):
+      self.Progress += 1
+      return (dbrerrno.EUNKNOWN, traceback.format_exc())
+
+    self.LogThroughput(deb.compression, time.monotonic() - start, *deb.sizes[deb.getDataName()])
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, "")
+
+
+  ## Deletes the stage directory
+  def RemoveStage(self):
+    self.Update(GT("Removing temp directory"))
+
+    try:
+      shutil.rmtree(self.GetStageDir())
+
+    except OSError:
+      self.Warn(GT("An error occurred when trying to delete the build tree"), traceback.format_exc())
+
+    self.Progress += 1
+
+
+  ## Checks the built package for errors with lintian
+  #
+  #  If issues are found, output is written to <filename>.lintian
+  #  & stored in \b \e self.LintianOutput.
+  def CheckLintian(self):
+    self.Update(GT("Checking package for errors"))
+
+    CMD_lintian = getExecutable("lintian")
+
+    if not CMD_lintian:
+      self.Warn(GT("Cannot check package for errors"), GT("\"lintian\" command does not exist on system"))
+
+    elif os.path.isfile(self.GetOutputFile()):
+      errors = subprocess.run([CMD_lintian, self.GetOutputFile()], stdout=subprocess.PIPE,
+          stderr=subprocess.STDOUT).stdout.decode("utf-8", "replace")
+
+      if errors:
+        writeFile("{}/{}.lintian".format(self.BuildPath, self.Filename), errors)
+        self.LintianOutput = errors
+
+    self.Progress += 1
+
+
+## Builds a .deb package without a stage directory
+#
+#  File contents are streamed from their source locations directly into
+#  the package with libdbr.debfile, & generated files (control, md5sums,
+#  changelog, copyright, & menu launcher) are created in memory. Only
+#  binaries that need stripped are written to a temporary directory.
+class DirectBuilder(Builder):
+  ## Constructor
+  #
+  #  Arguments are the same as dbr.builder.Builder, except that the
+  #  native backend is always used.
+  def __init__(self, project, buildPath, filename=None, onProgress=None, onWarning=None, jobs=0,
+      hashCache=None):
+    Builder.__init__(self, project, buildPath, filename, onProgress, onWarning, jobs, hashCache,
+        backend="native")
+
+    ## Install paths mapped to tuples of entry type, value, & mode
+    #
+    #  Types are 'dir', 'file' (value is path to file on disk), 'link'
+    #  (value is link target), & 'data' (value is file contents)
+    self.Entries = {}
+
+    ## Control archive members as tuples of filename, data, & mode
+    self.ControlMembers = []
+
+    ## Directory for stripped copies of binaries
+    self.TempDir = None
+
+
+  ## Adds an entry to the package
+  #
+  #  \param path
+  #      \b \e str : Absolute install path
+  #  \param ftype
+  #      \b \e str : Entry type ('dir', 'file', 'link', or 'data')
+  #  \param value
+  #      Source path, link target, or file contents
+  #  \param mode
+  #      \b \e int : Permission bits (\b \e None uses 0755 for executable
+  #      source files, otherwise 0644)
+  #  \param size
+  #      \b \e int : Size of file in bytes
+  def AddEntry(self, path, ftype, value=None, mode=None, size=0):
+    path = os.path.normpath(path)
+    self.Entries[path] = (ftype, value, mode)
+
+    if ftype == "dir":
+      self.InstalledSize.AddDir(path)
+
+    elif ftype == "link":
+      self.InstalledSize.AddLink(path, value)
+
+    elif ftype == "data":
+      self.InstalledSize.AddFile(path, len(value))
+
+    else:
+      self.InstalledSize.AddFile(path, size)
+
+
+  ## Adds a file from disk to the package
+  def AddSourceFile(self, path, source, mode=None):
+    try:
+      signature = GetFileSignature(source)
+
+    except OSError:
+      return
+
+    self.StagedSources[os.path.normpath(source)] = (source, signature)
+    self.AddEntry(path, "file", source, mode, signature[0])
+
+
+  ## Builds the package
+  #
+  #  \return
+  #      \b \e tuple : Return code & path to .deb package or error details
+  def Build(self):
+    try:
+      missing = self.GetMissingFields()
+      if missing:
+        return (dbrerrno.FEMPTY, ", ".join(missing))
+
+      self.StagedSources = {}
+      self.InstalledSize = InstalledSize()
+      self.Entries = {}
+      self.ControlMembers = []
+
+      self.Update(GT("Preparing build"))
+      self.Progress += 1
+
+      steps = (
+        (self.StageFiles, "files"),
+        (self.StripFiles, "strip"),
+        (self.CreateChangelog, "changelog"),
+        (self.CreateCopyright, "copyright"),
+        (self.CreateLauncher, "launcher"),
+        (self.CreateMD5Sums, "md5sums"),
+        (self.CreateScripts, "scripts"),
+        )
+
+      task_list = self.GetTaskList()
+      for STEP, T in steps:
+        if self.Cancelled:
+          return (dbrerrno.ECNCLD, None)
+
+        if T in task_list:
+          ret_code, result = STEP()
+
+          if ret_code != dbrerrno.SUCCESS:
+            return (ret_code, result)
+
+      if self.Cancelled:
+        return (dbrerrno.ECNCLD, None)
+
+      self.CreateControl()
+
+      if self.Cancelled:
+        return (dbrerrno.ECNCLD, None)
+
+      build_status = self.Pack()
+
+      if self.Cancelled:
+        return (dbrerrno.ECNCLD, None)
+
+      # Nothing to remove
+      if "rmstage" in task_list:
+        self.Progress += 1
+
+      if "lintian" in task_list:
+        self.CheckLintian()
+
+      self.Update()
+
+      # Build completed successfullly
+      if not build_status[0]:
+        return (dbrerrno.SUCCESS, self.GetOutputFile())
+
+      # Build failed
+      return build_status
+
+    except:
+      return (dbrerrno.EUNKNOWN, traceback.format_exc())
+
+    finally:
+      if self.TempDir:
+        shutil.rmtree(self.TempDir, ignore_errors=True)
+        self.TempDir = None
+
+
+  ## Adds project files to the package from their source locations
+  def StageFiles(self):
+    self.Update(GT("Reading files"))
+
+    for FILE in self.Project.Files:
+      f_src = FILE.Source
+      f_tgt = FILE.GetInstallPath()
+
+      if os.path.islink(f_src) and self.Project.NoFollowLinks and os.path.exists(f_src):
+        self.AddEntry(f_tgt, "link", os.readlink(f_src))
+
+      elif os.path.isdir(f_src):
+        # NOTE: Symbolic links within directory are followed
+        for ROOT, DIRS, FILES in os.walk(f_src, followlinks=True):
+          root_target = os.path.join(f_tgt, os.path.relpath(ROOT, f_src))
+          self.AddEntry(root_target, "dir", mode=0o0755)
+
+          # Mode is set from source's executable bits
+          for F in FILES:
+            self.AddSourceFile(os.path.join(root_target, F), os.path.join(ROOT, F))
+
+      elif os.path.isfile(f_src):
+        self.AddSourceFile(f_tgt, f_src, 0o0755 if FILE.Executable else 0o0644)
+
+      # Individual files
+      self.Progress += 1
+      if not self.Update():
+        return (dbrerrno.ECNCLD, None)
+
+    # Entire file task
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Writes stripped copies of binaries to a temporary directory
+  #
+  #  Source files are not modified.
+  def StripFiles(self):
+    self.Update(GT("Stripping binaries"))
+
+    CMD_strip = getExecutable("strip")
+
+    if not CMD_strip:
+      self.Warn(GT("Cannot strip binaries"), GT("\"strip\" command does not exist on system"))
+
+    else:
+      unstripped = []
+      for PATH, (ftype, value, mode) in self.Entries.items():
+        if ftype == "file" and FileUnstripped(value):
+          logger.debug("Unstripped file: {}".format(value))
+
+          unstripped.append(PATH)
+
+      if unstripped:
+        self.TempDir = tempfile.mkdtemp(prefix=".{}-".format(self.Filename), dir=self.BuildPath)
+
+      def _strip(index):
+        path = unstripped[index]
+        target = os.path.join(self.TempDir, str(index))
+        res = subprocess.run([CMD_strip, "-o", target, self.Entries[path][1]], stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT)
+
+        return (path, target, res)
+
+      with ThreadPoolExecutor(self.Jobs or None) as pool:
+        for PATH, TARGET, RES in pool.map(_strip, range(len(unstripped))):
+          if RES.returncode != 0:
+            self.Warn(GT("Could not strip binaries"), RES.stdout.decode("utf-8", "replace"))
+            continue
+
+          ftype, value, mode = self.Entries[PATH]
+
+          # Stripped copy no longer matches source
+          self.StagedSources.pop(os.path.normpath(value), None)
+
+          if mode == None:
+            mode = 0o0755 if os.stat(value).st_mode & 0o111 else 0o0644
+
+          self.AddEntry(PATH, ftype, TARGET, mode, os.path.getsize(TARGET))
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Adds compressed changelog
+  def CreateChangelog(self):
+    self.Update(GT("Creating changelog"))
+
+    changelog_target, changelog_text = self.Project.Changelog
+
+    # If changelog will be installed to default directory
+    if changelog_target == "STANDARD":
+      changelog_target = self.Project.GetDocDir()
+
+    self.AddEntry("{}/changelog.gz".format(changelog_target), "data",
+        gzip.compress(changelog_text.encode("utf-8"), 9, mtime=0), 0o0644)
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Adds copyright file
+  def CreateCopyright(self):
+    self.Update(GT("Creating copyright"))
+
+    self.AddEntry("{}/copyright".format(self.Project.GetDocDir()), "data",
+        self.Project.Copyright.encode("utf-8"), 0o0644)
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Adds menu launcher (.desktop) file
+  def CreateLauncher(self):
+    self.Update(GT("Creating menu launcher"))
+
+    self.AddEntry("/usr/share/applications/{}.desktop".format(self.GetLauncherFilename()), "data",
+        self.Project.Launcher.encode("utf-8"), 0o0644)
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Creates md5sums & sha256sums control members
+  def CreateMD5Sums(self):
+    self.Update(GT("Creating md5sums"))
+
+    if self.HashCache == None:
+      self.HashCache = HashCache()
+
+    algos = ["md5"]
+    if self.Project.HasOption("sha256sums"):
+      algos.append("sha256")
+
+    # Symbolic links are not listed, same as dh_md5sums
+    path_list = sorted(P for P in self.Entries if self.Entries[P][0] in ("file", "data"))
+
+    file_list = [P for P in path_list if self.Entries[P][0] == "file"]
+    hashes = dict(zip(file_list, HashFiles([self.Entries[P][1] for P in file_list], algos, self.Jobs,
+        self.StagedSources, self.HashCache or None)))
+
+    for P in path_list:
+      if P not in hashes:
+        hashes[P] = tuple(hashlib.new(A, self.Entries[P][1]).hexdigest() for A in algos)
+
+    if self.HashCache:
+      self.HashCache.Save()
+
+    for INDEX, ALGO in enumerate(algos):
+      sums = ["{}  {}".format(hashes[P][INDEX], P.lstrip("/")) for P in path_list]
+
+      self.ControlMembers.append(("{}sums".format(ALGO), "{}\n".format("\n".join(sums)), 0o0644))
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Adds maintainer scripts to control members
+  def CreateScripts(self):
+    self.Update(GT("Creating scripts"))
+
+    scripts = self.Project.Scripts
+    for SCRIPT in scripts:
+      self.ControlMembers.append((SCRIPT, scripts[SCRIPT], 0o0755))
+
+      # Individual scripts
+      self.Progress += 1
+      if not self.Update():
+        return (dbrerrno.ECNCLD, None)
+
+    # Entire script task
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, None)
+
+
+  ## Adds control file to control members
+  def CreateControl(self):
+    self.Update(GT("Creating control file"))
+
+    self.ControlMembers.insert(0, ("control", self.GetControlText(), 0o0644))
+
+    self.Progress += 2
+
+
+  ## Writes the package
+  #
+  #  \return
+  #      \b \e tuple : Return code & error details
+  def Pack(self):
+    self.Update(GT("Creating package"))
+
+    try:
+      start = time.monotonic()
+
+      with self.OpenDebWriter() as deb:
+        deb.writeControl(self.ControlMembers)
+        deb.openData()
+
+        for PATH in sorted(self.Entries):
+          ftype, value, mode = self.Entries[PATH]
+
+          if ftype == "dir":
+            deb.addDir(PATH, mode)
+
+          elif ftype == "link":
+            deb.addLink(PATH, value)
+
+          elif ftype == "data":
+            deb.addData(PATH, value, mode)
+
+          else:
+            deb.addFile(PATH, value, mode)
+
+    except (OSError, ValueError):
+      self.Progress += 1
+      return (dbrerrno.EUNKNOWN, traceback.format_exc())
+
+    self.LogThroughput(deb.compression, time.monotonic() - start, *deb.sizes[deb.getDataName()])
+
+    self.Progress += 1
+
+    return (dbrerrno.SUCCESS, "")
@@ -6,7 +6,7 @@
 # See: docs/LICENSE.txt
 
 
-import os, sys, wx
+import os, sys, tempfile, wx
 
 import util
 
@@ -17,8 +17,8 @@ from dbr.language    import GT
 from globals         import paths
 from globals.strings import GS
 from globals.strings import TextIsEmpty
+from libdbr.fileio   import getUmask
 from libdbr.fileio   import readFile
-from libdbr.fileio   import writeFile
 
 
 logger = util.getLogger()
@@ -77,16 +77,201 @@ def SetDefaultConfigKey(key, value):
   default_config_values[key] = (func, value,)
 
 
-## Opens configuration & searches for key
+## Configuration file kept in memory
+#
+#  The file is parsed once when first used & values are read from memory.
+#  Changed keys are written together by Commit, which replaces the file
+#  atomically.
+class ConfigStore:
+  ## Constructor
+  #
+  #  \param conf
+  #  	\b \e str : Path to configuration file
+  def __init__(self, conf=default_config):
+    self.Path = conf
+    self.Loaded = False
+
+    # Lines of file, kept so order & unknown lines are preserved, or None if file does not exist
+    self.Lines = None
+    # Raw string values of keys
+    self.Values = {}
+    # Keys changed since last commit
+    self.Dirty = set()
+
+
+  ## Writes changed keys to configuration file
+  #
+  #  Text is written to a temporary file in same directory, which then
+  #  replaces configuration file.
+  #
+  #  \return
+  #  	\b \e int : ConfCode
+  def Commit(self):
+    if not self.Dirty:
+      return ConfCode.SUCCESS
+
+    conf_dir = os.path.dirname(self.Path)
+
+    if not os.path.isdir(conf_dir):
+      if os.path.exists(conf_dir):
+        logger.error("{}: {}".format(GT("Cannot create config directory, file exists"), conf_dir))
+        return ConfCode.ERR_WRITE
+
+      os.makedirs(conf_dir)
+
+    if os.path.exists(self.Path) and not os.path.isfile(self.Path):
+      logger.error("{}: {}".format(GT("Cannot open config for writing, directory exists"), self.Path))
+      return ConfCode.ERR_WRITE
+
+    conf_lines = self.Lines
+    if conf_lines == None:
+      conf_lines = ["[CONFIG-{}.{}]".format(GS(config_version[0]), GS(config_version[1]))]
+
+    conf_lines = list(conf_lines)
+    written = set()
+    for INDEX in range(len(conf_lines)):
+      key = conf_lines[INDEX].partition("=")[0]
+      if "=" in conf_lines[INDEX] and key in self.Dirty:
+        conf_lines[INDEX] = "{}={}".format(key, self.Values[key])
+        written.add(key)
+
+    for KEY in sorted(self.Dirty - written):
+      conf_lines.append("{}={}".format(KEY, self.Values[KEY]))
+
+    conf_text = "\n".join(conf_lines)
+
+    if TextIsEmpty(conf_text):
+      logger.warn(GT("Not writing empty text to configuration"))
+      return ConfCode.ERR_WRITE
+
+    tmp_path = None
+    try:
+      fd, tmp_path = tempfile.mkstemp(prefix=".config-", dir=conf_dir)
+      with open(fd, "w", encoding="utf-8") as fout:
+        fout.write(conf_text)
+        fout.flush()
+        os.fsync(fout.fileno())
+
+      # mkstemp creates files only readable by owner, keep permissions of existing file
+      if os.path.isfile(self.Path):
+        mode = os.stat(self.Path).st_mode & 0o7777
+
+      else:
+        mode = 0o666 & ~getUmask()
+
+      os.chmod(tmp_path, mode)
+      os.replace(tmp_path, self.Path)
+
+    except OSError as e:
+      logger.error("Could not write configuration file: {} ({})".format(self.Path, e.strerror))
+
+      if tmp_path and os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+      return ConfCode.ERR_WRITE
+
+    self.Lines = conf_lines
+    self.Dirty.clear()
+
+    return ConfCode.SUCCESS
+
+
+  ## Checks if configuration file exists
+  def Exists(self):
+    self.Load()
+
+    return self.Lines != None
+
+
+  ## Retrieves raw string value of a key
+  #
+  #  \return
+  #  	\b \e str value or \b \e None if key is not in configuration
+  def Get(self, key):
+    self.Load()
+
+    return self.Values.get(key)
+
+
+  ## Checks if configuration file contains any text
+  def IsEmpty(self):
+    self.Load()
+
+    return not self.Lines or not "".join(self.Lines)
+
+
+  ## Parses configuration file if it has not been read
+  def Load(self):
+    if self.Loaded:
+      return
+
+    self.Loaded = True
+
+    if not os.path.isfile(self.Path):
+      return
+
+    logger.debug(GT("Reading configuration file: {}".format(self.Path)), newline=True)
+
+    conf_text = readFile(self.Path)
+    self.Lines = conf_text.split("\n") if conf_text else []
+
+    for L in self.Lines:
+      if "=" in L:
+        key, value = L.split("=", 1)
+
+        # First definition of key is used
+        if key not in self.Values:
+          self.Values[key] = value
+
+
+  ## Sets raw string value of a key
+  #
+  #  Value is written to file on next commit.
+  def Set(self, key, value):
+    self.Load()
+
+    self.Values[key] = value
+    self.Dirty.add(key)
+
+
+# Configuration stores by path
+config_stores = {}
+
+## Retrieves in-memory store of a configuration file
+#
+#  \param conf
+#  	\b \e str : Path to configuration file
+#  \return
+#  	\b \e ConfigStore instance
+def GetConfigStore(conf=default_config):
+  if conf not in config_stores:
+    config_stores[conf] = ConfigStore(conf)
+
+  return config_stores[conf]
+
+
+## Writes changed keys of configuration to file
+#
+#  \param conf
+#  	\b \e str : Path to configuration file
+#  \return
+#  	\b \e int : ConfCode
+def CommitConfig(conf=default_config):
+  return GetConfigStore(conf).Commit()
+
+
+## Searches configuration for key
+#
+#  Configuration file is only parsed once, values are read from memory.
 #
 #  \param k_name
 #  	\b \e str : Key to search for
 #  \return
 #  	Value of key if found, otherwise ConfCode
 def ReadConfig(k_name, conf=default_config):
-  logger.debug(GT("Reading configuration file: {}".format(conf)), newline=True)
+  store = GetConfigStore(conf)
 
-  if not os.path.isfile(conf):
+  if not store.Exists():
     #logger.warn("Configuration file does not exist: {}".format(conf))
     return ConfCode.FILE_NOT_FOUND
 
@@ -99,28 +284,15 @@ def ReadConfig(k_name, conf=default_config):
     #logger.warn("Undefined key, not attempting to retrieve value: {}".format(k_name))
     return ConfCode.KEY_NOT_DEFINED
 
-  conf_lines = readFile(conf)
-  if conf_lines:
-    conf_lines = conf_lines.split("\n")
-
-    for L in conf_lines:
-      if "=" in L:
-        key = L.split("=")
-        value = key[1]
-        key = key[0]
-
-        if k_name == key:
-          value = default_config_values[key][0](value)
-
-          #logger.debug("Retrieved key-value: {}={}, value type: {}".format(key, value, type(value)))
-          return value
+  if store.IsEmpty():
+    return ConfCode.KEY_NO_EXIST
 
-    if k_name in default_config_values:
-      #logger.debug("Configuration does not contain key, retrieving default value: {}".format(k_name))
+  value = store.Get(k_name)
+  if value != None:
+    return default_config_values[k_name][0](value)
 
-      return GetDefaultConfigValue(k_name)
-
-  return ConfCode.KEY_NO_EXIST
+  #logger.debug("Configuration does not contain key, retrieving default value: {}".format(k_name))
+  return GetDefaultConfigValue(k_name)
 
 
 ## Writes a key=value combination to configuration
@@ -129,18 +301,11 @@ def ReadConfig(k_name, conf=default_config):
 #  	\b \e str : Key to write
 #  \param k_value
 #  	\b \e str|tuple|int|bool : Value of key
+#  \param commit
+#  	\b \e bool : If \b \e False, value is written on next call to CommitConfig
 #  \return
 #  	\b \e int : ConfCode
-def WriteConfig(k_name, k_value, conf=default_config, sectLabel=None):
-  conf_dir = os.path.dirname(conf)
-
-  if not os.path.isdir(conf_dir):
-    if os.path.exists(conf_dir):
-      print("{}: {}: {}".format(GT("Error"), GT("Cannot create config directory, file exists"), conf_dir))
-      return ConfCode.ERR_WRITE
-
-    os.makedirs(conf_dir)
-
+def WriteConfig(k_name, k_value, conf=default_config, sectLabel=None, commit=True):
   # Only write pre-defined keys
   if k_name not in default_config_values:
     print("{}: {}: {}".format(GT("Error"), GT("Configuration key not found"), k_name))
@@ -160,50 +325,13 @@ def WriteConfig(k_name, k_value, conf=default_config, sectLabel=None):
   else:
     k_value = GS(k_value)
 
-  conf_text = wx.EmptyString
-
-  # Save current config to buffer
-  if os.path.exists(conf):
-    if not os.path.isfile(conf):
-      print("{}: {}: {}".format(GT("Error"), GT("Cannot open config for writing, directory exists"), conf))
-      return ConfCode.ERR_WRITE
-
-    conf_text = ""
-    if os.path.isfile(conf):
-      conf_text = readFile(conf)
-
-  else:
-    conf_text = "[CONFIG-{}.{}]".format(GS(config_version[0]), GS(config_version[1]))
-
-  conf_lines = conf_text.split("\n")
+  store = GetConfigStore(conf)
+  store.Set(k_name, k_value)
 
-  key_exists = False
-  for L in conf_lines:
-    l_index = conf_lines.index(L)
-    if "=" in L:
-      key = L.split("=")[0]
+  if commit:
+    return store.Commit()
 
-      if k_name == key:
-        key_exists = True
-
-        conf_lines[l_index] = "{}={}".format(k_name, k_value)
-
-  if not key_exists:
-    conf_lines.append("{}={}".format(k_name, k_value))
-
-  conf_text = "\n".join(conf_lines)
-
-  if TextIsEmpty(conf_text):
-    print("{}: {}".format(GT("Warning"), GT("Not writing empty text to configuration")))
-    return ConfCode.ERR_WRITE
-
-  # Actual writing to configuration
-  writeFile(conf, conf_text)
-
-  if os.path.isfile(conf):
-    return ConfCode.SUCCESS
-
-  return ConfCode.ERR_WRITE
+  return ConfCode.SUCCESS
 
 
 ## Function used to create the inital configuration file
@@ -214,12 +342,12 @@ def WriteConfig(k_name, k_value, conf=default_config, sectLabel=None):
 #  	\b \e ConfCode
 def InitializeConfig(conf=default_config):
   for V in default_config_values:
-    exit_code = WriteConfig(V, default_config_values[V][1], conf)
+    exit_code = WriteConfig(V, default_config_values[V][1], conf, commit=False)
 
     if exit_code != ConfCode.SUCCESS:
       return exit_code
 
-  return ConfCode.SUCCESS
+  return CommitConfig(conf)
 
 
 ## Retrieves default configuration value for a key
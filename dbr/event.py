@@ -19,7 +19,27 @@ TimerStopEvent = NewCommandEvent()
 EVT_TIMER_STOP = TimerStopEvent[1]
 TimerStopEvent = TimerStopEvent[0]
 
-## Event to post when ui.logwindow.LogWindow.PollLogFile is called
+## Event to post when file displayed in ui.logwindow.LogWindow changes
 RefreshLogEvent = NewCommandEvent()
 EVT_REFRESH_LOG = RefreshLogEvent[1]
 RefreshLogEvent = RefreshLogEvent[0]
+
+## Event to post when ui.tree.DirectoryTree has resolved MIME types in background
+MimeTypesEvent = NewCommandEvent()
+EVT_MIME_TYPES = MimeTypesEvent[1]
+MimeTypesEvent = MimeTypesEvent[0]
+
+## Event to post when globals.watcher.FileWatcher detects changes
+FileSystemEvent = NewCommandEvent()
+EVT_FILE_SYSTEM = FileSystemEvent[1]
+FileSystemEvent = FileSystemEvent[0]
+
+## Event to post when wizbin.files.Page has read a batch of project files in background
+FilesLoadedEvent = NewCommandEvent()
+EVT_FILES_LOADED = FilesLoadedEvent[1]
+FilesLoadedEvent = FilesLoadedEvent[0]
+
+## Event to post when main.MainWindow has read a project file in background
+ProjectReadEvent = NewCommandEvent()
+EVT_PROJECT_READ = ProjectReadEvent[1]
+ProjectReadEvent = ProjectReadEvent[0]
@@ -19,6 +19,7 @@ from globals.strings     import GS
 from globals.strings     import IsString
 from globals.strings     import StringIsNumeric
 from globals.system      import PY_VER_STRING
+from libdbr.elf          import hasSymbolTable
 
 
 ## Get the current version of the application
@@ -245,26 +246,9 @@ def IsIntTuple(value):
 
 ## Checks if file is binary & needs stripped
 #
-#  FIXME: Handle missing 'file' command
+#  Reads the file's ELF section table, so 'file' command is not required.
 def FileUnstripped(file_name):
-  CMD_file = GetExecutable("file")
-
-  if CMD_file:
-    output = subprocess.run([CMD_file, file_name]).stdout
-
-    if ": " in output:
-      output = output.split(": ")[1]
-
-    output = output.split(", ")
-
-    if "not stripped" in output:
-      return True
-
-    return False
-
-  print("ERROR: \"file\" command does not exist on system")
-
-  return False
+  return hasSymbolTable(file_name)
 
 
 def BuildBinaryPackageFromTree(root_dir, filename):
@@ -0,0 +1,195 @@
+## \package dbr.hashcache
+#
+#  Persistent cache of file checksums
+#
+#  Entries are keyed by source path & are only valid while the file's
+#  size, modification time, & inode are unchanged, so unmodified files
+#  do not need to be re-hashed when a project is rebuilt. The cache is
+#  shared by all projects, so each entry stores when it was last used &
+#  entries are only removed when they have not been used for a long time
+#  or the cache grows too large.
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+
+import json, os, tempfile, time
+
+import util
+
+from globals.paths import getCacheDir
+
+
+logger = util.getLogger()
+
+## Default location of cache file
+FILE_hashes = os.path.join(getCacheDir(), "hashes.json")
+
+## Seconds after which entries that were not used are removed
+max_age = 60 * 60 * 24 * 30
+
+## Maximum number of entries, least recently used are removed first
+max_entries = 500000
+
+# Seconds after which last use time of a valid entry is updated, so the
+# cache file is not rewritten on every build
+touch_interval = 60 * 60 * 24
+
+
+## Retrieves the values used to determine if a cache entry is stale
+#
+#  \param filepath
+#      \b \e str : Path to file
+#  \return
+#      \b \e tuple : Size, modification time in nanoseconds, & inode
+def GetFileSignature(filepath):
+  st = os.stat(filepath)
+
+  return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+## Checksums of source files stored between builds
+class HashCache:
+  ## Constructor
+  #
+  #  \param filename
+  #      \b \e str : Path to cache file
+  def __init__(self, filename=FILE_hashes):
+    self.Filename = filename
+    self.Entries = {}
+    self.Modified = False
+
+    self.Load()
+
+
+  ## Retrieves cached hashes for a file
+  #
+  #  \param filepath
+  #      \b \e str : Path to source file
+  #  \param algos
+  #      Names of hashlib algorithms required
+  #  \param signature
+  #      \b \e tuple : Value from \b \e GetFileSignature (retrieved if not set)
+  #  \return
+  #      \b \e tuple : Hexadecimal digests in same order as <b><i>algos</i></b>,
+  #      or \b \e None if file is not cached, has changed, or is missing an algorithm
+  def Get(self, filepath, algos, signature=None):
+    entry = self.Entries.get(filepath)
+    if not entry:
+      return None
+
+    if signature == None:
+      try:
+        signature = GetFileSignature(filepath)
+
+      except OSError:
+        return None
+
+    if tuple(entry[:3]) != tuple(signature):
+      return None
+
+    hashes = entry[3]
+    for A in algos:
+      if A not in hashes:
+        return None
+
+    now = time.time()
+    if now - entry[4] >= touch_interval:
+      entry[4] = now
+      self.Modified = True
+
+    return tuple(hashes[A] for A in algos)
+
+
+  ## Reads cache file
+  def Load(self):
+    self.Entries = {}
+    self.Modified = False
+
+    if not os.path.isfile(self.Filename):
+      return
+
+    try:
+      with open(self.Filename, "r", encoding="utf-8") as fin:
+        self.Entries = json.load(fin)
+
+    except (OSError, ValueError):
+      logger.warn("Discarding unreadable checksum cache: {}".format(self.Filename))
+      self.Entries = {}
+
+    # Entries written before last use time was stored count as used now
+    now = time.time()
+    for E in self.Entries.values():
+      if len(E) < 5:
+        E.append(now)
+
+
+  ## Stores hashes for a file
+  #
+  #  \param filepath
+  #      \b \e str : Path to source file
+  #  \param algos
+  #      Names of hashlib algorithms
+  #  \param hashes
+  #      Hexadecimal digests in same order as <b><i>algos</i></b>
+  #  \param signature
+  #      \b \e tuple : Value from \b \e GetFileSignature
+  def Set(self, filepath, algos, hashes, signature):
+    entry = self.Entries.get(filepath)
+    if entry and tuple(entry[:3]) == tuple(signature):
+      stored = entry[3]
+
+    else:
+      stored = {}
+
+    stored.update(zip(algos, hashes))
+    self.Entries[filepath] = list(signature) + [stored, time.time()]
+    self.Modified = True
+
+
+  ## Writes cache file if entries have changed
+  #
+  #  Expired & least recently used entries above \b \e max_entries are
+  #  removed first.
+  #
+  #  \return
+  #      \b \e True if cache was written
+  def Save(self):
+    now = time.time()
+    for F in [F for F, E in self.Entries.items() if now - E[4] > max_age]:
+      del self.Entries[F]
+      self.Modified = True
+
+    if len(self.Entries) > max_entries:
+      oldest = sorted(self.Entries, key=lambda F: self.Entries[F][4])
+      for F in oldest[:len(self.Entries) - max_entries]:
+        del self.Entries[F]
+
+      self.Modified = True
+
+    if not self.Modified:
+      return False
+
+    tmp_file = None
+    try:
+      cache_dir = os.path.dirname(self.Filename)
+      os.makedirs(cache_dir, exist_ok=True)
+
+      # Unique name so that other running instances do not write to same file
+      fd, tmp_file = tempfile.mkstemp(prefix=".hashes-", dir=cache_dir)
+      with open(fd, "w", encoding="utf-8") as fout:
+        json.dump(self.Entries, fout)
+
+      os.replace(tmp_file, self.Filename)
+
+    except OSError as e:
+      logger.warn("Could not write checksum cache: {}".format(e))
+
+      if tmp_file and os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+      return False
+
+    self.Modified = False
+
+    return True
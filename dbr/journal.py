@@ -0,0 +1,368 @@
+## \package dbr.journal
+#
+#  Append-only journal of project changes used to recover unsaved work
+#
+#  Each record is a JSON list on its own line:
+#    - ["base", path]: Project state is read from project file (or empty
+#      if path is \b \e None).
+#    - ["section", name, data]: Section data was changed.
+#    - ["files-add", lines]: Lines were added to or replaced in file list.
+#    - ["files-remove", paths]: Files were removed from file list.
+#    - ["files-clear"]: All files were removed from file list.
+#
+#  Appending a record only writes the changed data. When the journal grows
+#  too large, it is compacted into a snapshot project file in a background
+#  thread. The journal & snapshot are removed when Debreate exits normally,
+#  so if they exist on startup the previous session did not exit cleanly.
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+
+import json, os, threading
+
+import util
+
+from globals.application import VERSION_string
+from globals.paths       import getCacheDir
+from globals.projectfile import ReadProject
+from globals.projectfile import WriteProject
+
+
+logger = util.getLogger()
+
+## Default location of journal files
+DIR_recovery = os.path.join(getCacheDir(), "recovery")
+
+# Journal size in bytes when it is compacted into snapshot
+compact_size = 1024 * 1024
+
+
+## Retrieves path of a file from a line of project's file list
+#
+#  \param line
+#      \b \e str : Line formatted as "source -> filename -> target"
+def GetLinePath(line):
+  path = line.split(" -> ", 1)[0]
+  if path.endswith("*"):
+    # Executable flag
+    path = path[:-1]
+
+  return path
+
+
+## Applies journal records to project sections
+#
+#  \param sections
+#      \b \e dict : Section data keyed by section name, modified in place
+#  \param records
+#      Iterable of records read from journal
+def ApplyRecords(sections, records):
+  # File list is kept as lines keyed by path while records are applied
+  files = None
+
+  for REC in records:
+    op = REC[0]
+
+    if op == "base":
+      files = None
+      sections.clear()
+      if REC[1] != None:
+        try:
+          sections.update(ReadProject(REC[1])[1])
+
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+          logger.warn("Could not read base project for recovery: {}".format(e))
+
+    elif op == "section":
+      if REC[1] == "FILES":
+        files = None
+
+      sections[REC[1]] = REC[2]
+
+    elif op.startswith("files-"):
+      if files == None:
+        files = {}
+        lines = sections.get("FILES", "0").split("\n")
+        if lines[0].strip() not in ("", "0"):
+          for LINE in lines[1:]:
+            files[GetLinePath(LINE)] = LINE
+
+      if op == "files-add":
+        for LINE in REC[1]:
+          files[GetLinePath(LINE)] = LINE
+
+      elif op == "files-remove":
+        for PATH in REC[1]:
+          files.pop(PATH, None)
+
+      elif op == "files-clear":
+        files.clear()
+
+  if files != None:
+    if files:
+      sections["FILES"] = "1\n" + "\n".join(files.values())
+
+    else:
+      sections["FILES"] = "0"
+
+  return sections
+
+
+## Reads records from a journal file
+#
+#  A partially written last record is ignored.
+#
+#  \param filename
+#      \b \e str : Path to journal file
+#  \return
+#      \b \e List of records
+def ReadRecords(filename):
+  records = []
+
+  try:
+    with open(filename, "r", encoding="utf-8") as fin:
+      for LINE in fin:
+        try:
+          records.append(json.loads(LINE))
+
+        except ValueError:
+          logger.warn("Ignoring incomplete journal record in {}".format(filename))
+          break
+
+  except FileNotFoundError:
+    pass
+
+  return records
+
+
+## Journal of unsaved project changes
+class ProjectJournal:
+  ## Constructor
+  #
+  #  \param dirname
+  #      \b \e str : Directory where journal files are stored
+  def __init__(self, dirname=DIR_recovery):
+    self.Dirname = dirname
+    self.Filename = os.path.join(dirname, "journal")
+    # Journal being compacted into snapshot
+    self.OldFilename = os.path.join(dirname, "journal.old")
+    self.SnapshotFilename = os.path.join(dirname, "snapshot.dbp")
+    self.SessionFilename = os.path.join(dirname, "session")
+
+    self.Stream = None
+    self.Size = 0
+    self.Lock = threading.Lock()
+    self.Compacting = False
+    # Incremented when journal is reset, so outdated snapshots are discarded
+    self.Generation = 0
+
+
+  ## Appends records to journal
+  #
+  #  Data is flushed to the operating system but not synced to disk, so
+  #  appending does not wait for the disk. This is enough to recover after
+  #  Debreate crashes.
+  #
+  #  \param records
+  #      \b \e List of records
+  def Append(self, records):
+    if not records:
+      return
+
+    data = "".join("{}\n".format(json.dumps(R, separators=(",", ":"))) for R in records)
+
+    with self.Lock:
+      if not self.Stream:
+        return
+
+      try:
+        self.Stream.write(data)
+        self.Stream.flush()
+        self.Size += len(data)
+
+      except OSError as e:
+        logger.error("Could not write to recovery journal: {}".format(e))
+
+
+  ## Stops journaling & removes journal files
+  def Close(self):
+    with self.Lock:
+      self.Generation += 1
+      self.CloseStream()
+
+      for F in (self.Filename, self.OldFilename, self.SnapshotFilename, self.SessionFilename):
+        if os.path.exists(F):
+          os.remove(F)
+
+
+  ## Closes journal file
+  #
+  #  Lock must be held by caller.
+  def CloseStream(self):
+    if self.Stream:
+      self.Stream.close()
+      self.Stream = None
+
+
+  ## Compacts journal into snapshot
+  #
+  #  Called from a background thread. Journal is renamed, so records can
+  #  still be appended while snapshot is written.
+  def Compact(self):
+    with self.Lock:
+      if self.Compacting or not self.Stream:
+        return
+
+      self.Compacting = True
+      generation = self.Generation
+
+    new_snapshot = "{}.new".format(self.SnapshotFilename)
+    try:
+      with self.Lock:
+        if generation != self.Generation or not self.Stream:
+          return
+
+        # Journal left by a failed compaction is compacted first
+        if not os.path.exists(self.OldFilename):
+          self.CloseStream()
+          os.replace(self.Filename, self.OldFilename)
+          self.OpenStream("w")
+
+      sections = self.ReadSnapshot()
+      ApplyRecords(sections, ReadRecords(self.OldFilename))
+      WriteProject(new_snapshot, VERSION_string, sections)
+
+      with self.Lock:
+        if generation == self.Generation:
+          os.replace(new_snapshot, self.SnapshotFilename)
+          os.remove(self.OldFilename)
+
+        else:
+          # Journal was reset while snapshot was written
+          os.remove(new_snapshot)
+
+    except (OSError, ValueError, UnicodeError) as e:
+      logger.error("Could not compact recovery journal: {}".format(e))
+
+      if os.path.exists(new_snapshot):
+        os.remove(new_snapshot)
+
+    finally:
+      self.Compacting = False
+
+
+  ## Checks if journal has grown large enough to be compacted
+  def NeedsCompaction(self):
+    return self.Size >= compact_size and not self.Compacting
+
+
+  ## Checks if a previous session left unsaved changes
+  def HasRecovery(self):
+    if os.path.exists(self.SnapshotFilename) or os.path.exists(self.OldFilename):
+      return True
+
+    records = ReadRecords(self.Filename)
+
+    # Journal only has base project if nothing was changed after opening it
+    return len(records) > 1 or records and records[0][0] != "base"
+
+
+  ## Starts journaling
+  #
+  #  \return
+  #      \b \e False if journal is used by another running instance
+  def Open(self):
+    try:
+      os.makedirs(self.Dirname, exist_ok=True)
+
+      if os.path.isfile(self.SessionFilename):
+        with open(self.SessionFilename, "r") as fin:
+          pid = int(fin.read().strip() or 0)
+
+        if pid and pid != os.getpid():
+          try:
+            os.kill(pid, 0)
+            logger.warn("Recovery journal is used by another instance (PID {})".format(pid))
+            return False
+
+          except ProcessLookupError:
+            pass
+
+          except PermissionError:
+            return False
+
+      with open(self.SessionFilename, "w") as fout:
+        fout.write(str(os.getpid()))
+
+    except (OSError, ValueError) as e:
+      logger.error("Could not open recovery journal: {}".format(e))
+      return False
+
+    return True
+
+
+  ## Opens journal file
+  #
+  #  Lock must be held by caller.
+  #
+  #  \param mode
+  #      \b \e str : "w" to truncate journal or "a" to append to it
+  def OpenStream(self, mode="a"):
+    self.Stream = open(self.Filename, mode, encoding="utf-8")
+    self.Size = self.Stream.tell()
+
+
+  ## Reads sections saved in snapshot
+  #
+  #  \return
+  #      \b \e dict : Section data keyed by section name
+  def ReadSnapshot(self):
+    if not os.path.isfile(self.SnapshotFilename):
+      return {}
+
+    return ReadProject(self.SnapshotFilename)[1]
+
+
+  ## Reads project left by a previous session
+  #
+  #  \return
+  #      \b \e dict : Section data keyed by section name
+  def Recover(self):
+    sections = self.ReadSnapshot()
+
+    ApplyRecords(sections, ReadRecords(self.OldFilename) + ReadRecords(self.Filename))
+
+    return sections
+
+
+  ## Starts a new journal
+  #
+  #  \param base
+  #      \b \e str : Project file that changes are relative to, or
+  #      \b \e None for a new project
+  #  \param sections
+  #      \b \e dict : Section data stored in snapshot instead of reading
+  #      base project
+  def Reset(self, base=None, sections=None):
+    with self.Lock:
+      self.Generation += 1
+      self.CloseStream()
+
+      try:
+        for F in (self.OldFilename, self.SnapshotFilename):
+          if os.path.exists(F):
+            os.remove(F)
+
+        if sections != None:
+          WriteProject(self.SnapshotFilename, VERSION_string, sections)
+
+        self.OpenStream("w")
+
+      except (OSError, UnicodeError) as e:
+        logger.error("Could not reset recovery journal: {}".format(e))
+        self.CloseStream()
+        return
+
+    if sections == None:
+      self.Append([["base", base]])
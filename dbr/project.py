@@ -0,0 +1,411 @@
+## \package dbr.project
+#
+#  Display independent representation of a project's build data
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+
+import gzip, os
+
+from globals.errorcodes import dbrerrno
+from globals.strings    import TextIsEmpty
+from libdbr.fileio      import readFile
+
+
+## Optional build tasks & their default states
+default_options = {
+  "md5sums": True,
+  "sha256sums": False,
+  "strip": True,
+  "rmstage": True,
+  "lintian": True,
+}
+
+## Script sections of project file & their output filenames
+script_sections = (
+  ("PREINST", "preinst"),
+  ("POSTINST", "postinst"),
+  ("PRERM", "prerm"),
+  ("POSTRM", "postrm"),
+)
+
+
+## Retrieves the contents of a section from legacy project text
+#
+#  \param data
+#      \b \e str : Project file text
+#  \param section
+#      \b \e str : Section name (e.g. "CTRL")
+#  \return
+#      \b \e str : Section text or \b \e None if section is not defined
+def GetSection(data, section):
+  start = "<<{}>>\n".format(section)
+  if start not in data:
+    return None
+
+  return data.split(start)[1].split("\n<</{}".format(section))[0]
+
+
+## Installed size of files & directories in a package
+#
+#  Follows the method used by dpkg-gencontrol: regular files & symbolic
+#  links are rounded up to 1 KiB blocks, other filesystem objects count
+#  as 1 KiB. Entries are keyed by install path, so adding a path again
+#  replaces its previous size.
+class InstalledSize:
+  def __init__(self):
+    self.Entries = {}
+
+
+  ## Adds a directory & its parent directories
+  #
+  #  \param path
+  #      \b \e str : Absolute install path (e.g. "/usr/share/doc")
+  def AddDir(self, path):
+    path = os.path.normpath(path)
+    while path not in self.Entries and path not in ("/", "//"):
+      self.Entries[path] = 1
+      path = os.path.dirname(path)
+
+
+  ## Adds a regular file or symbolic link
+  #
+  #  \param path
+  #      \b \e str : Absolute install path
+  #  \param size
+  #      \b \e int : Size in bytes
+  def AddFile(self, path, size):
+    path = os.path.normpath(path)
+    self.AddDir(os.path.dirname(path))
+    self.Entries[path] = (size + 1023) // 1024
+
+
+  ## Adds a symbolic link
+  #
+  #  \param path
+  #      \b \e str : Absolute install path
+  #  \param target
+  #      \b \e str : Path that link points to
+  def AddLink(self, path, target):
+    self.AddFile(path, len(os.fsencode(target)))
+
+
+  ## Removes a file or directory entry
+  def Remove(self, path):
+    self.Entries.pop(os.path.normpath(path), None)
+
+
+  ## Retrieves total size
+  #
+  #  \return
+  #      \b \e int : Size in kibibytes
+  def Get(self):
+    return sum(self.Entries.values())
+
+
+## A file or directory to be installed by the package
+class PackageFile:
+  ## Constructor
+  #
+  #  \param source
+  #      \b \e str : Absolute path to source file
+  #  \param filename
+  #      \b \e str : Filename relative to target directory
+  #  \param target
+  #      \b \e str : Target installation directory
+  #  \param executable
+  #      \b \e bool : File should be installed with executable permissions
+  def __init__(self, source, filename, target, executable=False):
+    self.Source = source
+    self.Filename = filename
+    self.Target = target
+    self.Executable = executable
+
+
+  ## Creates an instance from a line of the project's file list
+  #
+  #  \param line
+  #      \b \e str : Text formatted as "<source>[*] -> <filename> -> <target>"
+  @staticmethod
+  def FromString(line):
+    source, filename, target = line.split(" -> ")[:3]
+
+    executable = source.endswith("*")
+    if executable:
+      source = source[:-1]
+
+    return PackageFile(source, filename, target, executable)
+
+
+  ## Retrieves the path where the source will be installed
+  #
+  #  \return
+  #      \b \e str : Absolute install path
+  def GetInstallPath(self):
+    target_dir = os.path.dirname("{}/{}".format(self.Target, self.Filename))
+
+    return os.path.normpath("{}/{}".format(target_dir, os.path.basename(self.Source)))
+
+
+## Project data required for building a package
+#
+#  Can be populated from the wizard pages or from a project file, so
+#  that packages can be built without a display.
+class ProjectModel:
+  def __init__(self):
+    ## Control file text (Installed-Size is added at build time)
+    self.Control = ""
+
+    ## List of dbr.project.PackageFile instances
+    self.Files = []
+
+    ## Script filenames & contents
+    self.Scripts = {}
+
+    ## Tuple of changelog target ("STANDARD" for default) & text, or None
+    self.Changelog = None
+
+    ## Copyright text or None
+    self.Copyright = None
+
+    ## Menu launcher (.desktop) text or None
+    self.Launcher = None
+    self.LauncherFilename = None
+
+    ## Symbolic links are added to package as links instead of copies
+    self.NoFollowLinks = True
+
+    self.Options = dict(default_options)
+
+    ## Compression format of package archives (None uses build backend's default)
+    self.Compression = None
+    ## Compression level (None uses format's default)
+    self.CompressionLevel = None
+    ## Number of threads used for building (0 uses number of CPUs)
+    self.Threads = 0
+
+
+  ## Retrieves a field value from the control text
+  #
+  #  \param field
+  #      \b \e str : Field name (e.g. "Package")
+  #  \return
+  #      \b \e str : Field value or \b \e None if not defined
+  def GetControlField(self, field):
+    for LINE in self.Control.split("\n"):
+      if LINE.startswith("{}:".format(field)):
+        return LINE.split(":", 1)[1].strip()
+
+
+  ## Retrieves the standard .deb filename without extension
+  #
+  #  \return
+  #      \b \e str : Filename formatted as <package>_<version>_<arch>
+  def GetDefaultFilename(self):
+    package = "-".join(self.GetPackage().split())
+    version = "".join(self.GetControlField("Version").split())
+
+    return "{}_{}_{}".format(package, version, self.GetControlField("Architecture"))
+
+
+  ## Retrieves the package name
+  def GetPackage(self):
+    return self.GetControlField("Package")
+
+
+  ## Retrieves the package's default documentation directory
+  def GetDocDir(self):
+    return "/usr/share/doc/{}".format(self.GetPackage() or "")
+
+
+  ## Estimates installed size of package before building
+  #
+  #  Source files are measured where they are, so the estimate does
+  #  not account for binaries that will be stripped.
+  #
+  #  \return
+  #      \b \e int : Size in kibibytes
+  def GetInstalledSize(self):
+    size = InstalledSize()
+
+    for FILE in self.Files:
+      source = FILE.Source
+      target = FILE.GetInstallPath()
+
+      try:
+        if os.path.islink(source) and self.NoFollowLinks and os.path.exists(source):
+          size.AddLink(target, os.readlink(source))
+
+        elif os.path.isdir(source):
+          size.AddDir(target)
+
+          for ROOT, DIRS, FILES in os.walk(source, followlinks=True):
+            root_target = os.path.join(target, os.path.relpath(ROOT, source))
+            for D in DIRS:
+              size.AddDir(os.path.join(root_target, D))
+            for F in FILES:
+              size.AddFile(os.path.join(root_target, F), os.path.getsize(os.path.join(ROOT, F)))
+
+        elif os.path.isfile(source):
+          size.AddFile(target, os.path.getsize(source))
+
+      except OSError:
+        pass
+
+    if self.Changelog:
+      changelog_target, changelog_text = self.Changelog
+      if changelog_target == "STANDARD":
+        changelog_target = self.GetDocDir()
+
+      changelog_data = gzip.compress(changelog_text.encode("utf-8"), 9, mtime=0)
+      size.AddFile("{}/changelog.gz".format(changelog_target), len(changelog_data))
+
+    if self.Copyright:
+      size.AddFile("{}/copyright".format(self.GetDocDir()), len(self.Copyright.encode("utf-8")))
+
+    if self.Launcher:
+      size.AddFile("/usr/share/applications/{}.desktop".format(self.LauncherFilename),
+          len(self.Launcher.encode("utf-8")))
+
+    return size.Get()
+
+
+  ## Checks if an optional build task is enabled
+  #
+  #  \param option
+  #      \b \e str : Option name (e.g. "md5sums")
+  def HasOption(self, option):
+    return self.Options.get(option, False)
+
+
+  ## Reads a Debreate project file
+  #
+  #  \param filename
+  #      \b \e str : Path to project file
+  #  \return
+  #      \b \e dbrerrno.SUCCESS, \b \e dbrerrno.ENOENT, or \b \e dbrerrno.EBADFT
+  def Load(self, filename):
+    if not os.path.isfile(filename):
+      return dbrerrno.ENOENT
+
+    data = readFile(filename)
+
+    # FIXME: Need a better way to determine valid project
+    if not data.lstrip("[").startswith("DEBREATE") or GetSection(data, "CTRL") == None:
+      return dbrerrno.EBADFT
+
+    self.Set(data)
+
+    return dbrerrno.SUCCESS
+
+
+  ## Sets project data from legacy project file text
+  #
+  #  \param data
+  #      \b \e str : Project file text
+  def Set(self, data):
+    self.Control = "{}\n".format(GetSection(data, "CTRL").strip("\n"))
+
+    self.Files = []
+    files_data = GetSection(data, "FILES")
+    if files_data:
+      files_data = files_data.split("\n")
+      if files_data[0].isnumeric() and int(files_data[0]):
+        self.SetFiles(files_data[1:])
+
+    self.Scripts = {}
+    scripts_data = GetSection(data, "SCRIPTS")
+    if scripts_data:
+      for SECT, FILENAME in script_sections:
+        script = GetSection(scripts_data, SECT)
+        if script:
+          script = script.split("\n")
+          if script[0].isnumeric() and int(script[0]):
+            self.Scripts[FILENAME] = "\n".join(script[1:])
+
+    self.Changelog = None
+    clog_data = GetSection(data, "CHANGELOG")
+    if clog_data:
+      clog_data = clog_data.split("\n")
+      target = clog_data[0].split("<<DEST>>")[1].split("<</DEST>>")[0]
+      if target == "DEFAULT":
+        target = "STANDARD"
+
+      clog_text = "\n".join(clog_data[1:])
+      if not TextIsEmpty(clog_text):
+        self.Changelog = (target, clog_text)
+
+    self.Copyright = None
+    cpright_data = GetSection(data, "COPYRIGHT")
+    # NOTE: Older versions saved "None" when copyright was empty
+    if cpright_data and not TextIsEmpty(cpright_data) and cpright_data != "None":
+      self.Copyright = cpright_data
+
+    self.Launcher = None
+    self.LauncherFilename = None
+    menu_data = GetSection(data, "MENU")
+    if menu_data:
+      menu_data = menu_data.split("\n")
+      if menu_data[0].isnumeric() and int(menu_data[0]):
+        self.SetLauncher(menu_data[1:])
+
+    build_data = GetSection(data, "BUILD")
+    if build_data != None:
+      build_data = build_data.split("\n")
+      for INDEX, OPT in enumerate(("md5sums", "rmstage", "lintian")):
+        if INDEX < len(build_data) and build_data[INDEX].isnumeric():
+          self.Options[OPT] = int(build_data[INDEX]) > 0
+
+      self.Options["strip"] = "strip" in build_data
+      self.Options["sha256sums"] = "sha256" in build_data
+
+      self.Compression = None
+      self.CompressionLevel = None
+      self.Threads = 0
+      for LINE in build_data:
+        if LINE.startswith("compression="):
+          self.Compression = LINE.split("=", 1)[1] or None
+
+        elif LINE.startswith("compression-level=") and LINE.split("=", 1)[1].isdigit():
+          self.CompressionLevel = int(LINE.split("=", 1)[1])
+
+        elif LINE.startswith("threads=") and LINE.split("=", 1)[1].isdigit():
+          self.Threads = int(LINE.split("=", 1)[1])
+
+
+  ## Sets list of files to be packaged
+  #
+  #  \param lines
+  #      \b \e List of strings formatted as "<source>[*] -> <filename> -> <target>"
+  def SetFiles(self, lines):
+    self.Files = []
+    for L in lines:
+      if not TextIsEmpty(L):
+        self.Files.append(PackageFile.FromString(L))
+
+
+  ## Sets menu launcher data from project file lines
+  #
+  #  \param lines
+  #      \b \e List of launcher lines without "[Desktop Entry]" header
+  def SetLauncher(self, lines):
+    desktop_list = ["[Desktop Entry]"]
+    filename = ""
+    name = ""
+
+    for L in lines:
+      if L.startswith("[FILENAME="):
+        filename = L[len("[FILENAME="):].rstrip("]")
+        continue
+
+      if L.startswith("Name="):
+        name = L[len("Name="):]
+
+      desktop_list.append(L)
+
+    if TextIsEmpty(filename):
+      filename = name
+
+    self.Launcher = "\n".join(desktop_list)
+    self.LauncherFilename = filename.strip(" ").replace(" ", "_")
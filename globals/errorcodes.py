@@ -6,19 +6,7 @@
 # See: docs/LICENSE.txt
 
 
-import wx, errno
-
-
-# TODO: Convert these to dbrerror
-ERR_DIR_NOT_AVAILABLE = wx.NewId()
-ERR_FILE_READ = wx.NewId()
-ERR_FILE_WRITE = wx.NewId()
-
-error_definitions = {
-  ERR_DIR_NOT_AVAILABLE: "Directory Not Available",
-  ERR_FILE_READ: "Could Not Read File",
-  ERR_FILE_WRITE: "Could Not Write File",
-}
+import errno
 
 
 current_code = sorted(errno.errorcode.keys())[-1]
@@ -39,3 +27,14 @@ dbrerrno.EBADFT = AddNewCode("EBADFT")
 dbrerrno.ECNCLD = AddNewCode("ECNCLD")
 dbrerrno.FEMPTY = AddNewCode("FEMPTY")
 dbrerrno.EUNKNOWN = AddNewCode("EUNKNOWN")
+
+# NOTE: Defined after dbrerrno codes so existing values are unchanged
+ERR_DIR_NOT_AVAILABLE = AddNewCode("ERR_DIR_NOT_AVAILABLE")
+ERR_FILE_READ = AddNewCode("ERR_FILE_READ")
+ERR_FILE_WRITE = AddNewCode("ERR_FILE_WRITE")
+
+error_definitions = {
+  ERR_DIR_NOT_AVAILABLE: "Directory Not Available",
+  ERR_FILE_READ: "Could Not Read File",
+  ERR_FILE_WRITE: "Could Not Write File",
+}
@@ -0,0 +1,396 @@
+## \package globals.filemodel
+#
+#  Compact storage for large file lists
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+
+import os, stat
+
+from array import array
+
+
+## File is marked executable
+FLAG_EXEC = 0x01
+## File is a symbolic link
+FLAG_LINK = 0x02
+## File is a directory
+FLAG_DIR = 0x04
+## File does not exist on filesystem
+FLAG_MISSING = 0x08
+## File was marked executable by user (kept when flags are read from filesystem)
+FLAG_USER_EXEC = 0x10
+
+## Stat snapshot of a row that has not been checked
+NO_STAMP = (0, 0,)
+
+
+## Retrieves flags for a file from the filesystem
+#
+#  Only one stat call is made for each file (two for symbolic links).
+#
+#  \param path
+#      \b \e str : Absolute path to file
+#  \param executable
+#      \b \e bool : Mark file as executable even if it does not have executable bit set
+#  \return
+#      \b \e int : Combination of \b \e FLAG_* values
+def GetFileFlags(path, executable=False):
+  try:
+    st = os.lstat(path)
+
+  except OSError:
+    if executable:
+      return FLAG_MISSING|FLAG_EXEC|FLAG_USER_EXEC
+
+    return FLAG_MISSING
+
+  flags = GetStatFlags(st, executable)
+
+  # Target of link does not exist
+  if flags & FLAG_LINK and not os.path.exists(path):
+    flags |= FLAG_MISSING
+
+  return flags
+
+
+## Retrieves flags for a file from a directory entry
+#
+#  File type is read from the entry, so a stat call is only made for
+#  regular files.
+#
+#  \param entry
+#      \b \e os.DirEntry : Entry returned by \b \e os.scandir
+#  \param executable
+#      \b \e bool : Mark file as executable even if it does not have executable bit set
+#  \return
+#      \b \e int : Combination of \b \e FLAG_* values
+def GetEntryFlags(entry, executable=False):
+  if entry.is_symlink():
+    if not os.path.exists(entry.path):
+      return FLAG_LINK|FLAG_MISSING
+
+    return FLAG_LINK
+
+  if entry.is_dir(follow_symlinks=False):
+    return FLAG_DIR
+
+  return GetStatFlags(entry.stat(follow_symlinks=False), executable)
+
+
+## Retrieves entries of a directory
+#
+#  \param path
+#      \b \e str : Directory to read
+#  \return
+#      \b \e dict : \b \e os.DirEntry instances keyed by filename (empty if
+#      directory cannot be read)
+def GetDirEntries(path):
+  try:
+    with os.scandir(path) as entries:
+      return {E.name: E for E in entries}
+
+  except OSError:
+    return {}
+
+
+## Retrieves flags for a file from a stat result
+#
+#  \param st
+#      \b \e os.stat_result : Result of \b \e os.lstat or \b \e os.DirEntry.stat(follow_symlinks=False)
+#  \param executable
+#      \b \e bool : Mark file as executable even if it does not have executable bit set
+#  \return
+#      \b \e int : Combination of \b \e FLAG_* values
+def GetStatFlags(st, executable=False):
+  if stat.S_ISLNK(st.st_mode):
+    return FLAG_LINK
+
+  if stat.S_ISDIR(st.st_mode):
+    return FLAG_DIR
+
+  flags = 0
+  if executable:
+    flags |= FLAG_EXEC|FLAG_USER_EXEC
+
+  elif st.st_mode & 0o111:
+    flags |= FLAG_EXEC
+
+  if not stat.S_ISREG(st.st_mode):
+    flags |= FLAG_MISSING
+
+  return flags
+
+
+## Retrieves snapshot of a stat result used to detect changes
+#
+#  \param st
+#      \b \e os.stat_result or \b \e None if file does not exist
+#  \return
+#      \b \e tuple : (modification time in nanoseconds, mode)
+def GetStatStamp(st):
+  if st == None:
+    # Mode is never 0 for an existing file
+    return (-1, 0,)
+
+  return (st.st_mtime_ns, st.st_mode,)
+
+
+## Columnar storage for file list rows
+#
+#  Rows are stored in parallel arrays instead of an object per file.
+#  Source directories, targets & MIME types are repeated for many files,
+#  so each distinct string is stored once & rows reference it by index.
+class FileListModel:
+  def __init__(self):
+    self.Clear()
+
+
+  ## Number of rows
+  def __len__(self):
+    return len(self.Names)
+
+
+  ## Adds a row to end of list
+  #
+  #  \param filename
+  #      \b \e str : Filename relative to source directory
+  #  \param source
+  #      \b \e str : Directory where file is located
+  #  \param target
+  #      \b \e str : Directory where file will be installed
+  #  \param flags
+  #      \b \e int : Combination of \b \e FLAG_* values
+  #  \return
+  #      \b \e int : Index of new row
+  def Append(self, filename, source, target, flags=0):
+    self.Names.append(filename)
+    self.Sources.append(self.Intern(source))
+    self.Targets.append(self.Intern(target))
+    self.Types.append(0)
+    self.Flags.append(flags)
+    self.MTimes.append(NO_STAMP[0])
+    self.Modes.append(NO_STAMP[1])
+
+    return len(self.Names) - 1
+
+
+  ## Removes all rows
+  def Clear(self):
+    ## Distinct strings referenced by rows (index 0 is unresolved MIME type)
+    self.Strings = [None]
+    self.StringIndexes = {None: 0}
+
+    self.Names = []
+    self.Sources = array("L")
+    self.Targets = array("L")
+    self.Types = array("L")
+    self.Flags = array("B")
+    # Stat snapshots of rows when flags were last checked
+    self.MTimes = array("q")
+    self.Modes = array("L")
+
+
+  ## Removes rows
+  #
+  #  \param rows
+  #      \b \e List of row indexes
+  def Delete(self, rows):
+    rows = set(rows)
+    if not rows:
+      return
+
+    keep = [I for I in range(len(self.Names)) if I not in rows]
+
+    self.Names = [self.Names[I] for I in keep]
+    self.Sources = array("L", (self.Sources[I] for I in keep))
+    self.Targets = array("L", (self.Targets[I] for I in keep))
+    self.Types = array("L", (self.Types[I] for I in keep))
+    self.Flags = array("B", (self.Flags[I] for I in keep))
+    self.MTimes = array("q", (self.MTimes[I] for I in keep))
+    self.Modes = array("L", (self.Modes[I] for I in keep))
+
+
+  ## Finds the row of a file
+  #
+  #  \param path
+  #      \b \e str : Absolute path to file
+  #  \return
+  #      \b \e int : Row index or \b \e None if file is not listed
+  def Find(self, path):
+    for INDEX in range(len(self.Names)):
+      if self.GetPath(INDEX) == path:
+        return INDEX
+
+    return None
+
+
+  ## Retrieves filename of a row relative to source directory
+  def GetFilename(self, row):
+    return self.Names[row]
+
+
+  ## Retrieves flags of a row
+  def GetFlags(self, row):
+    return self.Flags[row]
+
+
+  ## Retrieves absolute path of a row
+  def GetPath(self, row):
+    return os.path.join(self.Strings[self.Sources[row]], self.Names[row])
+
+
+  ## Retrieves source directory of a row
+  def GetSource(self, row):
+    return self.Strings[self.Sources[row]]
+
+
+  ## Retrieves target directory of a row
+  def GetTarget(self, row):
+    return self.Strings[self.Targets[row]]
+
+
+  ## Retrieves stat snapshot of a row
+  #
+  #  \return
+  #      \b \e tuple : (modification time in nanoseconds, mode)
+  def GetStamp(self, row):
+    return (self.MTimes[row], self.Modes[row],)
+
+
+  ## Retrieves MIME type of a row
+  #
+  #  \return
+  #      \b \e str : MIME type or \b \e None if it has not been set
+  def GetType(self, row):
+    return self.Strings[self.Types[row]]
+
+
+  ## Checks if a flag is set for a row
+  def HasFlag(self, row, flag):
+    return self.Flags[row] & flag != 0
+
+
+  ## Retrieves index of a string, storing it if it has not been seen
+  #
+  #  \param value
+  #      \b \e str : String to store
+  #  \return
+  #      \b \e int : Index in \b \e Strings
+  def Intern(self, value):
+    index = self.StringIndexes.get(value)
+    if index == None:
+      index = len(self.Strings)
+      self.Strings.append(value)
+      self.StringIndexes[value] = index
+
+    return index
+
+
+  ## Checks rows against filesystem & updates flags of changed files
+  #
+  #  Rows are grouped by directory, so each directory is read once with
+  #  \b \e os.scandir. Missing files need no further system calls & only
+  #  one stat call is made for other files. Rows with same stat snapshot
+  #  as previous check keep their flags.
+  #
+  #  \return
+  #      \b \e tuple : List of changed row indexes & \b \e True if any
+  #      files are missing
+  def Refresh(self):
+    # Rows grouped by source & sub-directory of filename
+    dirs = {}
+    for ROW, NAME in enumerate(self.Names):
+      head, sep, name = NAME.rpartition(os.sep)
+      dirs.setdefault((self.Sources[ROW], head,), []).append((ROW, name,))
+
+    changed = []
+    missing = False
+    mtimes = self.MTimes
+    modes = self.Modes
+    all_flags = self.Flags
+
+    for (SOURCE, HEAD), ROWS in dirs.items():
+      entries = GetDirEntries(os.path.join(self.Strings[SOURCE], HEAD))
+
+      for ROW, NAME in ROWS:
+        entry = entries.get(NAME)
+        st = None
+        if entry != None:
+          try:
+            st = entry.stat(follow_symlinks=False)
+
+          except OSError:
+            pass
+
+        old_flags = all_flags[ROW]
+        user_exec = old_flags & FLAG_USER_EXEC != 0
+
+        # Target of a link can change without changing link itself
+        if st != None and not old_flags & FLAG_LINK and st.st_mtime_ns == mtimes[ROW] \
+            and st.st_mode == modes[ROW]:
+          if old_flags & FLAG_MISSING:
+            missing = True
+
+          continue
+
+        stamp = GetStatStamp(st)
+        old_stamp = self.GetStamp(ROW)
+        if stamp == old_stamp and not old_flags & FLAG_LINK:
+          # Still missing
+          missing = True
+          continue
+
+        if st == None:
+          flags = FLAG_MISSING
+
+        else:
+          flags = GetStatFlags(st)
+          if flags & FLAG_LINK and not os.path.exists(entry.path):
+            flags |= FLAG_MISSING
+
+        # Executable mark set by user is kept
+        if user_exec:
+          flags |= FLAG_EXEC|FLAG_USER_EXEC
+
+        if flags & FLAG_MISSING:
+          missing = True
+
+        mtimes[ROW], modes[ROW] = stamp
+        if flags != old_flags or stamp != old_stamp and old_stamp != NO_STAMP:
+          # Contents may have changed, so MIME type is detected again
+          if stamp[0] != old_stamp[0]:
+            self.Types[ROW] = 0
+
+          all_flags[ROW] = flags
+          changed.append(ROW)
+
+    return (changed, missing,)
+
+
+  ## Sets or clears a flag for a row
+  def SetFlag(self, row, flag, value=True):
+    if value:
+      self.Flags[row] |= flag
+
+    else:
+      self.Flags[row] &= ~flag
+
+
+  ## Sets all flags of a row
+  def SetFlags(self, row, flags):
+    self.Flags[row] = flags
+
+
+  ## Sets target directory of a row
+  def SetTarget(self, row, target):
+    self.Targets[row] = self.Intern(target)
+
+
+  ## Sets MIME type of a row
+  #
+  #  \param mime
+  #      \b \e str : MIME type or \b \e None to unset
+  def SetType(self, row, mime):
+    self.Types[row] = self.Intern(mime)
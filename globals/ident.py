@@ -267,6 +267,7 @@ class ChkId(FieldId):
     self.MD5 = self.NewId()
     self.NOTIFY = self.NewId()
     self.REMOVE = self.NewId()
+    self.SHA256 = self.NewId()
     self.STRIP = self.NewId()
     self.SYMLINK = self.NewId()
     self.TARGET = self.NewId()
@@ -336,7 +337,10 @@ class SelId(FieldId):
   def __init__(self):
     FieldId.__init__(self)
 
+    self.COMPRESSION = self.NewId()
+    self.COMPRESSLEVEL = self.NewId()
     self.LICENSE = self.NewId()
+    self.THREADS = self.NewId()
     self.URGENCY = self.NewId()
 
 selid = SelId()
@@ -1,18 +1,283 @@
 ## \package globals.mime
+#
+#  Detects MIME types of files
+#
+#  Uses libmagic bindings if available. Otherwise a single long-lived
+#  'file' process is fed batches of filenames, so a process is not
+#  started for every file.
 
 # MIT licensing
 # See: docs/LICENSE.txt
 
 
-from globals.execute import GetCommandOutput
-from globals.execute import GetExecutable
+import mimetypes, os, subprocess, threading
+from collections import OrderedDict
 
+import util
 
-## TODO: Doxygen
-def GetFileMimeType(filename):
-  CMD_file = GetExecutable("file")
+from libdbr.paths import getExecutable
+
+try:
+  import magic
+
+except ImportError:
+  magic = None
+
+
+logger = util.getLogger()
 
-  if not CMD_file:
+## Maximum number of filenames written to 'file' process before reading results
+batch_size = 64
+
+
+## Retrieves the key used to cache a file's MIME type
+#
+#  \param filename
+#      \b \e str : Path to file
+#  \return
+#      \b \e tuple : Path, modification time, & size or \b \e None if file
+#      does not exist
+def GetCacheKey(filename):
+  try:
+    st = os.stat(filename)
+
+  except OSError:
     return None
 
-  return GetCommandOutput(CMD_file, ("--mime-type", "--brief", filename,))
+  return (filename, st.st_mtime_ns, st.st_size)
+
+
+## Detects MIME types with libmagic bindings
+#
+#  Supports both the 'python-magic' & 'file-magic' modules.
+class MagicDetector:
+  def __init__(self):
+    self.Lock = threading.Lock()
+
+    if hasattr(magic, "Magic"):
+      self.Magic = magic.Magic(mime=True)
+      self.Detect = self.Magic.from_file
+
+    else:
+      self.Magic = magic.open(magic.MAGIC_MIME_TYPE)
+      self.Magic.load()
+      self.Detect = self.Magic.file
+
+
+  ## Retrieves MIME types of multiple files
+  #
+  #  \param filenames
+  #      \b \e List of paths to files
+  #  \return
+  #      \b \e List of MIME type strings in same order as \b \e filenames
+  def GetTypes(self, filenames):
+    types = []
+
+    # libmagic handles are not thread safe
+    with self.Lock:
+      for F in filenames:
+        try:
+          types.append(self.Detect(F))
+
+        except Exception:
+          types.append(None)
+
+    return types
+
+
+## Detects MIME types with a persistent 'file' process
+class FileCommandDetector:
+  ## Constructor
+  #
+  #  \param cmd
+  #      \b \e str : Path to 'file' executable
+  def __init__(self, cmd):
+    self.Command = cmd
+    self.Process = None
+    self.Lock = threading.Lock()
+
+
+  ## Starts the 'file' process if it is not running
+  def Start(self):
+    if self.Process and self.Process.poll() == None:
+      return
+
+    # '-n' flushes output after each file so results can be read while process is running
+    self.Process = subprocess.Popen([self.Command, "--mime-type", "--brief", "-n", "-f", "-"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+  ## Stops the 'file' process
+  def Stop(self):
+    if self.Process:
+      self.Process.stdin.close()
+      self.Process.wait()
+      self.Process = None
+
+
+  ## Retrieves MIME types of multiple files
+  #
+  #  \param filenames
+  #      \b \e List of paths to files
+  #  \return
+  #      \b \e List of MIME type strings in same order as \b \e filenames
+  def GetTypes(self, filenames):
+    types = []
+
+    with self.Lock:
+      for INDEX in range(0, len(filenames), batch_size):
+        batch = filenames[INDEX:INDEX+batch_size]
+
+        try:
+          types += self.GetBatch(batch)
+
+        except OSError:
+          logger.warn("MIME type process failed, restarting")
+
+          self.Process = None
+          types += [None] * len(batch)
+
+    return types
+
+
+  ## Writes a batch of filenames to the 'file' process & reads results
+  def GetBatch(self, filenames):
+    self.Start()
+
+    # Filenames are separated by newlines
+    names = [F for F in filenames if "\n" not in F]
+    self.Process.stdin.write(b"".join(os.fsencode(F) + b"\n" for F in names))
+    self.Process.stdin.flush()
+
+    results = {}
+    for F in names:
+      line = self.Process.stdout.readline()
+      if not line:
+        raise OSError("'file' process exited")
+
+      results[F] = line.decode("utf-8", "replace").strip() or None
+
+    return [results.get(F) for F in filenames]
+
+
+## Cached MIME type detection
+class MimeService:
+  ## Constructor
+  #
+  #  \param cacheSize
+  #      \b \e int : Maximum number of cached results
+  def __init__(self, cacheSize=20000):
+    self.CacheSize = cacheSize
+    self.Cache = OrderedDict()
+    self.Lock = threading.Lock()
+    self.Detector = None
+
+    if magic:
+      try:
+        self.Detector = MagicDetector()
+
+      except Exception:
+        logger.warn("Could not initialize libmagic, using 'file' command")
+
+    if not self.Detector:
+      CMD_file = getExecutable("file")
+      if CMD_file:
+        self.Detector = FileCommandDetector(CMD_file)
+
+
+  ## Checks if MIME types can be detected
+  def IsAvailable(self):
+    return self.Detector != None
+
+
+  ## Retrieves MIME types of multiple files
+  #
+  #  Only files that are not cached or that have changed since they
+  #  were cached are passed to the detector.
+  #
+  #  \param filenames
+  #      \b \e List of paths to files
+  #  \return
+  #      \b \e List of MIME type strings in same order as \b \e filenames
+  #      (\b \e None for files that do not exist)
+  def GetTypes(self, filenames):
+    filenames = list(filenames)
+    types = [None] * len(filenames)
+
+    if not self.Detector:
+      return types
+
+    keys = [GetCacheKey(F) for F in filenames]
+    uncached = []
+
+    with self.Lock:
+      for INDEX, KEY in enumerate(keys):
+        if KEY in self.Cache:
+          self.Cache.move_to_end(KEY)
+          types[INDEX] = self.Cache[KEY]
+
+        elif KEY:
+          uncached.append(INDEX)
+
+    if uncached:
+      detected = self.Detector.GetTypes([filenames[I] for I in uncached])
+
+      with self.Lock:
+        for INDEX, MIME in zip(uncached, detected):
+          types[INDEX] = MIME
+
+          if MIME:
+            self.Cache[keys[INDEX]] = MIME
+
+        while len(self.Cache) > self.CacheSize:
+          self.Cache.popitem(last=False)
+
+    return types
+
+
+  ## Retrieves MIME type of a file
+  #
+  #  \param filename
+  #      \b \e str : Path to file
+  #  \return
+  #      \b \e str : MIME type or \b \e None
+  def GetType(self, filename):
+    return self.GetTypes((filename,))[0]
+
+
+## Default service instance
+service = MimeService()
+
+
+## Retrieves MIME type of a file
+#
+#  \param filename
+#      \b \e str : Path to file
+#  \return
+#      \b \e str : MIME type or empty string if type cannot be detected
+def GetFileMimeType(filename):
+  return service.GetType(filename) or ""
+
+
+## Retrieves MIME types of multiple files
+#
+#  \param filenames
+#      \b \e List of paths to files
+#  \return
+#      \b \e List of MIME type strings in same order as \b \e filenames
+#      (empty strings for types that cannot be detected)
+def GetFileMimeTypes(filenames):
+  return [T or "" for T in service.GetTypes(filenames)]
+
+
+## Guesses MIME type of a file from its filename extension
+#
+#  The file is not read, so this is fast enough to be called where the
+#  real type is resolved later.
+#
+#  \param filename
+#      \b \e str : Path to file
+#  \return
+#      \b \e str : MIME type or empty string if extension is not recognized
+def GuessFileMimeType(filename):
+  return mimetypes.guess_type(filename)[0] or ""
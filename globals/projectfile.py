@@ -0,0 +1,309 @@
+## \package globals.projectfile
+#
+#  Reading & writing project files
+#
+#  Legacy projects are plain text with each page's data between
+#  "<<NAME>>" & "<</NAME>>" tags. Indexed projects start with a table of
+#  section offsets, so sections can be read without scanning the file.
+#
+#  Indexed project layout:
+#    - Line 1: "[DEBREATE-INDEXED-<format version>]"
+#    - Line 2: Offset of index, 20 digits
+#    - Section data, UTF-8 encoded, each followed by a newline.
+#    - Index: JSON object with Debreate version & list of
+#      [name, offset, length] for each section.
+#
+#  Offsets are in bytes, relative to end of line 2. The index is written
+#  after section data, so sections can be written as they are generated.
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+
+import json, os, tempfile
+
+from libdbr.fileio import getUmask
+
+
+## Version of indexed project format
+PROJECT_format_version = 2
+
+## First line of indexed project files
+PROJECT_indexed_magic = "[DEBREATE-INDEXED-{}]".format(PROJECT_format_version)
+
+# Size of buffer used for writing projects
+write_buffer_size = 256 * 1024
+
+## Project sections in the order they are saved
+project_sections = (
+  "CTRL",
+  "FILES",
+  "SCRIPTS",
+  "CHANGELOG",
+  "COPYRIGHT",
+  "MENU",
+  "BUILD",
+)
+
+
+## Extracts sections from legacy project text
+#
+#  Text is scanned once from start to end.
+#
+#  \param text
+#      \b \e str : Project text or concatenated page data
+#  \return
+#      \b \e dict : Section data keyed by section name
+def ParseLegacySections(text):
+  sections = {}
+
+  pos = 0
+  while True:
+    start = text.find("<<", pos)
+    if start < 0:
+      break
+
+    tag_end = text.find(">>\n", start)
+    if tag_end < 0:
+      break
+
+    name = text[start+2:tag_end]
+
+    # Tags must be at start of line
+    if start > 0 and text[start-1] != "\n" or not name.replace("_", "").isalnum():
+      pos = start + 2
+      continue
+
+    data_start = tag_end + 3
+    data_end = text.find("\n<</{}>>".format(name), data_start)
+    if data_end < 0:
+      # Closing tag of section data ending without newline
+      data_end = text.find("<</{}>>".format(name), data_start)
+      if data_end < 0:
+        pos = data_start
+        continue
+
+    sections[name] = text[data_start:data_end]
+    pos = data_end
+
+  return sections
+
+
+## Formats sections as legacy project text
+#
+#  \param app_version
+#      \b \e str : Debreate version written in header
+#  \param sections
+#      \b \e dict : Section data keyed by section name
+#  \return
+#      \b \e str : Project text
+def FormatLegacyProject(app_version, sections):
+  lines = ["[DEBREATE-{}]".format(app_version)]
+
+  for NAME in GetSectionOrder(sections):
+    lines.append("<<{0}>>\n{1}\n<</{0}>>".format(NAME, sections[NAME]))
+
+  return "\n".join(lines)
+
+
+## Retrieves names of sections in the order they are saved
+#
+#  Unknown sections are placed after known ones.
+def GetSectionOrder(sections):
+  order = [S for S in project_sections if S in sections]
+
+  return order + sorted(S for S in sections if S not in project_sections)
+
+
+## Checks if a file is an indexed project
+#
+#  \param path
+#      \b \e str : Project file path
+def IsIndexedProject(path):
+  try:
+    with open(path, "rb") as fin:
+      return fin.readline().rstrip(b"\n").decode("utf-8", "replace") == PROJECT_indexed_magic
+
+  except OSError:
+    return False
+
+
+## Reads a project file in indexed or legacy format
+#
+#  For indexed projects, only requested sections are read.
+#
+#  \param path
+#      \b \e str : Project file path
+#  \param names
+#      Names of sections to read or \b \e None to read all
+#  \return
+#      \b \e tuple : Debreate version string & \b \e dict of section data
+#  \throws ValueError
+#      If file is not a Debreate project
+def ReadProject(path, names=None):
+  with open(path, "rb") as fin:
+    header = fin.readline().rstrip(b"\r\n").decode("utf-8")
+
+    if header == PROJECT_indexed_magic:
+      try:
+        index_offset = int(fin.readline())
+        data_start = fin.tell()
+        fin.seek(data_start + index_offset)
+        index = json.loads(fin.readline().decode("utf-8"))
+
+        app_version = index["version"]
+        table = index["sections"]
+
+      except (ValueError, KeyError):
+        raise ValueError("Corrupt project index: {}".format(path))
+
+      sections = {}
+      for NAME, OFFSET, LENGTH in table:
+        if names != None and NAME not in names:
+          continue
+
+        fin.seek(data_start + OFFSET)
+        data = fin.read(LENGTH)
+        if len(data) != LENGTH:
+          raise ValueError("Project file is truncated: {}".format(path))
+
+        sections[NAME] = data.decode("utf-8")
+
+      return (app_version, sections,)
+
+    if not header.lstrip("[").startswith("DEBREATE"):
+      raise ValueError("Not a valid Debreate project: {}".format(path))
+
+    if header.startswith("[DEBREATE-INDEXED-"):
+      raise ValueError("Unsupported project format: {}".format(path))
+
+    text = header + "\n" + fin.read().decode("utf-8")
+
+  # Legacy projects may have been saved with other line endings
+  text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+  app_version = header.strip("[]").split("-", 1)[-1]
+  sections = ParseLegacySections(text)
+
+  if names != None:
+    sections = {N: sections[N] for N in names if N in sections}
+
+  return (app_version, sections,)
+
+
+## Writes a project file in indexed format
+#
+#  \param path
+#      \b \e str : Project file path
+#  \param app_version
+#      \b \e str : Debreate version written in header
+#  \param sections
+#      \b \e dict : Section data keyed by section name
+def WriteProject(path, app_version, sections):
+  WriteProjectStream(path, app_version,
+      ((N, (sections[N],),) for N in GetSectionOrder(sections)))
+
+
+## Writes a project file in indexed format as sections are generated
+#
+#  Data is written to a temporary file in same directory, which replaces
+#  project file after it has been synced to disk. If writing fails, the
+#  existing project file is not changed.
+#
+#  \param path
+#      \b \e str : Project file path
+#  \param app_version
+#      \b \e str : Debreate version written in header
+#  \param sections
+#      Iterable of (name, chunks) tuples, where chunks is an iterable of
+#      strings forming section data. \b \e None items are skipped.
+def WriteProjectStream(path, app_version, sections):
+  path = os.path.abspath(path)
+  target_dir = os.path.dirname(path)
+
+  fd, tmp_path = tempfile.mkstemp(prefix=".{}-".format(os.path.basename(path)), suffix=".tmp",
+      dir=target_dir)
+
+  try:
+    with open(fd, "wb", buffering=write_buffer_size) as fout:
+      fout.write("{}\n".format(PROJECT_indexed_magic).encode("utf-8"))
+
+      # Offset of index is filled in after sections are written
+      pointer_pos = fout.tell()
+      fout.write(b"0" * 20 + b"\n")
+
+      table = []
+      offset = 0
+      for SECTION in sections:
+        if SECTION == None:
+          continue
+
+        name, chunks = SECTION
+        length = 0
+        for CHUNK in chunks:
+          data = CHUNK.encode("utf-8")
+          fout.write(data)
+          length += len(data)
+
+        table.append([name, offset, length])
+
+        # Newline between sections for readability
+        fout.write(b"\n")
+        offset += length + 1
+
+      index = json.dumps({"version": app_version, "sections": table}, separators=(",", ":"))
+      fout.write("{}\n".format(index).encode("utf-8"))
+
+      fout.seek(pointer_pos)
+      fout.write("{:020d}".format(offset).encode("utf-8"))
+
+      fout.flush()
+      os.fsync(fout.fileno())
+
+    # Keep permissions of existing file, otherwise use default permissions
+    if os.path.isfile(path):
+      mode = os.stat(path).st_mode & 0o7777
+
+    else:
+      mode = 0o666 & ~getUmask()
+
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+  except:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+
+    raise
+
+  # Make sure rename is stored on disk
+  try:
+    dir_fd = os.open(target_dir, os.O_RDONLY)
+    try:
+      os.fsync(dir_fd)
+
+    finally:
+      os.close(dir_fd)
+
+  except OSError:
+    pass
+
+
+## Converts a project file between legacy & indexed formats
+#
+#  \param source
+#      \b \e str : Project file to read
+#  \param target
+#      \b \e str : Project file to write
+#  \param legacy
+#      \b \e bool : If \b \e True, writes legacy format
+def ConvertProject(source, target, legacy=False):
+  app_version, sections = ReadProject(source)
+
+  if legacy:
+    with open(target, "w", encoding="utf-8", newline="") as fout:
+      fout.write(FormatLegacyProject(app_version, sections))
+
+    return
+
+  WriteProject(target, app_version, sections)
@@ -0,0 +1,189 @@
+## \package globals.scanner
+#
+#  Recursive directory scanning for importing files
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+
+import os, threading
+
+import util
+
+
+logger = util.getLogger()
+
+
+## Scans files & directories to be added to a file list
+#
+#  Directories are read with \b \e os.scandir, so file types are known
+#  without a stat call for each file. Results are passed to a callback
+#  in batches while scanning continues.
+class FileScanner:
+  ## Constructor
+  #
+  #  \param paths
+  #      \b \e List of files & directories to scan
+  #  \param individually
+  #      \b \e bool : If \b \e True, files inside directories are listed
+  #      instead of the directories themselves
+  #  \param preserveTop
+  #      \b \e bool : If \b \e False, directories in \b \e paths are
+  #      replaced by their contents
+  #  \param batchSize
+  #      \b \e int : Number of files passed to callback at once
+  def __init__(self, paths, individually=True, preserveTop=True, batchSize=500):
+    self.Paths = list(paths)
+    self.Individually = individually
+    self.PreserveTop = preserveTop
+    self.BatchSize = batchSize
+
+    ## Current directory being scanned
+    self.Current = None
+    ## Number of files found
+    self.Count = 0
+
+    self.Cancelled = threading.Event()
+    self.Seen = set()
+    self.Batch = []
+
+
+  ## Stops scanning
+  #
+  #  Can be called from any thread.
+  def Cancel(self):
+    self.Cancelled.set()
+
+
+  ## Checks if scanning was stopped
+  def IsCancelled(self):
+    return self.Cancelled.is_set()
+
+
+  ## Adds a file to current batch if it has not already been found
+  #
+  #  \param filename
+  #      \b \e str : Path relative to \b \e source
+  #  \param source
+  #      \b \e str : Directory that \b \e filename is relative to
+  #  \param entry
+  #      \b \e os.DirEntry of file or \b \e None
+  #  \param callback
+  #      Function called with list of (filename, source, entry) tuples
+  def Add(self, filename, source, entry, callback):
+    path = os.path.join(source, filename)
+    if path in self.Seen:
+      return
+
+    self.Seen.add(path)
+    self.Batch.append((filename, source, entry,))
+    self.Count += 1
+
+    if len(self.Batch) >= self.BatchSize:
+      self.Flush(callback)
+
+
+  ## Passes current batch to callback
+  def Flush(self, callback):
+    if self.Batch:
+      callback(self.Batch)
+      self.Batch = []
+
+
+  ## Retrieves paths to be scanned
+  #
+  #  \return
+  #      \b \e List of paths with top-level directories expanded if
+  #      \b \e PreserveTop is \b \e False
+  def GetTopLevel(self):
+    if self.PreserveTop:
+      return self.Paths
+
+    top_level = []
+    for P in self.Paths:
+      if os.path.isdir(P):
+        try:
+          top_level += [os.path.join(P, C) for C in sorted(os.listdir(P))]
+
+        except OSError:
+          logger.warn("Could not read directory: {}".format(P))
+
+        continue
+
+      top_level.append(P)
+
+    return top_level
+
+
+  ## Scans paths
+  #
+  #  Can be run in a background thread. The callback is called from the
+  #  thread that runs this method.
+  #
+  #  \param callback
+  #      Function called with list of (filename, source, entry) tuples.
+  #      \b \e filename is relative to \b \e source & \b \e entry is an
+  #      \b \e os.DirEntry or \b \e None.
+  #  \return
+  #      \b \e True if scan completed, \b \e False if cancelled
+  def Scan(self, callback):
+    for P in self.GetTopLevel():
+      if self.IsCancelled():
+        return False
+
+      if not self.Individually or os.path.isfile(P):
+        self.Add(os.path.basename(P), os.path.dirname(P), None, callback)
+
+      elif os.path.isdir(P):
+        if not self.ScanDir(P, callback):
+          return False
+
+    self.Flush(callback)
+
+    return not self.IsCancelled()
+
+
+  ## Scans a directory tree
+  #
+  #  Files are listed relative to the parent of \b \e top, so the
+  #  top-level directory name is preserved. Symbolic links to
+  #  directories are not followed.
+  #
+  #  \param top
+  #      \b \e str : Directory to scan
+  #  \param callback
+  #      Function called with batches of files
+  #  \return
+  #      \b \e True if scan completed, \b \e False if cancelled
+  def ScanDir(self, top, callback):
+    source = os.path.dirname(top)
+    dirs = [top]
+
+    while dirs:
+      if self.IsCancelled():
+        return False
+
+      self.Current = dirs.pop()
+
+      try:
+        with os.scandir(self.Current) as it:
+          entries = sorted(it, key=lambda E: E.name)
+
+      except OSError:
+        logger.warn("Could not read directory: {}".format(self.Current))
+        continue
+
+      subdirs = []
+      for ENTRY in entries:
+        if ENTRY.is_dir():
+          if not ENTRY.is_symlink():
+            subdirs.append(ENTRY.path)
+
+          continue
+
+        self.Add(os.path.relpath(ENTRY.path, source), source, ENTRY, callback)
+
+      # Reversed so directories are popped in sorted order
+      dirs += reversed(subdirs)
+
+    return True
@@ -184,7 +184,7 @@ TT_menu = {
 
 TT_build = {
   "md5": GT("Creates a checksum for all staged files within the package"),
-  "md5_disabled": GT("Install md5sum package for this option"),
+  "sha256": GT("Also creates a SHA-256 checksum for all staged files"),
   "strip": (
     GT("Discards unneeded symbols from binary files"), "",
     GT("See \"man 1 strip\""),
@@ -196,6 +196,12 @@ TT_build = {
     GT("See \"Help ➜ Reference ➜ Lintian Tags Explanation\""),
     ),
   "lintian_disabled": GT("Install lintian package for this option"),
+  "compression": (
+    GT("Compression format of package archives"), "",
+    GT("Default uses dpkg-deb's default format"),
+    ),
+  "compression level": GT("Higher levels create smaller packages but take longer to build"),
+  "threads": GT("Number of threads used for copying, hashing & compressing files"),
   btnid.BUILD: GT("Start building"),
   "install": (
     GT("Install package using a system installer after build"), "",
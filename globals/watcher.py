@@ -0,0 +1,420 @@
+## \package globals.watcher
+#
+#  Watches directories for changes to their contents
+#
+#  Uses Linux inotify through ctypes if available. Otherwise directories
+#  are polled & compared with their previous contents.
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+
+import ctypes, ctypes.util, os, select, struct, threading
+
+import util
+
+
+logger = util.getLogger()
+
+## File or directory was created in watched directory
+FS_ADD = "add"
+## File or directory was removed from watched directory
+FS_REMOVE = "remove"
+## File contents or attributes changed
+FS_MODIFY = "modify"
+## Events were lost, all watched paths should be re-checked
+FS_OVERFLOW = "overflow"
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+watch_mask = IN_ATTRIB|IN_CLOSE_WRITE|IN_MOVED_FROM|IN_MOVED_TO|IN_CREATE|IN_DELETE \
+    |IN_DELETE_SELF|IN_MOVE_SELF|IN_ONLYDIR
+
+# Size of struct inotify_event without name
+event_header = struct.Struct("iIII")
+
+
+## Loads inotify functions from C library
+#
+#  \return
+#      \b \e ctypes.CDLL instance or \b \e None if inotify is not available
+def GetInotifyLibrary():
+  try:
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    libc.inotify_init1
+    libc.inotify_add_watch
+    libc.inotify_rm_watch
+
+  except (OSError, AttributeError):
+    return None
+
+  return libc
+
+
+## Reads snapshot of a directory's contents for polling
+#
+#  \param path
+#      \b \e str : Directory to read
+#  \return
+#      \b \e dict : Filenames mapped to (modification time, mode, size) or
+#      \b \e None if directory cannot be read
+def GetDirSnapshot(path):
+  snapshot = {}
+
+  try:
+    with os.scandir(path) as entries:
+      for E in entries:
+        try:
+          st = E.stat(follow_symlinks=False)
+          snapshot[E.name] = (st.st_mtime_ns, st.st_mode, st.st_size)
+
+        except OSError:
+          pass
+
+  except OSError:
+    return None
+
+  return snapshot
+
+
+## Watches directories using inotify
+class InotifyBackend:
+  ## Constructor
+  #
+  #  \param libc
+  #      \b \e ctypes.CDLL with inotify functions
+  #  \param mask
+  #      \b \e int : inotify events to watch for
+  def __init__(self, libc, mask=watch_mask):
+    self.Libc = libc
+    self.Mask = mask
+    self.FD = libc.inotify_init1(IN_NONBLOCK|IN_CLOEXEC)
+    if self.FD < 0:
+      raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    ## Watch descriptors mapped to paths
+    self.Paths = {}
+    ## Paths mapped to watch descriptors
+    self.Descriptors = {}
+
+
+  ## Starts watching a directory
+  def Add(self, path):
+    if path in self.Descriptors:
+      return
+
+    wd = self.Libc.inotify_add_watch(self.FD, os.fsencode(path), self.Mask)
+    if wd < 0:
+      logger.debug("Cannot watch directory ({}): {}".format(os.strerror(ctypes.get_errno()), path))
+      return
+
+    self.Paths[wd] = path
+    self.Descriptors[path] = wd
+
+
+  ## Closes inotify file descriptor
+  def Close(self):
+    os.close(self.FD)
+
+
+  ## Waits for changes
+  #
+  #  \param timeout
+  #      \b \e float : Maximum number of seconds to wait
+  #  \return
+  #      \b \e List of (action, path) tuples
+  def Read(self, timeout):
+    ready = select.select([self.FD], [], [], timeout)[0]
+    if not ready:
+      return []
+
+    try:
+      data = os.read(self.FD, 65536)
+
+    except BlockingIOError:
+      return []
+
+    changes = []
+    offset = 0
+    while offset < len(data):
+      wd, mask, cookie, name_len = event_header.unpack_from(data, offset)
+      offset += event_header.size
+      name = data[offset:offset+name_len].rstrip(b"\0")
+      offset += name_len
+
+      if mask & IN_Q_OVERFLOW:
+        changes.append((FS_OVERFLOW, None,))
+        continue
+
+      dir_path = self.Paths.get(wd)
+      if dir_path == None:
+        continue
+
+      if mask & IN_IGNORED:
+        # Watch was removed by kernel (e.g. directory deleted)
+        self.Paths.pop(wd, None)
+        if self.Descriptors.get(dir_path) == wd:
+          self.Descriptors.pop(dir_path)
+
+        continue
+
+      path = os.path.join(dir_path, os.fsdecode(name)) if name else dir_path
+
+      if mask & (IN_CREATE|IN_MOVED_TO):
+        changes.append((FS_ADD, path,))
+
+      elif mask & (IN_DELETE|IN_MOVED_FROM|IN_DELETE_SELF|IN_MOVE_SELF):
+        changes.append((FS_REMOVE, path,))
+
+      elif mask & (IN_ATTRIB|IN_CLOSE_WRITE|IN_MODIFY):
+        changes.append((FS_MODIFY, path,))
+
+    return changes
+
+
+  ## Stops watching a directory
+  def Remove(self, path):
+    wd = self.Descriptors.pop(path, None)
+    if wd != None:
+      self.Paths.pop(wd, None)
+      self.Libc.inotify_rm_watch(self.FD, wd)
+
+
+## Watches directories by comparing their contents at intervals
+class PollingBackend:
+  ## Constructor
+  #
+  #  \param interval
+  #      \b \e float : Seconds between checks
+  def __init__(self, interval=2.0):
+    self.Interval = interval
+    self.Snapshots = {}
+    self.Wake = threading.Event()
+
+
+  ## Starts watching a directory
+  def Add(self, path):
+    if path not in self.Snapshots:
+      self.Snapshots[path] = GetDirSnapshot(path)
+
+
+  ## Nothing to close
+  def Close(self):
+    pass
+
+
+  ## Waits for interval & compares directories with previous snapshots
+  #
+  #  \param timeout
+  #      \b \e float : Maximum number of seconds to wait
+  #  \return
+  #      \b \e List of (action, path) tuples
+  def Read(self, timeout):
+    self.Wake.wait(min(timeout, self.Interval))
+    self.Wake.clear()
+
+    changes = []
+    for DIR in list(self.Snapshots):
+      old = self.Snapshots.get(DIR)
+      new = GetDirSnapshot(DIR)
+      self.Snapshots[DIR] = new
+
+      if old == new:
+        continue
+
+      if new == None:
+        changes.append((FS_REMOVE, DIR,))
+        continue
+
+      if old == None:
+        old = {}
+
+      for NAME in new:
+        if NAME not in old:
+          changes.append((FS_ADD, os.path.join(DIR, NAME),))
+
+        elif old[NAME] != new[NAME]:
+          changes.append((FS_MODIFY, os.path.join(DIR, NAME),))
+
+      for NAME in old:
+        if NAME not in new:
+          changes.append((FS_REMOVE, os.path.join(DIR, NAME),))
+
+    return changes
+
+
+  ## Stops watching a directory
+  def Remove(self, path):
+    self.Snapshots.pop(path, None)
+
+
+## Watches directories in a background thread
+#
+#  Changes are passed to a callback in batches. The callback is called
+#  from the watcher thread.
+class FileWatcher:
+  ## Constructor
+  #
+  #  \param callback
+  #      Function called with list of (action, path) tuples, where action
+  #      is one of \b \e FS_ADD, \b \e FS_REMOVE, \b \e FS_MODIFY or
+  #      \b \e FS_OVERFLOW
+  #  \param interval
+  #      \b \e float : Seconds between checks if polling is used
+  #  \param writes
+  #      \b \e bool : If \b \e True, each write to a file is reported
+  #      instead of only when file is closed
+  def __init__(self, callback, interval=2.0, writes=False):
+    self.Callback = callback
+    self.Interval = interval
+    self.Writes = writes
+    self.Backend = None
+    self.Thread = None
+    self.Lock = threading.Lock()
+    self.Running = threading.Event()
+
+    ## Watched directories mapped to number of times they were added
+    self.Counts = {}
+    # Directories to be added to or removed from backend by watcher thread
+    self.Pending = {}
+
+
+  ## Creates inotify backend or polling backend if inotify is not available
+  def CreateBackend(self):
+    libc = GetInotifyLibrary()
+    if libc:
+      try:
+        if self.Writes:
+          return InotifyBackend(libc, watch_mask|IN_MODIFY)
+
+        return InotifyBackend(libc)
+
+      except OSError:
+        logger.warn("Could not initialize inotify, polling for file changes")
+
+    return PollingBackend(self.Interval)
+
+
+  ## Stops watching all directories
+  def Clear(self):
+    with self.Lock:
+      for DIR in self.Counts:
+        self.Pending[DIR] = False
+
+      self.Counts = {}
+
+
+  ## Checks if a directory is watched
+  def IsWatched(self, path):
+    return path in self.Counts
+
+
+  ## Thread loop that reads changes & passes them to callback
+  def Run(self):
+    while self.Running.is_set():
+      with self.Lock:
+        pending = self.Pending
+        self.Pending = {}
+
+      for DIR, ADD in pending.items():
+        if ADD:
+          self.Backend.Add(DIR)
+
+        else:
+          self.Backend.Remove(DIR)
+
+      try:
+        changes = self.Backend.Read(0.5)
+
+      except OSError:
+        logger.error("Watching directories failed, no longer watching for changes")
+        break
+
+      if changes and self.Running.is_set():
+        self.Callback(changes)
+
+    self.Backend.Close()
+
+
+  ## Starts watcher thread
+  def Start(self):
+    if self.Thread:
+      return
+
+    self.Backend = self.CreateBackend()
+    self.Running.set()
+
+    # New backend must watch all directories
+    with self.Lock:
+      self.Pending = {D: True for D in self.Counts}
+
+    self.Thread = threading.Thread(target=self.Run)
+    # Don't prevent app from exiting
+    self.Thread.daemon = True
+    self.Thread.start()
+
+
+  ## Stops watcher thread
+  def Stop(self):
+    if not self.Thread:
+      return
+
+    self.Running.clear()
+    if isinstance(self.Backend, PollingBackend):
+      self.Backend.Wake.set()
+
+    self.Thread.join()
+    self.Thread = None
+
+
+  ## Stops watching a directory
+  #
+  #  Directory is only removed after Unwatch has been called as many
+  #  times as Watch.
+  #
+  #  \param path
+  #      \b \e str : Directory path
+  #  \param count
+  #      \b \e int : Number of references to remove
+  def Unwatch(self, path, count=1):
+    with self.Lock:
+      count = self.Counts.get(path, 0) - count
+      if count > 0:
+        self.Counts[path] = count
+        return
+
+      if path in self.Counts:
+        self.Counts.pop(path)
+        self.Pending[path] = False
+
+
+  ## Starts watching a directory
+  #
+  #  Starts watcher thread if it is not running.
+  #
+  #  \param path
+  #      \b \e str : Directory path
+  #  \param count
+  #      \b \e int : Number of references to add
+  def Watch(self, path, count=1):
+    with self.Lock:
+      previous = self.Counts.get(path, 0)
+      self.Counts[path] = previous + count
+      if not previous:
+        self.Pending[path] = True
+
+    self.Start()
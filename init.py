@@ -25,6 +25,8 @@ from globals       import paths
 
 logger = util.getLogger()
 logger.startLogging()
+# Write log messages in background thread
+logger.startQueue()
 
 ## Module name displayed for Logger output.
 #  Should be set to 'init' or actual name of executable script.
@@ -92,6 +94,139 @@ if "clean" in parsed_commands:
   sys.exit(0)
 
 
+# Builds a project without initializing the GUI
+if "build" in parsed_commands:
+  from dbr.builder        import Builder
+  from dbr.builder        import DirectBuilder
+  from dbr.builder        import GetCompressionLevels
+  from dbr.builder        import backends
+  from dbr.builder        import compressors
+  from dbr.project        import ProjectModel
+  from globals.errorcodes import dbrerrno
+
+
+  if "log-level" in parsed_args_v:
+    logger.setLevel(parsed_args_v["log-level"])
+
+  if not parsed_path:
+    print("ERROR: Must supply a project file to build")
+    sys.exit(errno.EINVAL)
+
+  project = ProjectModel()
+  ret_code = project.Load(parsed_path)
+
+  if ret_code == dbrerrno.ENOENT:
+    print("ERROR: Project file does not exist: {}".format(parsed_path))
+    sys.exit(ret_code)
+
+  if ret_code != dbrerrno.SUCCESS:
+    print("ERROR: Not a valid Debreate project: {}".format(parsed_path))
+    sys.exit(ret_code)
+
+  build_path = os.getcwd()
+  filename = None
+
+  if "output" in parsed_args_v:
+    build_path = parsed_args_v["output"]
+
+    if build_path.lower().endswith(".deb"):
+      filename = os.path.basename(build_path)[:-4]
+      build_path = os.path.dirname(build_path) or os.getcwd()
+
+  build_path = os.path.abspath(build_path)
+  if not os.path.isdir(build_path):
+    print("ERROR: Output directory does not exist: {}".format(build_path))
+    sys.exit(errno.ENOENT)
+
+  jobs = parsed_args_v.get("jobs", str(project.Threads))
+  if not jobs.isdigit():
+    print("ERROR: Number of jobs must be a positive integer: {}".format(jobs))
+    sys.exit(errno.EINVAL)
+
+  backend = parsed_args_v.get("backend", "dpkg")
+  if backend not in backends:
+    print("ERROR: Backend must be one of {}: {}".format(", ".join(backends), backend))
+    sys.exit(errno.EINVAL)
+
+  if "compression" in parsed_args_v:
+    project.Compression = parsed_args_v["compression"]
+
+  # Format & level may also be read from project file
+  if project.Compression != None and project.Compression not in compressors:
+    print("ERROR: Compression must be one of {}: {}".format(", ".join(compressors), project.Compression))
+    sys.exit(errno.EINVAL)
+
+  if "compression-level" in parsed_args_v:
+    level = parsed_args_v["compression-level"]
+    if not level.isdigit():
+      print("ERROR: Compression level must be a positive integer: {}".format(level))
+      sys.exit(errno.EINVAL)
+
+    project.CompressionLevel = int(level)
+
+  if project.CompressionLevel != None:
+    levels = GetCompressionLevels(project.Compression)
+    if not levels and "compression-level" not in parsed_args_v:
+      # Level saved in project does not apply to format selected with --compression
+      project.CompressionLevel = None
+
+    elif project.CompressionLevel not in levels:
+      if not levels:
+        print("ERROR: Compression format does not use a level: {}".format(project.Compression))
+
+      else:
+        print("ERROR: Compression level must be {}-{} for {}: {}".format(levels[0], levels[-1],
+            project.Compression or "default format", project.CompressionLevel))
+
+      sys.exit(errno.EINVAL)
+
+  # Queued log messages are written first & line is written in a single
+  # call, so output is not interleaved with messages from writer thread
+  def printLine(text):
+    logger.sync()
+    sys.stdout.write("{}\n".format(text))
+
+  def printProgress(current, total, message=None):
+    if message:
+      printLine("[{}/{}] {}".format(current, total, message))
+
+  def printWarning(message, details=None):
+    if details:
+      printLine("WARNING: {}\n{}".format(message, details))
+
+    else:
+      printLine("WARNING: {}".format(message))
+
+  if "d" in parsed_args_s or "direct" in parsed_args_s:
+    builder = DirectBuilder(project, build_path, filename, onProgress=printProgress,
+        onWarning=printWarning, jobs=int(jobs))
+
+  else:
+    builder = Builder(project, build_path, filename, onProgress=printProgress, onWarning=printWarning,
+        jobs=int(jobs), backend=backend)
+  ret_code, result = builder.Build()
+
+  if builder.LintianOutput:
+    print("Lintian found some issues with the package:\n{}".format(builder.LintianOutput))
+
+  logger.endLogging()
+
+  if ret_code == dbrerrno.SUCCESS:
+    print("Package created: {}".format(result))
+    sys.exit(0)
+
+  if ret_code == dbrerrno.FEMPTY:
+    print("ERROR: Required control fields are empty: {}".format(result))
+
+  elif result:
+    print("ERROR: Package build failed\n{}".format(result))
+
+  else:
+    print("ERROR: Package build failed with unknown error")
+
+  sys.exit(ret_code)
+
+
 import subprocess, gettext
 
 wx = util.getModule("wx")
@@ -232,7 +367,10 @@ elif conf_values["center"]:
 
 working_dir = conf_values["workingdir"]
 
-if parsed_path:
+# Project left unsaved by a crashed session takes precedence over argument
+recovered = Debreate.StartAutosave()
+
+if parsed_path and not recovered:
   project_file = parsed_path
   logger.debug(GT("Opening project from argument: {}").format(project_file))
 
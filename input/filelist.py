@@ -10,15 +10,27 @@ from wx.lib.mixins.listctrl import TextEditMixin
 
 import util
 
-from dbr.colors       import COLOR_executable
-from dbr.colors       import COLOR_link
-from dbr.colors       import COLOR_warn
-from dbr.language     import GT
-from globals.fileitem import FileItem
-from globals.mime     import GetFileMimeType
-from globals.strings  import IsString
-from input.essential  import EssentialField
-from input.list       import ListCtrl
+from dbr.colors        import COLOR_executable
+from dbr.colors        import COLOR_link
+from dbr.colors        import COLOR_warn
+from dbr.event         import EVT_FILE_SYSTEM
+from dbr.event         import FileSystemEvent
+from dbr.language      import GT
+from globals.fileitem  import FileItem
+from globals.filemodel import FLAG_DIR
+from globals.filemodel import FLAG_EXEC
+from globals.filemodel import FLAG_LINK
+from globals.filemodel import FLAG_MISSING
+from globals.filemodel import FLAG_USER_EXEC
+from globals.filemodel import FileListModel
+from globals.filemodel import GetEntryFlags
+from globals.filemodel import GetFileFlags
+from globals.mime      import GetFileMimeTypes
+from globals.strings   import IsString
+from globals.watcher   import FS_OVERFLOW
+from globals.watcher   import FileWatcher
+from input.essential   import EssentialField
+from input.list        import ListCtrl
 
 
 logger = util.getLogger()
@@ -26,6 +38,7 @@ logger = util.getLogger()
 # ListCtrl report view style constants
 FL_HEADER = wx.LC_REPORT
 FL_NO_HEADER = wx.LC_REPORT|wx.LC_NO_HEADER
+FL_VIRTUAL = wx.LC_REPORT|wx.LC_VIRTUAL
 
 
 ## FileList columns
@@ -338,6 +351,9 @@ class _FileDropTarget(wx.FileDropTarget):
 
 ## An editable list of files
 #
+#  Uses a virtual list control. Rows are stored in a
+#  globals.filemodel.FileListModel instance instead of the control.
+#
 #  FIXME:
 #  - use methods from BasicFileList
 class FileList(BasicFileList):
@@ -362,9 +378,13 @@ class FileList(BasicFileList):
   def __init__(self, parent, winId=wx.ID_ANY, pos=wx.DefaultPosition, size=wx.DefaultSize,
       name=wx.ListCtrlNameStr, defaultValue=None, required=False, outLabel=None):
 
-    BasicFileList.__init__(self, parent, winId, True, pos, size, style=FL_HEADER, name=name,
+    BasicFileList.__init__(self, parent, winId, True, pos, size, style=FL_VIRTUAL, name=name,
         defaultValue=defaultValue, required=required, outLabel=outLabel)
 
+    ## Rows displayed in list
+    self.Model = FileListModel()
+    self.MainCtrl.SetDataSource(self)
+
     dt = _FileDropTarget(parent)
     parent.SetDropTarget(dt)
 
@@ -372,12 +392,25 @@ class FileList(BasicFileList):
     self.DEFAULT_TEXT_COLOR = self.GetForegroundColour()
     self.FOLDER_TEXT_COLOR = wx.BLUE
 
+    # Item attributes are shared by all rows with same flags
+    self.ItemAttrs = {}
+
+    ## Watches source directories of listed files for changes
+    self.Watcher = FileWatcher(self.OnFileSystemChanges)
+
+    # Rows of each path, rebuilt when needed after list changes
+    self.PathRows = None
+
+    # Changes to rows since last call to PopChanges (None if not tracked)
+    self.Changes = None
+
     # FIXME: Way to do this dynamically?
     col_width = 150
 
     self.SetColumns(columns.GetAllLabels(), col_width)
 
     self.Bind(wx.EVT_LEFT_DCLICK, self.OnLeftDown)
+    EVT_FILE_SYSTEM(self, wx.ID_ANY, self.OnFileSystemEvent)
 
     # Resize bug hack
     if wx.MAJOR_VERSION == 3 and wx.MINOR_VERSION == 0:
@@ -397,54 +430,185 @@ class FileList(BasicFileList):
   #  \return
   #  	\b \e bool : True if file exists on the filesystem
   def AddFile(self, filename, sourceDir, targetDir=None, executable=False):
-    list_index = self.GetItemCount()
-
     # Method can be called with two argements: absolute filename & target directory
     if targetDir == None:
       targetDir = sourceDir
       sourceDir = os.path.dirname(filename)
       filename = os.path.basename(filename)
 
-    source_path = os.path.join(sourceDir, filename)
+    if logger.debugging():
+      logger.debug(GT("Adding file: {}").format(os.path.join(sourceDir, filename)))
+
+    # File was added but does not exist on filesystem
+    return not self.AddFiles(((filename, sourceDir, targetDir, executable, None),))
+
+
+  ## Adds multiple files to end of list
+  #
+  #  The control is only updated once after all files are added.
+  #
+  #  \param files
+  #  	Iterable of (filename, sourceDir, targetDir, executable, entry)
+  #  	tuples. 'entry' is the \b \e os.DirEntry of the file from
+  #  	\b \e os.scandir, or \b \e None to read file attributes from
+  #  	the filesystem.
+  #  \return
+  #  	\b \e List of paths that do not exist on the filesystem
+  def AddFiles(self, files):
+    missing = []
+    rows = []
+
+    for FILENAME, SOURCE, TARGET, EXECUTABLE, ENTRY in files:
+      if ENTRY != None:
+        flags = GetEntryFlags(ENTRY, EXECUTABLE)
 
-    logger.debug(GT("Adding file: {}").format(source_path))
+      else:
+        flags = GetFileFlags(os.path.join(SOURCE, FILENAME), EXECUTABLE)
 
-    self.InsertStringItem(list_index, filename)
-    self.SetStringItem(list_index, columns.SOURCE, sourceDir)
-    self.SetStringItem(list_index, columns.TARGET, targetDir)
-    self.SetStringItem(list_index, columns.TYPE, GetFileMimeType(source_path))
+      rows.append((FILENAME, SOURCE, TARGET, flags,))
 
-    if os.path.islink(source_path):
-      self.SetItemTextColour(list_index, COLOR_link)
+      if flags & FLAG_MISSING:
+        missing.append(os.path.join(SOURCE, FILENAME))
 
-    elif os.path.isdir(source_path):
-      self.SetItemTextColour(list_index, self.FOLDER_TEXT_COLOR)
+    self.AddRows(rows)
 
-    else:
-      # TODO: Use 'GetFileMimeType' module to determine file type
-      if os.access(source_path, os.X_OK) or executable:
-        self.SetFileExecutable(list_index)
+    return missing
 
-      if not os.path.isfile(source_path):
-        self.SetItemBackgroundColour(list_index, COLOR_warn)
-        self.FileItems.insert(list_index, FileItem(source_path, targetDir))
 
-        # File was added but does not exist on filesystem
-        return False
+  ## Adds rows with known flags to end of list
+  #
+  #  Flags can be read in a background thread with
+  #  \b \e globals.filemodel.GetFileFlags before rows are added.
+  #
+  #  \param rows
+  #  	Iterable of (filename, sourceDir, targetDir, flags) tuples
+  #  \param track
+  #  	If \b \e False, rows are not included in tracked changes
+  def AddRows(self, rows, track=True):
+    first = len(self.Model)
 
-    self.FileItems.insert(list_index, FileItem(source_path, targetDir))
+    for FILENAME, SOURCE, TARGET, FLAGS in rows:
+      self.Model.Append(FILENAME, SOURCE, TARGET, FLAGS)
+
+    self.WatchRows(range(first, len(self.Model)))
+    self.SetItemCount(len(self.Model))
+
+    if track:
+      self.AddChange("add", range(first, len(self.Model)))
+
+
+  ## Records a change to rows if changes are tracked
+  #
+  #  \param action
+  #  	\b \e str : "add" for added or modified rows, "remove" for removed
+  #  	rows or "clear"
+  #  \param rows
+  #  	Row indexes
+  def AddChange(self, action, rows=()):
+    if self.Changes == None:
+      return
+
+    if action == "clear":
+      # Previous changes no longer matter
+      self.Changes = [("clear",)]
+
+    elif action == "add":
+      self.Changes.append(("add", [self.GetSaveLine(R) for R in rows]))
+
+    elif action == "remove":
+      self.Changes.append(("remove", [self.Model.GetPath(R) for R in rows]))
+
+
+  ## Removes an item from the file list
+  #
+  #  \param item
+  #  Can be integer index, file path string, or FileItem instance
+  #  \return
+  #  \b \e True if the file item was deleted from list
+  def Delete(self, item):
+    row = self.GetIndex(item)
+    if row == None:
+      logger.warn("Failed to deleted item from FileList: {}".format(item))
+      return False
+
+    filename = self.GetPath(row)
+
+    self.AddChange("remove", (row,))
+    self.WatchRows((row,), False)
+    self.Model.Delete((row,))
+    self.SetItemCount(len(self.Model))
+    self.MainCtrl.Refresh()
+
+    logger.debug("Deleted item from FileList: {}".format(filename))
     return True
 
 
   ## TODO: Doxygen
   def DeleteAllItems(self):
-    if ListCtrl.DeleteAllItems(self):
-      self.FileItems = []
-    else:
-      logger.warn("Failed to delete all items from FileList")
+    self.Watcher.Clear()
+    self.PathRows = None
+    self.Model.Clear()
+    self.AddChange("clear")
+    ListCtrl.DeleteAllItems(self)
 
-    logger.debug("Visual item count: {}".format(self.GetItemCount()))
-    logger.debug("Acutal item count: {}".format(len(self.FileItems)))
+    logger.debug("Item count: {}".format(self.GetItemCount()))
+
+
+  ## Retrieves the basename of the file's path
+  #
+  #  \param item
+  #  Can be integer index, file path string, or FileItem instance
+  def GetBasename(self, item):
+    return os.path.basename(self.GetPath(item))
+
+
+  ## Retrieves all file basenames in list
+  #
+  #  \return
+  #  \b \e Tuple list of string file basenames
+  def GetBasenames(self):
+    return tuple(os.path.basename(self.Model.GetPath(R)) for R in range(len(self.Model)))
+
+
+  ## Retrieves all executables
+  #
+  #  \param strings
+  #  If \b \e True, returns paths instead of FileItem instances
+  def GetExecutables(self, strings=True):
+    exe_list = []
+    for ROW in range(len(self.Model)):
+      if self.Model.GetFlags(ROW) & FLAG_EXEC and not self.Model.GetFlags(ROW) & FLAG_MISSING:
+        if strings:
+          exe_list.append(self.Model.GetPath(ROW))
+        else:
+          exe_list.append(self.GetFileItem(ROW))
+
+    return exe_list
+
+
+  ## Creates a globals.fileitem.FileItem instance for a row
+  #
+  #  \param item
+  #  Can be item index, string path, or FileItem instance
+  #  \return
+  #  \b \e FileItem instance
+  def GetFileItem(self, item):
+    if isinstance(item, FileItem):
+      return item
+
+    row = self.GetIndex(item)
+    if row == None:
+      logger.warn("Could not convert to FileItem: {}".format(item))
+      return None
+
+    return FileItem(self.Model.GetPath(row), self.Model.GetTarget(row), ignore_timestamp=True)
+
+
+  ## Creates globals.fileitem.FileItem instances for all rows
+  #
+  # @treturn list
+  def GetFileItems(self):
+    return [self.GetFileItem(R) for R in range(len(self.Model))]
 
 
   ## Retrieves the filename at given index
@@ -454,10 +618,7 @@ class FileList(BasicFileList):
   #  \param basename
   #  If \b \e True, only retrives the file's basename
   def GetFilename(self, index, basename=False):
-    if isinstance(index, FileItem):
-      index = self.GetIndex(index)
-
-    filename = self.GetItemText(index)
+    filename = self.Model.GetFilename(self.GetIndex(index))
 
     if basename:
       filename = os.path.basename(filename)
@@ -465,12 +626,30 @@ class FileList(BasicFileList):
     return filename
 
 
+  ## Retrieves the index of given item
+  #
+  #  \param item
+  #  Can be \b \e Integer index, \b \e FileItem instance, or string representing file path
+  #  \return
+  #  \b \e Integer index of given item or \b \e None
+  def GetIndex(self, item):
+    if isinstance(item, int):
+      return item
+
+    if isinstance(item, FileItem):
+      item = item.GetPath()
+
+    return self.Model.Find(item)
+
+
   ## Retrieves an item's path
   def GetPath(self, index):
-    file_dir = self.GetItemText(index, columns.SOURCE)
-    file_name = self.GetItemText(index, columns.FILENAME)
+    return self.Model.GetPath(self.GetIndex(index))
 
-    return os.path.join(file_dir, file_name)
+
+  ## Retrieves all file paths
+  def GetPaths(self):
+    return tuple(self.Model.GetPath(R) for R in range(len(self.Model)))
 
 
   ## TODO: Doxygen
@@ -497,12 +676,30 @@ class FileList(BasicFileList):
     return row_defs
 
 
+  ## Retrieves a row formatted as a line of project's file list
+  #
+  #  \param row
+  #  	Row index
+  #  \return
+  #  	\b \e str : "source -> filename -> target" with "*" appended to
+  #  	source if file is executable
+  def GetSaveLine(self, row):
+    filename, source, target, executable = self.GetRowData(row)
+    absolute_filename = os.path.join(source, filename)
+
+    if executable:
+      # Mark file as executable
+      absolute_filename = "{}*".format(absolute_filename)
+
+    return "{} -> {} -> {}".format(absolute_filename, filename, target)
+
+
   ## Retrieves the source path of a file
   #
   #  \param row
   #  Row index of item
   def GetSource(self, row):
-    return self.GetItemText(row, columns.SOURCE)
+    return self.Model.GetSource(row)
 
 
   ## Retrieves target directory of a file
@@ -510,18 +707,33 @@ class FileList(BasicFileList):
   #  \param row
   #  Row index of item
   def GetTarget(self, row):
-    if isinstance(row, FileItem):
-      row = self.GetIndex(row)
+    return self.Model.GetTarget(self.GetIndex(row))
+
 
-    return self.GetItemText(row, columns.TARGET)
+  ## Retrieves all target paths from files
+  #
+  #  \return
+  #  \b \e Tuple list of all target paths
+  def GetTargets(self):
+    return tuple(self.Model.GetTarget(R) for R in range(len(self.Model)))
 
 
   ## Retrieves mime type of a file
   #
+  #  Types are detected when first requested. Types for the rest of
+  #  the visible page are detected at the same time.
+  #
   #  \param row
   #  Row index of item
   def GetType(self, row):
-    return self.GetItemText(row, columns.TYPE)
+    if self.Model.GetType(row) == None:
+      last = min(row + max(self.GetCountPerPage(), 1), len(self.Model))
+      rows = [R for R in range(row, last) if self.Model.GetType(R) == None]
+
+      for ROW, MIME in zip(rows, GetFileMimeTypes([self.Model.GetPath(R) for R in rows])):
+        self.Model.SetType(ROW, MIME)
+
+    return self.Model.GetType(row)
 
 
   ## Checks if an item is a directory
@@ -529,12 +741,12 @@ class FileList(BasicFileList):
   #  \param row
   #  Row index of item
   def IsDirectory(self, row):
-    return os.path.isdir(self.GetPath(row))
+    return self.Model.HasFlag(row, FLAG_DIR)
 
 
   ## Checks if the file list is empty
   def IsEmpty(self):
-    return not self.GetItemCount()
+    return not len(self.Model)
 
 
   ## Checks if an item is executable
@@ -542,7 +754,7 @@ class FileList(BasicFileList):
   #  \param row
   #  Row index of item
   def IsExecutable(self, row):
-    return self.GetItemTextColour(row) == wx.RED
+    return self.Model.HasFlag(row, FLAG_EXEC)
 
 
   ## Checks if an item is a symbolic link
@@ -550,7 +762,7 @@ class FileList(BasicFileList):
   #  \param row
   #  Row index of item
   def IsSymlink(self, row):
-    return "symlink" in self.GetType(row)
+    return self.Model.HasFlag(row, FLAG_LINK)
 
 
   ## TODO: Doxygen
@@ -558,6 +770,97 @@ class FileList(BasicFileList):
     return self.RefreshFileList()
 
 
+  ## Retrieves display attributes for a row of virtual list
+  #
+  #  \param item
+  #  Row index of item
+  #  \return
+  #  \b \e wx.ListItemAttr instance or \b \e None for default attributes
+  def OnGetItemAttr(self, item):
+    flags = self.Model.GetFlags(item)
+    if not flags:
+      return None
+
+    if flags not in self.ItemAttrs:
+      attr = wx.ListItemAttr()
+
+      if flags & FLAG_LINK:
+        attr.SetTextColour(COLOR_link)
+
+      elif flags & FLAG_DIR:
+        attr.SetTextColour(self.FOLDER_TEXT_COLOR)
+
+      elif flags & FLAG_EXEC:
+        attr.SetTextColour(COLOR_executable)
+
+      if flags & FLAG_MISSING:
+        attr.SetBackgroundColour(COLOR_warn)
+
+      self.ItemAttrs[flags] = attr
+
+    return self.ItemAttrs[flags]
+
+
+  ## Retrieves text of a cell of virtual list
+  #
+  #  \param item
+  #  Row index of item
+  #  \param col
+  #  Column index
+  def OnGetItemText(self, item, col):
+    if col == columns.FILENAME:
+      return self.Model.GetFilename(item)
+
+    if col == columns.SOURCE:
+      return self.Model.GetSource(item)
+
+    if col == columns.TARGET:
+      return self.Model.GetTarget(item)
+
+    if col == columns.TYPE:
+      return self.GetType(item)
+
+    return wx.EmptyString
+
+
+  ## Passes changes from watcher thread to main thread
+  #
+  #  \param changes
+  #  \b \e List of (action, path) tuples
+  def OnFileSystemChanges(self, changes):
+    if self:
+      wx.PostEvent(self, FileSystemEvent(0, changes=changes))
+
+
+  ## Updates rows of files that have changed on filesystem
+  def OnFileSystemEvent(self, event=None):
+    if self.PathRows == None:
+      self.PathRows = {}
+      for ROW in range(len(self.Model)):
+        self.PathRows.setdefault(self.Model.GetPath(ROW), []).append(ROW)
+
+    changed = set()
+    for ACTION, PATH in event.changes:
+      if ACTION == FS_OVERFLOW:
+        # Changes were lost
+        self.RefreshFileList()
+        return
+
+      changed.update(self.PathRows.get(PATH, ()))
+
+    for ROW in changed:
+      flags = GetFileFlags(self.Model.GetPath(ROW))
+
+      # Executable mark set by user is kept
+      if self.Model.HasFlag(ROW, FLAG_USER_EXEC):
+        flags |= FLAG_EXEC|FLAG_USER_EXEC
+
+      # Contents may have changed, so MIME type is detected again
+      self.Model.SetType(ROW, None)
+      self.Model.SetFlags(ROW, flags)
+      self.RefreshItem(ROW)
+
+
   ## Defines actions to take when left-click or left-double-click event occurs
   #
   #  The super method is overridden to ensure that 'event.Skip' is called.
@@ -610,6 +913,18 @@ class FileList(BasicFileList):
     TextEditMixin.OpenEditor(self, columns.TARGET, row)
 
 
+  ## Retrieves changes to rows since last call & starts tracking changes
+  #
+  #  \return
+  #  	\b \e List of ("add", lines), ("remove", paths) or ("clear",)
+  #  	tuples, where lines are formatted by \b \e GetSaveLine
+  def PopChanges(self):
+    changes = self.Changes or []
+    self.Changes = []
+
+    return changes
+
+
   ## Refresh file list
   #
   #  Missing files are marked with a distinct color.
@@ -618,63 +933,48 @@ class FileList(BasicFileList):
   #  \return
   #  	\b \e bool : True if files are missing, False if all okay
   def RefreshFileList(self):
-    dirty = False
-    for row in range(self.GetItemCount()):
-      item_color = self.DEFAULT_BG_COLOR
-      text_color = self.DEFAULT_TEXT_COLOR
-      row_defs = self.GetRowDefs(row)
+    changed, dirty = self.Model.Refresh()
 
-      absolute_filename = "{}/{}".format(row_defs["source"], row_defs["filename"])
-
-      if not os.path.exists(absolute_filename):
-        item_color = COLOR_warn
-        dirty = True
-
-      elif os.path.isdir(absolute_filename):
-        text_color = self.FOLDER_TEXT_COLOR
-
-      elif self.IsSymlink(row):
-        text_color = COLOR_link
-
-      elif os.access(absolute_filename, os.X_OK):
-        text_color = COLOR_executable
-
-      self.SetItemTextColour(row, text_color)
-      self.SetItemBackgroundColour(row, item_color)
+    # Only rows that changed since last refresh are redrawn
+    for ROW in changed:
+      self.RefreshItem(ROW)
 
     return dirty
 
 
   ## Removes selected files from list
   def RemoveSelected(self):
-    selected_total = self.GetSelectedItemCount()
-    selected_count = selected_total
+    selected = self.GetSelectedIndexes()
+    if not selected:
+      return
 
-    while selected_count:
-      current_selected = self.GetFirstSelected()
+    logger.debug(GT("Removing {} selected items".format(len(selected))))
 
-      logger.debug(GT("Removing selected item {} of {}".format(selected_total - selected_count + 1,
-                                    selected_total
-                                    )))
+    # Selection is stored by index, so must be cleared before rows are removed
+    self.MainCtrl.SetItemState(-1, 0, wx.LIST_STATE_SELECTED)
 
-      deleted = self.DeleteItem(current_selected)
-      selected_count = self.GetSelectedItemCount()
+    self.AddChange("remove", selected)
+    self.WatchRows(selected, False)
+    self.Model.Delete(selected)
+    self.SetItemCount(len(self.Model))
+    self.MainCtrl.Refresh()
 
-      if deleted:
-        self.FileItems.pop(current_selected)
-      else:
-        logger.warn("Failed to delete item from Filelist: index: {}".format(current_selected))
+    logger.debug("Item count: {}".format(self.GetItemCount()))
+
+
+  ## Resets the list to default value (empty)
+  def Reset(self):
+    self.Watcher.Clear()
+    self.PathRows = None
+    self.Model.Clear()
+    self.AddChange("clear")
 
-      logger.debug("Visual item count: {}".format(self.GetItemCount()))
-      logger.debug("Actual item count: {}".format(len(self.FileItems)))
+    return ListCtrl.Reset(self)
 
 
   ## Selects all items in the list
   def SelectAll(self):
-    file_count = self.GetItemCount()
-
-    for x in range(file_count):
-      self.Select(x)
+    self.MainCtrl.SetItemState(-1, wx.LIST_STATE_SELECTED, wx.LIST_STATE_SELECTED)
 
 
   ## Marks a file as executable
@@ -682,12 +982,42 @@ class FileList(BasicFileList):
   #  \param row
   #  Row index of item
   def SetFileExecutable(self, row, executable=True):
-    if executable:
-      self.SetItemTextColour(row, wx.RED)
+    self.Model.SetFlag(row, FLAG_EXEC|FLAG_USER_EXEC, executable)
+    self.RefreshItem(row)
+    self.AddChange("add", (row,))
 
-      return
 
-    self.SetItemTextColour(row, self.DEFAULT_TEXT_COLOR)
+  ## Sets value of a cell edited with TextEditMixin
+  #
+  #  Only the "target" column can be edited.
+  def SetVirtualData(self, row, col, text):
+    if col == columns.TARGET:
+      self.Model.SetTarget(row, text)
+      self.AddChange("add", (row,))
+
+
+  ## Starts or stops watching source directories of rows
+  #
+  #  Also marks cached row indexes as outdated.
+  #
+  #  \param rows
+  #  Row indexes
+  #  \param watch
+  #  If \b \e False, stops watching directories
+  def WatchRows(self, rows, watch=True):
+    self.PathRows = None
+
+    dirs = {}
+    for ROW in rows:
+      parent = os.path.dirname(self.Model.GetPath(ROW))
+      dirs[parent] = dirs.get(parent, 0) + 1
+
+    for DIR, COUNT in dirs.items():
+      if watch:
+        self.Watcher.Watch(DIR, COUNT)
+
+      else:
+        self.Watcher.Unwatch(DIR, COUNT)
 
 
   ## Sorts listed items in target column alphabetically
@@ -208,6 +208,56 @@ class ListCtrlBaseESS(ListCtrlBase, EssentialField):
     EssentialField.__init__(self)
 
 
+## A list control that retrieves item text & attributes from a data source
+#
+#  Requires style \b \e wx.LC_VIRTUAL. Rows are not stored in the
+#  control, so memory use does not depend on widget rows.
+class VirtualListCtrlBase(ListCtrlBase):
+  def __init__(self, parent, win_id=wx.ID_ANY, pos=wx.DefaultPosition, size=wx.DefaultSize,
+      style=wx.LC_REPORT|wx.LC_VIRTUAL, validator=wx.DefaultValidator, name=wx.ListCtrlNameStr,
+      defaultValue=None, required=False, outLabel=None):
+
+    ListCtrlBase.__init__(self, parent, win_id, pos, size, style, validator, name,
+        defaultValue, required, outLabel)
+
+    ## Object with 'OnGetItemText' & 'OnGetItemAttr' methods
+    self.DataSource = None
+
+
+  ## Override inherited method to retrieve attributes from data source
+  def OnGetItemAttr(self, item):
+    if self.DataSource:
+      return self.DataSource.OnGetItemAttr(item)
+
+    return None
+
+
+  ## Override inherited method to retrieve text from data source
+  def OnGetItemText(self, item, col):
+    if self.DataSource:
+      return self.DataSource.OnGetItemText(item, col)
+
+    return wx.EmptyString
+
+
+  ## Sets the object that provides item text & attributes
+  def SetDataSource(self, source):
+    self.DataSource = source
+
+
+## VirtualListCtrlBase that notifies main window to mark project dirty
+#
+#  This is a dummy class to facilitate merging to & from unstable branch
+class VirtualListCtrlBaseESS(VirtualListCtrlBase, EssentialField):
+  def __init__(self, parent, win_id=wx.ID_ANY, pos=wx.DefaultPosition, size=wx.DefaultSize,
+      style=wx.LC_REPORT|wx.LC_VIRTUAL, validator=wx.DefaultValidator, name=wx.ListCtrlNameStr,
+      defaultValue=None, required=False, outLabel=None):
+
+    VirtualListCtrlBase.__init__(self, parent, win_id, pos, size, style, validator, name,
+        defaultValue, required, outLabel)
+    EssentialField.__init__(self)
+
+
 ## Hack to make list control border have rounded edges
 class ListCtrl(BorderedPanel, ControlPanel):
   def __init__(self, parent, win_id=wx.ID_ANY, pos=wx.DefaultPosition, size=wx.DefaultSize,
@@ -216,7 +266,16 @@ class ListCtrl(BorderedPanel, ControlPanel):
 
     BorderedPanel.__init__(self, parent, win_id, pos, size, name=name)
 
-    if isinstance(self, EssentialField):
+    if style & wx.LC_VIRTUAL:
+      if isinstance(self, EssentialField):
+        self.MainCtrl = VirtualListCtrlBaseESS(self, style=style, validator=validator,
+            defaultValue=defaultValue, required=required, outLabel=outLabel)
+
+      else:
+        self.MainCtrl = VirtualListCtrlBase(self, style=style, validator=validator,
+            defaultValue=defaultValue, required=required, outLabel=outLabel)
+
+    elif isinstance(self, EssentialField):
       self.MainCtrl = ListCtrlBaseESS(self, style=style, validator=validator,
           defaultValue=defaultValue, required=required, outLabel=outLabel)
 
@@ -433,6 +492,11 @@ class ListCtrl(BorderedPanel, ControlPanel):
     return self.MainCtrl.IsRequired()
 
 
+  ## Checks if main control is in virtual mode
+  def IsVirtual(self):
+    return self.MainCtrl.IsVirtual()
+
+
   ## Some bug workarounds for resizing the list & its columns in wx 3.0
   #
   #  The last column is automatically expanded to fill
@@ -447,6 +511,16 @@ class ListCtrl(BorderedPanel, ControlPanel):
       event.Skip()
 
 
+  ## Redraws a row of a virtual list
+  def RefreshItem(self, item):
+    self.MainCtrl.RefreshItem(item)
+
+
+  ## Redraws a range of rows of a virtual list
+  def RefreshItems(self, itemFrom, itemTo):
+    self.MainCtrl.RefreshItems(itemFrom, itemTo)
+
+
   ## TODO: Doxygen
   def RemoveSelected(self):
     self.MainCtrl.RemoveSelected()
@@ -483,6 +557,11 @@ class ListCtrl(BorderedPanel, ControlPanel):
     self.MainCtrl.SetItemBackgroundColour(item, color)
 
 
+  ## Sets number of rows in a virtual list
+  def SetItemCount(self, count):
+    self.MainCtrl.SetItemCount(count)
+
+
   ## TODO: Doxygen
   def SetItemTextColour(self, item, color):
     self.MainCtrl.SetItemTextColour(item, color)
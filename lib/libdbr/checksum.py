@@ -0,0 +1,86 @@
+
+# ****************************************************
+# * Copyright (C) 2023 - Jordan Irwin (AntumDeluge)  *
+# ****************************************************
+# * This software is licensed under the MIT license. *
+# * See: docs/LICENSE.txt for details.               *
+# ****************************************************
+
+import hashlib
+import mmap
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+# size of blocks read from files being hashed
+_chunk_size = 1024 * 1024
+
+# files larger than this are mapped into memory instead of read in blocks
+_mmap_threshold = 16 * 1024 * 1024
+
+# minimum number of files before work is distributed across processes
+_pool_threshold = 64
+
+## Calculates hashes of a single file.
+#
+#  File contents are only read once, regardless of number of algorithms.
+#
+#  @param filepath
+#    Path to file to be hashed.
+#  @param algos
+#    Names of hashlib algorithms (e.g. "md5", "sha256").
+#  @return
+#    Tuple of hexadecimal digests in same order as `algos`.
+def hashFile(filepath, algos=("md5",)):
+  hashes = [hashlib.new(A) for A in algos]
+
+  with open(filepath, "rb") as fin:
+    size = os.fstat(fin.fileno()).st_size
+    if size >= _mmap_threshold:
+      with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for H in hashes:
+          H.update(mm)
+    else:
+      chunk = fin.read(_chunk_size)
+      while chunk:
+        for H in hashes:
+          H.update(chunk)
+        chunk = fin.read(_chunk_size)
+
+  return tuple(H.hexdigest() for H in hashes)
+
+## Hashes a list of files in a worker process.
+def _hashFiles(filepaths, algos):
+  return [hashFile(F, algos) for F in filepaths]
+
+## Calculates hashes of multiple files.
+#
+#  Large lists are split into batches & distributed across a pool of
+#  processes so that hashing is not limited to a single CPU core.
+#
+#  @param filepaths
+#    List of paths to files to be hashed.
+#  @param algos
+#    Names of hashlib algorithms (e.g. "md5", "sha256").
+#  @param jobs
+#    Maximum number of worker processes (0 uses number of CPU cores).
+#  @return
+#    List of digest tuples in same order as `filepaths`.
+def hashFiles(filepaths, algos=("md5",), jobs=0):
+  filepaths = list(filepaths)
+  algos = tuple(algos)
+  jobs = jobs or os.cpu_count() or 1
+
+  if jobs < 2 or len(filepaths) < _pool_threshold:
+    return _hashFiles(filepaths, algos)
+
+  # several batches per worker to balance uneven file sizes
+  batch_size = max(1, len(filepaths) // (jobs * 4))
+  batches = [filepaths[I:I+batch_size] for I in range(0, len(filepaths), batch_size)]
+
+  results = []
+  with ProcessPoolExecutor(jobs) as pool:
+    for R in pool.map(_hashFiles, batches, [algos] * len(batches)):
+      results += R
+  return results
@@ -0,0 +1,448 @@
+
+# ****************************************************
+# * Copyright (C) 2023 - Jordan Irwin (AntumDeluge)  *
+# ****************************************************
+# * This software is licensed under the MIT license. *
+# * See: docs/LICENSE.txt for details.               *
+# ****************************************************
+
+import gzip
+import io
+import lzma
+import os
+import stat
+import subprocess
+import tarfile
+import tempfile
+import time
+
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+
+from libdbr.fileio import getUmask
+from libdbr.paths import getExecutable
+
+
+# format version written to 'debian-binary' member
+_deb_version = b"2.0\n"
+
+# supported compression formats & member filename extensions
+_extensions = {
+  "none": "",
+  "gzip": ".gz",
+  "xz": ".xz",
+  "zstd": ".zst",
+}
+
+# default compression levels
+_levels = {
+  "gzip": 9,
+  "xz": 6,
+  "zstd": 3,
+}
+
+# external programs & thread count options used for multi-threaded compression
+_programs = {
+  "gzip": ("pigz", "-p"),
+  "xz": ("xz", "-T"),
+  "zstd": ("zstd", "-T"),
+}
+
+## Retrieves compression formats that can be used on this system.
+#
+#  @return
+#    List of format names.
+def getCompressors():
+  return [C for C in _extensions if C != "zstd" or zstandard != None or getExecutable("zstd")]
+
+## Checks if a compression format can be used.
+#
+#  @param compression
+#    Format name (e.g. "xz").
+def compressorAvailable(compression):
+  return compression in getCompressors()
+
+## Retrieves default timestamp for archive members.
+#
+#  Uses SOURCE_DATE_EPOCH environment variable if set for reproducible
+#  builds.
+def _getTimestamp():
+  epoch = os.getenv("SOURCE_DATE_EPOCH")
+  if epoch and epoch.isdigit():
+    return int(epoch)
+  return int(time.time())
+
+## Opens a stream that compresses data written to a file object.
+#
+#  Closing the returned stream does not close `fileobj`.
+#
+#  @param fileobj
+#    Writable file object.
+#  @param compression
+#    Format name.
+#  @param level
+#    Compression level (None uses format default).
+#  @param threads
+#    Number of compression threads (0 uses number of CPU cores). If
+#    more than one, 'pigz', 'xz' or 'zstd' is used when available.
+def _openCompressor(fileobj, compression, level=None, threads=1):
+  if compression not in _extensions:
+    raise ValueError("unsupported compression: {}".format(compression))
+  if compression == "none":
+    return _Uncompressed(fileobj)
+
+  if level == None:
+    level = _levels[compression]
+  threads = threads or os.cpu_count() or 1
+
+  if compression == "zstd" and zstandard != None:
+    return zstandard.ZstdCompressor(level=level, threads=threads if threads > 1 else 0).stream_writer(
+        fileobj, closefd=False)
+
+  program, thread_opt = _programs[compression]
+  cmd = getExecutable(program) if threads > 1 or compression == "zstd" else None
+  if cmd:
+    return _ProcessCompressor(fileobj, [cmd, "-c", "-n" if program == "pigz" else "-q",
+        "-{}".format(level), "{}{}".format(thread_opt, threads)])
+
+  if compression == "gzip":
+    return gzip.GzipFile(filename="", mode="wb", fileobj=fileobj, compresslevel=level, mtime=0)
+  if compression == "xz":
+    return lzma.LZMAFile(fileobj, "wb", preset=level)
+  raise ValueError("zstd compression requires 'zstandard' module or 'zstd' command")
+
+## Writes to a file object without compression.
+class _Uncompressed(io.RawIOBase):
+  def __init__(self, fileobj):
+    self.fileobj = fileobj
+
+  def writable(self):
+    return True
+
+  def write(self, data):
+    return self.fileobj.write(data)
+
+## Compresses data with an external program.
+#
+#  The program writes directly to the file descriptor of `fileobj`.
+class _ProcessCompressor(io.RawIOBase):
+  def __init__(self, fileobj, cmd):
+    fileobj.flush()
+    self.fileobj = fileobj
+    self.cmd = cmd
+    self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=fileobj.fileno())
+
+  def writable(self):
+    return True
+
+  def write(self, data):
+    self.proc.stdin.write(data)
+    return len(data)
+
+  def close(self):
+    if not self.closed:
+      self.proc.stdin.close()
+      if self.proc.wait() != 0:
+        raise OSError("'{}' exited with code {}".format(" ".join(self.cmd), self.proc.returncode))
+      self.fileobj.seek(0, os.SEEK_END)
+    io.RawIOBase.close(self)
+
+  ## Stops the program without waiting for remaining output.
+  def abort(self):
+    if self.proc.poll() == None:
+      self.proc.kill()
+    try:
+      self.proc.stdin.close()
+    except OSError:
+      pass
+    self.proc.wait()
+    io.RawIOBase.close(self)
+
+## Writes Debian binary packages without dpkg-deb.
+#
+#  Members are streamed into an ar container. Ownership & permissions
+#  are set in the tar headers, so files do not need to be owned by root
+#  & fakeroot is not required.
+#
+#  Members must be added in order: `writeControl` is called once, then
+#  `openData`, then the data tree is added & `close` is called.
+#
+#  The package is written to a temporary file in the same directory,
+#  which replaces `filepath` when `close` succeeds. If writing fails or
+#  `abort` is called, the temporary file is removed.
+class DebWriter:
+  ## Constructor
+  #
+  #  @param filepath
+  #    Path to .deb file to be created.
+  #  @param compression
+  #    Format used for control & data archives ("gzip", "xz", "zstd", or
+  #    "none").
+  #  @param level
+  #    Compression level (None uses format default).
+  #  @param mtime
+  #    Timestamp of generated members (default: SOURCE_DATE_EPOCH or
+  #    current time).
+  #  @param threads
+  #    Number of threads used to compress data archive (0 uses number
+  #    of CPU cores).
+  def __init__(self, filepath, compression="xz", level=None, mtime=None, threads=1):
+    if not compressorAvailable(compression):
+      raise ValueError("compression not available: {}".format(compression))
+
+    self.compression = compression
+    self.level = level
+    self.mtime = _getTimestamp() if mtime == None else mtime
+    self.threads = threads
+
+    ## Member filenames mapped to uncompressed & compressed sizes
+    self.sizes = {}
+
+    self.filepath = filepath
+    fd, self._tmppath = tempfile.mkstemp(prefix=".{}-".format(os.path.basename(filepath)),
+        suffix=".tmp", dir=os.path.dirname(filepath) or ".")
+    self._fout = open(fd, "wb")
+    self._member = None
+    self._name = None
+    self._stream = None
+    self._tar = None
+    self._dirs = set()
+
+    self._fout.write(b"!<arch>\n")
+    self._writeMember("debian-binary", _deb_version)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type == None:
+      self.close()
+    else:
+      self.abort()
+
+  ## Writes an ar member header.
+  #
+  #  @param name
+  #    Member filename.
+  #  @param size
+  #    Member size in bytes.
+  def _writeHeader(self, name, size):
+    header = "{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n".format(name, self.mtime, 0, 0, "100644", size)
+    self._fout.write(header.encode("ascii"))
+
+  ## Writes a complete ar member.
+  def _writeMember(self, name, data):
+    self._writeHeader(name, len(data))
+    self._fout.write(data)
+    if len(data) % 2:
+      self._fout.write(b"\n")
+
+  ## Starts a streamed ar member & tar archive.
+  #
+  #  The member size is not known until the archive is finished, so it
+  #  is written to the header afterward.
+  #
+  #  @param name
+  #    Member filename without compression extension.
+  #  @param threads
+  #    Number of compression threads.
+  def _openMember(self, name, threads=1):
+    self._name = "{}{}".format(name, _extensions[self.compression])
+    self._member = self._fout.tell()
+    self._writeHeader(self._name, 0)
+    self._stream = _openCompressor(self._fout, self.compression, self.level, threads)
+    self._tar = tarfile.open(fileobj=self._stream, mode="w|", format=tarfile.GNU_FORMAT)
+    self._dirs = set()
+    self.addDir("/")
+
+  ## Finishes the current streamed ar member.
+  def _closeMember(self):
+    if self._tar == None:
+      return
+
+    self._tar.close()
+    self._stream.close()
+    end = self._fout.tell()
+    size = end - self._member - 60
+    self.sizes[self._name] = (self._tar.offset, size)
+
+    # size field of header
+    self._fout.seek(self._member + 48)
+    self._fout.write("{:<10}".format(size).encode("ascii"))
+    self._fout.seek(end)
+    if size % 2:
+      self._fout.write(b"\n")
+
+    self._tar = None
+    self._stream = None
+
+  ## Creates a tar header.
+  #
+  #  @param path
+  #    Absolute install path.
+  #  @param ftype
+  #    Tar member type.
+  #  @param mode
+  #    Permission bits.
+  #  @param mtime
+  #    Modification time (None uses archive default).
+  def _getInfo(self, path, ftype, mode, mtime=None):
+    name = "./{}".format(path.strip("/"))
+    if ftype == tarfile.DIRTYPE and name != "./":
+      name += "/"
+    info = tarfile.TarInfo(name)
+    info.type = ftype
+    info.mode = mode
+    info.uid = info.gid = 0
+    info.uname = info.gname = "root"
+    info.mtime = self.mtime if mtime == None else int(mtime)
+    return info
+
+  ## Adds parent directories of a path if they have not been added.
+  def _addParents(self, path):
+    parent = os.path.dirname("/{}".format(path.strip("/")))
+    if parent not in self._dirs:
+      self.addDir(parent)
+
+  ## Writes the control archive.
+  #
+  #  @param members
+  #    List of (filename, data, mode) tuples. Data can be `str` or `bytes`.
+  def writeControl(self, members):
+    self._openMember("control.tar")
+    for name, data, mode in members:
+      self.addData(name, data, mode)
+    self._closeMember()
+
+  ## Retrieves filename of the data archive member.
+  def getDataName(self):
+    return "data.tar{}".format(_extensions[self.compression])
+
+  ## Starts the data archive.
+  def openData(self):
+    self._openMember("data.tar", self.threads)
+
+  ## Adds a directory to the current archive.
+  #
+  #  @param path
+  #    Absolute install path.
+  #  @param mode
+  #    Permission bits.
+  #  @param mtime
+  #    Modification time.
+  def addDir(self, path, mode=0o755, mtime=None):
+    path = "/{}".format(path.strip("/"))
+    if path != "/":
+      self._addParents(path)
+    if path in self._dirs:
+      return
+    self._dirs.add(path)
+    self._tar.addfile(self._getInfo(path, tarfile.DIRTYPE, mode, mtime))
+
+  ## Adds a file from memory to the current archive.
+  #
+  #  @param path
+  #    Absolute install path.
+  #  @param data
+  #    File contents as `str` or `bytes`.
+  #  @param mode
+  #    Permission bits.
+  def addData(self, path, data, mode=0o644):
+    if isinstance(data, str):
+      data = data.encode("utf-8")
+    self._addParents(path)
+    info = self._getInfo(path, tarfile.REGTYPE, mode)
+    info.size = len(data)
+    self._tar.addfile(info, io.BytesIO(data))
+
+  ## Adds a file to the current archive by reading it from disk.
+  #
+  #  @param path
+  #    Absolute install path.
+  #  @param source
+  #    Path to file to be read.
+  #  @param mode
+  #    Permission bits (default: 0755 if source has any executable bits,
+  #    otherwise 0644).
+  def addFile(self, path, source, mode=None):
+    self._addParents(path)
+    with open(source, "rb") as fin:
+      st = os.fstat(fin.fileno())
+      if mode == None:
+        mode = 0o755 if st.st_mode & 0o111 else 0o644
+      info = self._getInfo(path, tarfile.REGTYPE, mode, st.st_mtime)
+      info.size = st.st_size
+      self._tar.addfile(info, fin)
+
+  ## Adds a symbolic link to the current archive.
+  #
+  #  @param path
+  #    Absolute install path.
+  #  @param target
+  #    Path that link points to.
+  def addLink(self, path, target):
+    self._addParents(path)
+    info = self._getInfo(path, tarfile.SYMTYPE, 0o777)
+    info.linkname = target
+    self._tar.addfile(info)
+
+  ## Adds the contents of a directory tree to the current archive.
+  #
+  #  Entries are added in sorted order. Permissions are taken from the
+  #  files on disk, but ownership is always root.
+  #
+  #  @param root
+  #    Directory to be added.
+  #  @param exclude
+  #    Names of top-level entries to be skipped (e.g. "DEBIAN").
+  def addTree(self, root, exclude=()):
+    for ROOT, DIRS, FILES in os.walk(root):
+      if ROOT == root:
+        DIRS[:] = [D for D in DIRS if D not in exclude]
+        FILES = [F for F in FILES if F not in exclude]
+      DIRS.sort()
+
+      rel_root = os.path.relpath(ROOT, root)
+      install_root = "/" if rel_root == "." else "/{}".format(rel_root)
+      entries = sorted(DIRS + FILES)
+      for NAME in entries:
+        source = os.path.join(ROOT, NAME)
+        path = os.path.join(install_root, NAME)
+        st = os.lstat(source)
+        if stat.S_ISLNK(st.st_mode):
+          self.addLink(path, os.readlink(source))
+        elif stat.S_ISDIR(st.st_mode):
+          self.addDir(path, stat.S_IMODE(st.st_mode), st.st_mtime)
+        elif stat.S_ISREG(st.st_mode):
+          self.addFile(path, source, stat.S_IMODE(st.st_mode))
+
+  ## Finishes the package & moves it to the output path.
+  def close(self):
+    try:
+      self._closeMember()
+      self._fout.close()
+
+      # mkstemp creates files only readable by owner
+      os.chmod(self._tmppath, 0o666 & ~getUmask())
+      os.replace(self._tmppath, self.filepath)
+    except BaseException:
+      self.abort()
+      raise
+
+  ## Stops writing & removes the incomplete package.
+  #
+  #  An external compressor program is stopped & waited for.
+  def abort(self):
+    if self._tar != None:
+      # unfinished archive must not be flushed when it is garbage collected
+      self._tar.closed = True
+      self._tar.fileobj.closed = True
+    if isinstance(self._stream, _ProcessCompressor):
+      self._stream.abort()
+    self._tar = None
+    self._stream = None
+    self._fout.close()
+    if os.path.exists(self._tmppath):
+      os.remove(self._tmppath)
@@ -0,0 +1,97 @@
+
+# ****************************************************
+# * Copyright (C) 2023 - Jordan Irwin (AntumDeluge)  *
+# ****************************************************
+# * This software is licensed under the MIT license. *
+# * See: docs/LICENSE.txt for details.               *
+# ****************************************************
+
+import struct
+
+
+# ELF identification
+_magic = b"\x7fELF"
+_class_32 = 1
+_class_64 = 2
+_data_lsb = 1
+_data_msb = 2
+
+# section header type of symbol table
+_sht_symtab = 2
+
+## Checks if a file is an ELF binary.
+#
+#  @param filepath
+#    Path to file to be checked.
+#  @return
+#    `True` if file begins with ELF magic number.
+def isElf(filepath):
+  try:
+    with open(filepath, "rb") as fin:
+      return fin.read(4) == _magic
+  except OSError:
+    return False
+
+## Checks if an ELF binary contains a symbol table.
+#
+#  Only the ELF header & section header table are read, so the
+#  `file` command is not needed.
+#
+#  @param filepath
+#    Path to file to be checked.
+#  @return
+#    `True` if file is an ELF binary with a .symtab section.
+def hasSymbolTable(filepath):
+  try:
+    with open(filepath, "rb") as fin:
+      ident = fin.read(16)
+      if len(ident) < 16 or ident[:4] != _magic:
+        return False
+
+      if ident[5] == _data_lsb:
+        endian = "<"
+      elif ident[5] == _data_msb:
+        endian = ">"
+      else:
+        return False
+
+      if ident[4] == _class_64:
+        # e_shoff, e_shentsize, e_shnum
+        header = fin.read(48)
+        if len(header) < 48:
+          return False
+        shoff = struct.unpack_from(endian + "Q", header, 24)[0]
+        shentsize, shnum = struct.unpack_from(endian + "HH", header, 42)
+      elif ident[4] == _class_32:
+        header = fin.read(36)
+        if len(header) < 36:
+          return False
+        shoff = struct.unpack_from(endian + "I", header, 16)[0]
+        shentsize, shnum = struct.unpack_from(endian + "HH", header, 30)
+      else:
+        return False
+
+      # sh_type is second 32-bit word of each section header
+      if not shoff or shentsize < 8:
+        return False
+
+      fin.seek(shoff)
+      if shnum == 0:
+        # extended numbering: section count is stored in sh_size of first header
+        first = fin.read(shentsize)
+        if len(first) < shentsize:
+          return False
+        if ident[4] == _class_64:
+          shnum = struct.unpack_from(endian + "Q", first, 32)[0]
+        else:
+          shnum = struct.unpack_from(endian + "I", first, 20)[0]
+        fin.seek(shoff)
+
+      table = fin.read(shnum * shentsize)
+      for offset in range(0, len(table) - shentsize + 1, shentsize):
+        if struct.unpack_from(endian + "I", table, offset + 4)[0] == _sht_symtab:
+          return True
+  except OSError:
+    pass
+
+  return False
@@ -8,11 +8,30 @@
 
 import codecs
 import os
+import shutil
 
 
 # line ending delimeter
 _le = "\n"
 
+# permission bits removed from new files & directories by the process
+_umask = os.umask(0)
+os.umask(_umask)
+
+# size of blocks copied between files
+_chunk_size = 1024 * 1024
+
+## Retrieves permission bits removed from new files by the process
+#
+#  Value is read when module is imported, since reading the umask
+#  requires changing it, which would affect files created by other
+#  threads.
+#
+#  @return
+#    Process umask.
+def getUmask():
+  return _umask
+
 ## Sets line ending delimeter
 #
 #  @param delim
@@ -47,19 +66,93 @@ def readFile(filepath):
   fin.close()
   return _cleanLineEndings(data)
 
+## Opens a file for writing with specific permissions.
+#
+#  New files are created with the requested mode, so permissions only
+#  need to be changed if the umask removes bits or the file already
+#  exists.
+#
+#  @param filepath
+#    Path to file to be opened.
+#  @param mode
+#    Permission bits of file.
+#  @return
+#    File descriptor.
+def _openMode(filepath, mode):
+  try:
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+    if mode & _umask:
+      os.fchmod(fd, mode)
+  except FileExistsError:
+    fd = os.open(filepath, os.O_WRONLY | os.O_TRUNC)
+    os.fchmod(fd, mode)
+  return fd
+
 ## Writes text data to a file without preserving previous contents.
 #
 #  @param filepath
 #    Path fo file to be written.
 #  @param data
 #    String or list of strings to export.
-def writeFile(filepath, data):
+#  @param mode
+#    Permission bits to set on file (default: unchanged).
+def writeFile(filepath, data, mode=None):
   if type(data) != str:
     data = "\n".join(data)
-  fout = codecs.open(filepath, "w", "utf-8")
+  if mode == None:
+    fout = codecs.open(filepath, "w", "utf-8")
+  else:
+    fout = open(_openMode(filepath, mode), "w", encoding="utf-8", newline="")
   fout.write(_cleanLineEndings(data))
   fout.close()
 
+## Copies a file's contents into a file with specific permissions.
+#
+#  Permissions are set on the open file, so no further calls to
+#  `os.chmod` are needed.
+#
+#  @param source
+#    Path to file to be copied.
+#  @param target
+#    Path to file to be written.
+#  @param mode
+#    Permission bits of target (default: 0755 if source has any
+#    executable bits, otherwise 0644).
+def copyFile(source, target, mode=None):
+  with open(source, "rb") as fin:
+    src_fd = fin.fileno()
+    if mode == None:
+      mode = 0o755 if os.fstat(src_fd).st_mode & 0o111 else 0o644
+    with open(_openMode(target, mode), "wb") as fout:
+      if hasattr(os, "sendfile"):
+        offset = 0
+        while True:
+          sent = os.sendfile(fout.fileno(), src_fd, offset, _chunk_size)
+          if not sent:
+            break
+          offset += sent
+      else:
+        shutil.copyfileobj(fin, fout, _chunk_size)
+
+## Creates a directory & any missing parents with specific permissions.
+#
+#  @param dirpath
+#    Path to directory.
+#  @param mode
+#    Permission bits of created directories.
+def makeDirs(dirpath, mode=0o755):
+  if os.path.isdir(dirpath):
+    return
+  parent = os.path.dirname(dirpath)
+  if parent and parent != dirpath:
+    makeDirs(parent, mode)
+  try:
+    os.mkdir(dirpath, mode)
+  except FileExistsError:
+    return
+  if mode & _umask:
+    os.chmod(dirpath, mode)
+
 ## Writes text data to a file while preserving previous contents.
 #
 #  @param filepath
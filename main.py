@@ -12,14 +12,18 @@ from urllib.error import URLError
 
 import util
 
+from dbr.config           import CommitConfig
 from dbr.config           import GetDefaultConfigValue
 from dbr.config           import WriteConfig
 from dbr.event            import EVT_CHANGE_PAGE
+from dbr.event            import EVT_PROJECT_READ
 from dbr.event            import EVT_TIMER_STOP
+from dbr.event            import ProjectReadEvent
 from dbr.functions        import GetCurrentVersion
 from dbr.functions        import UsingDevelopmentVersion
 from dbr.help             import HelpDialog
 from dbr.icon             import Icon
+from dbr.journal          import ProjectJournal
 from dbr.language         import GT
 from dbr.timer            import DebreateTimer
 from globals              import paths
@@ -37,10 +41,10 @@ from globals.ident        import pgid
 from globals.moduleaccess import ModuleAccessCtrl
 from globals.project      import PROJECT_ext
 from globals.project      import PROJECT_txt
+from globals.projectfile  import ReadProject
+from globals.projectfile  import WriteProjectStream
 from globals.strings      import GS
 from globals.threads      import Thread
-from libdbr.fileio        import readFile
-from libdbr.fileio        import writeFile
 from startup.tests        import GetTestList
 from ui.about             import AboutDialog
 from ui.dialog            import ConfirmationDialog
@@ -60,6 +64,20 @@ from wiz.wizard           import Wizard
 logger = util.getLogger()
 default_title = GT("Debreate - Debian Package Builder")
 
+## Pages saved to project files, in order
+project_pages = (
+  pgid.CONTROL,
+  pgid.FILES,
+  pgid.SCRIPTS,
+  pgid.CHANGELOG,
+  pgid.COPYRIGHT,
+  pgid.MENU,
+  pgid.BUILD,
+  )
+
+# Milliseconds between writes of changes to recovery journal
+autosave_interval = 5000
+
 
 ## The main window interface
 class MainWindow(wx.Frame, ModuleAccessCtrl):
@@ -107,6 +125,12 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
     self.LoadedProject = None
     self.ProjectDirty = False
 
+    ## Records unsaved changes for recovery after a crash
+    self.Journal = ProjectJournal()
+    # Page sections when they were last written to journal
+    self.JournalPages = {}
+    self.AutosaveTimer = wx.PyTimer(self.OnAutosave)
+
     # *** Event Handling *** #
 
     self.Bind(wx.EVT_MENU, self.OnProjectNew, id=menuid.NEW)
@@ -125,6 +149,8 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
 
     self.Bind(EVT_CHANGE_PAGE, self.OnWizardBtnPage)
 
+    EVT_PROJECT_READ(self, wx.ID_ANY, self.OnProjectRead)
+
     # Custom close event shows a dialog box to confirm quit
     self.Bind(wx.EVT_CLOSE, self.OnQuit)
 
@@ -138,6 +164,26 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
     self.Layout()
 
 
+  ## Retrieves data of pages that are written to journal as whole sections
+  #
+  #  File list changes are tracked separately.
+  #
+  #  \return
+  #  \b \e dict : Section data keyed by section name
+  def GetJournalSections(self):
+    sections = {}
+    for P in project_pages:
+      if P == pgid.FILES:
+        continue
+
+      section = GetPage(P).GetSaveSection()
+      if section:
+        name, chunks = section
+        sections[name] = "".join(chunks)
+
+    return sections
+
+
   ## Retrieves menu by ID
   def GetMenu(self, menuId):
     return self.GetMenuBar().GetMenuById(menuId)
@@ -227,6 +273,28 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
     about.Destroy()
 
 
+  ## Writes changes since last call to recovery journal
+  #
+  #  Only pages that changed & changed rows of file list are written.
+  def OnAutosave(self):
+    records = []
+
+    pages = self.GetJournalSections()
+    for NAME, DATA in pages.items():
+      if self.JournalPages.get(NAME) != DATA:
+        records.append(["section", NAME, DATA])
+
+    self.JournalPages = pages
+
+    for CHANGE in GetPage(pgid.FILES).GetListInstance().PopChanges():
+      records.append(["files-{}".format(CHANGE[0])] + list(CHANGE[1:]))
+
+    self.Journal.Append(records)
+
+    if self.Journal.NeedsCompaction():
+      Thread(self.Journal.Compact).Start()
+
+
   ## Checks for new release availability
   def OnCheckUpdate(self, event=None): #@UnusedVariable
     update_test = "update-fail" in GetTestList()
@@ -383,17 +451,77 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
     if dia.ShowModal() != wx.ID_OK:
       return
 
-    # Get the path and set the saved project
-    project = dia.GetPath()
+    # Project is set as loaded project when it has been read
+    self.OpenProject(dia.GetPath())
 
-    filename = os.path.basename(project)
 
-    if self.OpenProject(filename):
-      # Only set project open in memory if loaded completely
-      self.LoadedProject = project
+  ## Fills pages with sections read by \b \e ReadProjectFile
+  #
+  #  Pages that are quick to set are filled first. Files are added to
+  #  the Files page in background, so other pages can be edited while a
+  #  large file list is loading.
+  def OnProjectRead(self, event=None):
+    project_file = event.path
+
+    if event.error:
+      logger.error("Could not read project: {}".format(event.error))
+
+      if event.recovered:
+        ShowErrorDialog(GT("Could not recover unsaved project"), str(event.error))
+
+      else:
+        ShowErrorDialog(GT("Could not open project file"),
+            GT("Not a valid Debreate project: {}").format(project_file))
+
+      # Current project is kept
+      return
+
+    # Pages are only cleared after new project has been read & validated
+    if not event.recovered:
+      if self.LoadedProject and not self.ResetPages():
+        return
+
+      self.LoadedProject = project_file
+
+    sections = event.sections
+
+    logger.debug("Project was saved with Debreate version {}".format(event.version))
+
+    # *** Get Control Data *** #
+    if "CTRL" in sections:
+      depends_data = self.Wizard.GetPage(pgid.CONTROL).Set(sections["CTRL"])
+      self.Wizard.GetPage(pgid.DEPENDS).Set(depends_data)
+
+    # *** Get Scripts Data *** #
+    if "SCRIPTS" in sections:
+      self.Wizard.GetPage(pgid.SCRIPTS).Set(sections["SCRIPTS"])
+
+    # *** Get Changelog Data *** #
+    if "CHANGELOG" in sections:
+      self.Wizard.GetPage(pgid.CHANGELOG).Set(sections["CHANGELOG"])
+
+    # *** Get Copyright Data *** #
+    if "COPYRIGHT" in sections:
+      self.Wizard.GetPage(pgid.COPYRIGHT).Set(sections["COPYRIGHT"])
+
+    # *** Get Menu Data *** #
+    if "MENU" in sections:
+      self.Wizard.GetPage(pgid.MENU).SetLauncherData(sections["MENU"], enabled=True)
+
+    # Get Build Data
+    if "BUILD" in sections:
+      self.Wizard.GetPage(pgid.BUILD).Set(sections["BUILD"])
+
+    # *** Get Files Data *** #
+    if "FILES" in sections:
+      self.Wizard.GetPage(pgid.FILES).SetInBackground(sections["FILES"])
+
+    if event.recovered:
+      # Recovered changes are kept until project is saved
+      self.ResetJournal(sections=sections)
 
     else:
-      self.LoadedProject = None
+      self.ResetJournal(project_file)
 
 
   ## TODO: Doxygen
@@ -401,41 +529,32 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
     event_id = event.GetId()
 
     def SaveIt(path):
-        # Gather data from different pages
-        data = (
-          GetPage(pgid.CONTROL).GetSaveData(),
-          GetPage(pgid.FILES).GetSaveData(),
-          GetPage(pgid.SCRIPTS).GetSaveData(),
-          GetPage(pgid.CHANGELOG).GetSaveData(),
-          GetPage(pgid.COPYRIGHT).GetSaveData(),
-          GetPage(pgid.MENU).GetSaveData(),
-          GetPage(pgid.BUILD).GetSaveData(),
-          )
-
-        # Create a backup of the project
-        overwrite = False
-        if os.path.isfile(path):
-          backup = "{}.backup".format(path)
-          shutil.copy(path, backup)
-          overwrite = True
-
-        # This try statement can be removed when unicode support is enabled
+        # Saving a partial file list would lose files
+        if self.Wizard.GetPage(pgid.FILES).IsLoading():
+          ShowErrorDialog(GT("Save failed"),
+              GT("Project files are still loading, try again when they have been added."))
+          return
+
+        # Each page's data is written as it is generated
+        sections = (GetPage(P).GetSaveSection() for P in project_pages)
+
+        # Existing project is only replaced if writing succeeds
         try:
-          writeFile(path, "[DEBREATE-{}]\n{}".format(VERSION_string, "\n".join(data)))
+          WriteProjectStream(path, VERSION_string, sections)
 
-          if overwrite:
-            os.remove(backup)
+        except OSError as e:
+          ShowErrorDialog(GT("Save failed"), "{}: {}".format(e.strerror, path))
+          return
 
+        # File names that are not valid UTF-8 cannot be written
         except UnicodeEncodeError:
-          detail1 = GT("Unfortunately Debreate does not support unicode yet.")
-          detail2 = GT("Remove any non-ASCII characters from your project.")
-
-          ShowErrorDialog(GT("Save failed"), "{}\n{}".format(detail1, detail2), title=GT("Unicode Error"))
+          ShowErrorDialog(GT("Save failed"),
+              GT("Project contains text that cannot be encoded as UTF-8, such as file names with an invalid encoding."),
+              title=GT("Unicode Error"))
+          return
 
-          if overwrite:
-            os.remove(path)
-            # Restore project backup
-            shutil.move(backup, path)
+        # Unsaved changes are now relative to saved project
+        self.ResetJournal(os.path.abspath(path))
 
     def OnSaveAs():
       dbp = "|*.dbp"
@@ -478,19 +597,26 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
         text=GT("You will lose any unsaved information")).ShowModal() in (wx.ID_OK, wx.OK):
 
       maximized = self.IsMaximized()
-      WriteConfig("maximize", maximized)
+      WriteConfig("maximize", maximized, commit=False)
 
       if maximized:
-        WriteConfig("position", GetDefaultConfigValue("position"))
-        WriteConfig("size", GetDefaultConfigValue("size"))
-        WriteConfig("center", True)
+        WriteConfig("position", GetDefaultConfigValue("position"), commit=False)
+        WriteConfig("size", GetDefaultConfigValue("size"), commit=False)
+        WriteConfig("center", True, commit=False)
 
       else:
-        WriteConfig("position", self.GetPosition().Get())
-        WriteConfig("size", self.GetSize().Get())
-        WriteConfig("center", False)
+        WriteConfig("position", self.GetPosition().Get(), commit=False)
+        WriteConfig("size", self.GetSize().Get(), commit=False)
+        WriteConfig("center", False, commit=False)
 
-      WriteConfig("workingdir", os.getcwd())
+      WriteConfig("workingdir", os.getcwd(), commit=False)
+
+      # All keys are written at once
+      CommitConfig()
+
+      # Unsaved changes are discarded
+      self.AutosaveTimer.Stop()
+      self.Journal.Close()
 
       self.Destroy()
 
@@ -552,10 +678,15 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
     return self.LoadedProject
 
 
-  ## Tests project type & calls correct method to read project file
+  ## Starts reading a project file
+  #
+  #  Project is read & validated in a background thread. Pages are
+  #  cleared & filled by \b \e OnProjectRead if it was read successfully.
   #
   #  \param project_file
   #  \b \e str : Path to project file
+  #  \return
+  #  \b \e True if project is being read
   def OpenProject(self, project_file):
     logger.debug("Opening project: {}".format(project_file))
 
@@ -564,63 +695,63 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
           GT("File does not exist or is not a regular file: {}").format(project_file))
       return False
 
-    data = readFile(project_file)
-
-    lines = data.split("\n")
+    # Path may be relative to current working directory
+    Thread(self.ReadProjectFile, os.path.abspath(project_file)).Start()
 
-    # FIXME: Need a better way to determine valid project
-    app = lines[0].lstrip("[")
-    if not app.startswith("DEBREATE"):
-      ShowErrorDialog(GT("Could not open project file"),
-          GT("Not a valid Debreate project: {}").format(project_file))
-      return False
+    return True
 
-    if self.LoadedProject and not self.ResetPages():
-      return False
 
-    # *** Get Control Data *** #
-    control_data = data.split("<<CTRL>>\n")[1].split("\n<</CTRL>>")[0]
-    depends_data = self.Wizard.GetPage(pgid.CONTROL).Set(control_data)
-    self.Wizard.GetPage(pgid.DEPENDS).Set(depends_data)
+  ## TODO: Doxygen
+  def ProjectChanged(self, event=None):
+    if logger.debugging():
+      logger.debug("MainWindow.OnProjectChanged:")
+      print("  Object: {}".format(event.GetEventObject()))
 
-    # *** Get Files Data *** #
-    files_data = data.split("<<FILES>>\n")[1].split("\n<</FILES>>")[0]
-    opened = self.Wizard.GetPage(pgid.FILES).Set(files_data)
+    self.ProjectDirty = True
 
-    # *** Get Scripts Data *** #
-    scripts_data = data.split("<<SCRIPTS>>\n")[1].split("\n<</SCRIPTS>>")[0]
-    self.Wizard.GetPage(pgid.SCRIPTS).Set(scripts_data)
 
-    # *** Get Changelog Data *** #
-    clog_data = data.split("<<CHANGELOG>>\n")[1].split("\n<</CHANGELOG>>")[0]
-    self.Wizard.GetPage(pgid.CHANGELOG).Set(clog_data)
+  ## Reads a project file & posts its sections to main window
+  #
+  #  Called from a background thread started by \b \e OpenProject.
+  #
+  #  \param project_file
+  #  \b \e str : Absolute path to project file
+  def ReadProjectFile(self, project_file):
+    app_version = None
+    sections = {}
+    error = None
 
-    # *** Get Copyright Data *** #
+    # Legacy & indexed projects are both supported
     try:
-      cpright_data = data.split("<<COPYRIGHT>>\n")[1].split("\n<</COPYRIGHT")[0]
-      self.Wizard.GetPage(pgid.COPYRIGHT).Set(cpright_data)
+      app_version, sections = ReadProject(project_file)
 
-    except IndexError:
-      pass
+      # Copyright section is optional
+      for NAME in ("CTRL", "FILES", "SCRIPTS", "CHANGELOG", "MENU", "BUILD",):
+        if NAME not in sections:
+          raise ValueError("Missing section {}: {}".format(NAME, project_file))
 
-    # *** Get Menu Data *** #
-    m_data = data.split("<<MENU>>\n")[1].split("\n<</MENU>>")[0]
-    self.Wizard.GetPage(pgid.MENU).SetLauncherData(m_data, enabled=True)
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+      error = e
 
-    # Get Build Data
-    build_data = data.split("<<BUILD>>\n")[1].split("\n<</BUILD")[0]#.split("\n")
-    self.Wizard.GetPage(pgid.BUILD).Set(build_data)
+    wx.PostEvent(self, ProjectReadEvent(0, path=project_file, version=app_version,
+        sections=sections, error=error, recovered=False))
 
-    return opened
 
+  ## Reads project left unsaved by a previous session from journal
+  #
+  #  Called from a background thread started by \b \e StartAutosave.
+  def ReadRecoveredProject(self):
+    sections = {}
+    error = None
 
-  ## TODO: Doxygen
-  def ProjectChanged(self, event=None):
-    if logger.debugging():
-      logger.debug("MainWindow.OnProjectChanged:")
-      print("  Object: {}".format(event.GetEventObject()))
+    try:
+      sections = self.Journal.Recover()
 
-    self.ProjectDirty = True
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+      error = e
+
+    wx.PostEvent(self, ProjectReadEvent(0, path=None, version=VERSION_string,
+        sections=sections, error=error, recovered=True))
 
 
   ## TODO: Doxygen
@@ -639,9 +770,58 @@ class MainWindow(wx.Frame, ModuleAccessCtrl):
     # Reset the saved project field so we know that a project file doesn't exists
     self.LoadedProject = None
 
+    self.ResetJournal()
+
     return True
 
 
+  ## Starts a new recovery journal
+  #
+  #  Current page data is used as baseline, so only later changes are
+  #  written to journal.
+  #
+  #  \param base
+  #  \b \e str : Project file that changes are relative to or \b \e None
+  #  \param sections
+  #  \b \e dict : Project sections stored in journal instead of base
+  def ResetJournal(self, base=None, sections=None):
+    self.Journal.Reset(base, sections)
+    self.JournalPages = self.GetJournalSections()
+
+    # Files in list are part of base
+    GetPage(pgid.FILES).GetListInstance().PopChanges()
+
+
+  ## Starts writing changes to recovery journal
+  #
+  #  If a previous session did not exit normally, asks to recover its
+  #  unsaved project.
+  #
+  #  \return
+  #  \b \e True if unsaved project is being recovered
+  def StartAutosave(self):
+    if not self.Journal.Open():
+      return False
+
+    recover = False
+    if self.Journal.HasRecovery():
+      recover = ConfirmationDialog(self, GT("Recover Project"),
+          GT("Debreate did not exit properly. Recover unsaved project?")).Confirmed()
+
+    # Start tracking file list changes
+    GetPage(pgid.FILES).GetListInstance().PopChanges()
+
+    if recover:
+      Thread(self.ReadRecoveredProject).Start()
+
+    else:
+      self.ResetJournal()
+
+    self.AutosaveTimer.Start(autosave_interval)
+
+    return recover
+
+
   ## TODO: Doxygen
   def SetSavedStatus(self, status):
     if status: # If status is changing to unsaved this is True
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+# HOWTO:
+#   Compares file system calls made while staging a directory tree:
+#	 - Run this script (from any location) with optional file count
+#	   (default: 50000) & number of files per sub-directory
+#	 - 'legacy' copies with shutil.copytree, then fixes permissions
+#	   with a second walk of the stage tree (old build behavior)
+#	 - 'builder' runs dbr.builder.Builder.StageFiles, which sets final
+#	   permissions when files & directories are created
+#	 - Each method is timed before calls are counted, since counting
+#	   wrappers slow down the worker threads used by 'builder'
+
+import builtins, os, shutil, sys, tempfile, time
+
+dir_root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, dir_root)
+sys.path.insert(0, os.path.join(dir_root, "lib"))
+
+from dbr.builder import Builder
+from dbr.project import PackageFile
+from dbr.project import ProjectModel
+
+
+# os functions that result in a file system call
+counted = (
+	"access", "chmod", "fchmod", "fstat", "lstat", "mkdir", "open", "readlink",
+	"scandir", "sendfile", "stat", "symlink", "utime",
+)
+
+counts = {}
+
+
+def CountCalls():
+	for NAME in counted:
+		function = getattr(os, NAME, None)
+		if function:
+			def wrapper(*args, _name=NAME, _function=function, **kwargs):
+				counts[_name] = counts.get(_name, 0) + 1
+				return _function(*args, **kwargs)
+
+			setattr(os, NAME, wrapper)
+
+	# Opening a file descriptor does not call the file system
+	builtin_open = builtins.open
+	def open_wrapper(file, *args, **kwargs):
+		if not isinstance(file, int):
+			counts["open"] = counts.get("open", 0) + 1
+		return builtin_open(file, *args, **kwargs)
+
+	builtins.open = open_wrapper
+
+
+def CreateTree(source, file_count, dir_size):
+	for INDEX in range(file_count):
+		dir_sub = os.path.join(source, "d{}".format(INDEX // dir_size))
+		if not INDEX % dir_size:
+			os.makedirs(dir_sub)
+
+		with open(os.path.join(dir_sub, "f{}".format(INDEX)), "wb") as fout:
+			fout.write(b"x" * (INDEX % 2048))
+
+		if not INDEX % 10:
+			os.chmod(os.path.join(dir_sub, "f{}".format(INDEX)), 0o775)
+
+
+def StageLegacy(source, stage_dir):
+	target = os.path.join(stage_dir, "usr", "share", "bench")
+	os.makedirs(os.path.dirname(target))
+	shutil.copytree(source, target, copy_function=shutil.copy2)
+
+	# HACK to fix file/dir permissions
+	for ROOT, DIRS, FILES in os.walk(stage_dir):
+		for D in DIRS:
+			os.chmod(os.path.join(ROOT, D), 0o0755)
+		for F in FILES:
+			F = os.path.join(ROOT, F)
+			if os.access(F, os.X_OK):
+				os.chmod(F, 0o0755)
+			else:
+				os.chmod(F, 0o0644)
+
+
+def StageBuilder(source, stage_dir):
+	project = ProjectModel()
+	project.Control = "Package: bench\nVersion: 1\nArchitecture: all\n"
+	project.Files = [PackageFile(source, "bench", "/usr/share")]
+
+	builder = Builder(project, os.path.dirname(stage_dir), os.path.basename(stage_dir).split("__dbp__")[0],
+			hashCache=False)
+	builder.StageFiles()
+
+
+def Time(name, function, source, stage_dir):
+	start = time.perf_counter()
+	function(source, stage_dir)
+	elapsed = time.perf_counter() - start
+
+	print("{}: {:.2f}s".format(name, elapsed))
+
+	shutil.rmtree(stage_dir)
+
+	return elapsed
+
+
+def Run(name, function, source, stage_dir):
+	counts.clear()
+	function(source, stage_dir)
+
+	total = sum(counts.values())
+	print("{}: {} calls".format(name, total))
+	for NAME in sorted(counts):
+		print("  {}: {}".format(NAME, counts[NAME]))
+
+	shutil.rmtree(stage_dir)
+
+	return total
+
+
+def main(args):
+	file_count = int(args[0]) if len(args) > 0 else 50000
+	dir_size = int(args[1]) if len(args) > 1 else 500
+
+	dir_temp = tempfile.mkdtemp(prefix="dbr-bench-")
+	try:
+		source = os.path.join(dir_temp, "source")
+		stage_dir = os.path.join(dir_temp, "bench__dbp__")
+
+		print("Creating {} files ...".format(file_count))
+		CreateTree(source, file_count, dir_size)
+
+		legacy = Time("legacy", StageLegacy, source, stage_dir)
+		builder = Time("builder", StageBuilder, source, stage_dir)
+
+		print("builder took {:.1f}% of legacy time".format(builder * 100 / legacy))
+
+		CountCalls()
+
+		legacy = Run("legacy", StageLegacy, source, stage_dir)
+		builder = Run("builder", StageBuilder, source, stage_dir)
+
+		print("builder used {:.1f}% of legacy calls".format(builder * 100 / legacy))
+
+	finally:
+		shutil.rmtree(dir_temp)
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
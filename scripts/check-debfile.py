@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# MIT licensing
+# See: docs/LICENSE.txt
+
+# HOWTO:
+#   Regression checks for the built-in .deb writer (libdbr.debfile):
+#	 - Run this script (from any location)
+#	 - A tree containing regular, executable, dot-prefixed & nested
+#	   files is written to a package for each available compressor
+#	 - Member paths & modes of the data archive are compared with the
+#	   expected values
+#	 - Exits with code 1 if any check fails
+
+import io, os, shutil, subprocess, sys, tarfile, tempfile
+
+dir_root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(dir_root, "lib"))
+
+from libdbr.debfile import DebWriter
+from libdbr.debfile import getCompressors
+
+
+# Files created in tree mapped to modes
+tree_files = {
+	"usr/bin/tool": 0o755,
+	"usr/share/doc/pkg/README": 0o644,
+	".hidden/file": 0o644,
+	"usr/share/pkg/.config/settings": 0o600,
+	"usr/share/pkg/.dotfile": 0o644,
+}
+
+# Directories expected in data archive (tarfile strips trailing "/")
+expected_dirs = [".", "./.hidden", "./usr", "./usr/bin", "./usr/share", "./usr/share/doc",
+	"./usr/share/doc/pkg", "./usr/share/pkg", "./usr/share/pkg/.config"]
+
+# Paths expected in data archive
+expected = sorted(expected_dirs + ["./{}".format(F) for F in tree_files])
+
+
+def CreateTree(root):
+	for PATH, MODE in tree_files.items():
+		path = os.path.join(root, PATH)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, "w") as fout:
+			fout.write(PATH)
+		os.chmod(path, MODE)
+
+	for ROOT, DIRS, FILES in os.walk(root):
+		for D in DIRS:
+			os.chmod(os.path.join(ROOT, D), 0o755)
+
+	os.makedirs(os.path.join(root, "DEBIAN"))
+
+
+def ReadMembers(deb):
+	members = {}
+	with open(deb, "rb") as fin:
+		if fin.read(8) != b"!<arch>\n":
+			raise ValueError("not an ar archive: {}".format(deb))
+
+		while True:
+			header = fin.read(60)
+			if len(header) < 60:
+				break
+
+			name = header[:16].decode("ascii").strip()
+			size = int(header[48:58])
+			members[name] = fin.read(size)
+			if size % 2:
+				fin.read(1)
+
+	return members
+
+
+def OpenData(name, data):
+	if name.endswith(".zst"):
+		try:
+			import zstandard
+			data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+		except ImportError:
+			cmd = shutil.which("zstd")
+			if not cmd:
+				raise
+			data = subprocess.run([cmd, "-dc"], input=data, stdout=subprocess.PIPE, check=True).stdout
+
+	return tarfile.open(fileobj=io.BytesIO(data))
+
+
+def Check(compression, dir_temp, tree):
+	deb = os.path.join(dir_temp, "pkg-{}.deb".format(compression))
+	with DebWriter(deb, compression) as writer:
+		writer.writeControl([("control", "Package: pkg\nVersion: 1\nArchitecture: all\n", 0o644)])
+		writer.openData()
+		writer.addTree(tree, exclude=("DEBIAN",))
+
+	errors = []
+	members = ReadMembers(deb)
+	data_name = writer.getDataName()
+	if data_name not in members:
+		return ["{}: missing member {}".format(compression, data_name)]
+
+	try:
+		with OpenData(data_name, members[data_name]) as tar:
+			infos = {I.name: I for I in tar.getmembers()}
+
+	except ImportError:
+		print("{}: skipped, cannot decompress".format(compression))
+		return []
+
+	if sorted(infos) != expected:
+		errors.append("{}: unexpected paths:\n  {}".format(compression, "\n  ".join(sorted(infos))))
+
+	for PATH in expected_dirs:
+		info = infos.get(PATH)
+		if info and not info.isdir():
+			errors.append("{}: {} is not a directory".format(compression, PATH))
+
+	for PATH in expected_dirs:
+		info = infos.get(PATH)
+		if info and not info.isdir():
+			errors.append("{}: {} is not a directory".format(compression, PATH))
+
+	for PATH, MODE in tree_files.items():
+		info = infos.get("./{}".format(PATH))
+		if info and info.mode != MODE:
+			errors.append("{}: mode of {} is {:o}, expected {:o}".format(compression, PATH, info.mode,
+					MODE))
+
+	# Compare with dpkg-deb if available
+	dpkg = shutil.which("dpkg-deb")
+	if dpkg and not errors:
+		output = subprocess.run([dpkg, "-c", deb], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		if output.returncode != 0:
+			errors.append("{}: dpkg-deb could not read package: {}".format(compression,
+					output.stderr.decode("utf-8", "replace").strip()))
+
+	return errors
+
+
+def main():
+	dir_temp = tempfile.mkdtemp(prefix="dbr-check-")
+	try:
+		tree = os.path.join(dir_temp, "tree")
+		CreateTree(tree)
+
+		errors = []
+		for COMPRESSION in getCompressors():
+			errors += Check(COMPRESSION, dir_temp, tree)
+
+	finally:
+		shutil.rmtree(dir_temp)
+
+	if errors:
+		print("\n".join(errors))
+		return 1
+
+	print("All checks passed")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -4,7 +4,7 @@
 # See: docs/LICENSE.txt
 
 
-import os, time, traceback, wx
+import collections, os, traceback, wx
 
 import util
 
@@ -18,7 +18,8 @@ from globals.fileitem    import FileItem
 from globals.ident       import btnid
 from globals.ident       import menuid
 from globals.strings     import GS
-from globals.threads     import Thread
+from globals.watcher     import FS_OVERFLOW
+from globals.watcher     import FileWatcher
 from input.text          import TextAreaPanel
 from ui.button           import CreateButton
 from ui.dialog           import GetFileOpenDialog
@@ -31,8 +32,12 @@ from wiz.helper          import GetMenu
 
 logger = util.getLogger()
 
-# How often the log window will be refreshed
+# How often the log window will be refreshed if log file cannot be watched with inotify
 LOG_WINDOW_REFRESH_INTERVAL = 1
+# Maximum number of lines displayed, older lines are removed
+LOG_WINDOW_MAX_LINES = 5000
+# Maximum number of bytes read from end of log file when it is loaded
+LOG_WINDOW_MAX_READ = 512 * 1024
 
 def SetLogWindowRefreshInterval(value):
   global LOG_WINDOW_REFRESH_INTERVAL
@@ -57,7 +62,16 @@ class LogWindow(wx.Dialog):
     self.LogFile = FileItem(logFile)
     self.SetTitle()
 
-    self.LogPollThread = Thread(self.PollLogFile)
+    # Position where next read of log file starts
+    self.LogOffset = 0
+    # Inode of log file, changes when log is rotated
+    self.LogInode = None
+    # Incomplete last line of log file, displayed after it is finished
+    self.LogPartial = b""
+    # Lengths of displayed lines
+    self.LogLines = collections.deque()
+
+    self.LogWatcher = FileWatcher(self.OnLogDirChanges, LOG_WINDOW_REFRESH_INTERVAL, writes=True)
 
     self.DspLog = TextAreaPanel(self, style=wx.TE_READONLY)
     self.DspLog.font_size = 8
@@ -119,10 +133,20 @@ class LogWindow(wx.Dialog):
     self.SetPosition(wx.Point(posX, posY))
 
 
+  ## Clears displayed text so log file is read again from start
+  def ClearLog(self):
+    self.DspLog.Clear()
+    self.LogOffset = 0
+    self.LogInode = None
+    self.LogPartial = b""
+    self.LogLines.clear()
+
+
   ## Hides the log window & clears contents
   def HideLog(self):
     self.Show(False)
-    self.DspLog.Clear()
+    self.LogWatcher.Clear()
+    self.ClearLog()
 
 
   ## Changes the font size
@@ -150,9 +174,25 @@ class LogWindow(wx.Dialog):
     self.HideLog()
 
 
+  ## Posts refresh event if log file was changed
+  #
+  #  Called from watcher thread.
+  #
+  #  \param changes
+  #  \b \e List of (action, path) tuples
+  def OnLogDirChanges(self, changes):
+    log_path = self.LogFile.GetPath()
+
+    for ACTION, PATH in changes:
+      if PATH == log_path or ACTION == FS_OVERFLOW:
+        wx.PostEvent(self, RefreshLogEvent(0))
+        return
+
+
   ## Called by refresh event to update the log display
   def OnLogTimestampChanged(self, event=None):
-    self.RefreshLog()
+    if self.IsShown():
+      self.TailLog()
 
 
   ## Opens a new log file
@@ -215,37 +255,92 @@ class LogWindow(wx.Dialog):
       event.Skip(True)
 
 
-  ## Creates a thread that polls for changes in log file
-  def PollLogFile(self, args=None):
-    while self and self.IsShown():
-      if self.LogFile.TimestampChanged():
-        print("Log timestamp changed, loading new log ...")
+  ## Reads text added to log file since previous read
+  #
+  #  If log file was replaced or truncated, reading starts again from
+  #  beginning, or near end of file if it is large.
+  #
+  #  \return
+  #  \b \e tuple : \b \e True if displayed text should be replaced &
+  #  string of complete lines read
+  def ReadLogChanges(self):
+    try:
+      with open(self.LogFile.GetPath(), "rb") as fin:
+        st = os.fstat(fin.fileno())
 
-        wx.PostEvent(self, RefreshLogEvent(0))
+        reset = st.st_ino != self.LogInode or st.st_size < self.LogOffset
+        if reset:
+          self.LogInode = st.st_ino
+          self.LogPartial = b""
+          self.LogOffset = max(0, st.st_size - LOG_WINDOW_MAX_READ)
+
+        start = self.LogOffset
+        fin.seek(start)
+        data = fin.read()
 
-      time.sleep(LOG_WINDOW_REFRESH_INTERVAL)
+    except OSError:
+      return (False, "")
 
+    self.LogOffset += len(data)
+    data = self.LogPartial + data
 
-  ## Fills log with text file contents
+    # Lines are displayed after they are finished
+    end = data.rfind(b"\n") + 1
+    self.LogPartial = data[end:]
+    data = data[:end]
+
+    if reset and start > 0:
+      # Reading started in middle of a line
+      data = data[data.find(b"\n") + 1:]
+
+    return (reset, data.decode("utf-8", "replace"))
+
+
+  ## Reloads log file
   def RefreshLog(self, event=None):
-    if self.LogFile.IsFile():
-      log_data = self.LogFile.Read()
+    self.ClearLog()
+    self.TailLog()
+
+
+  ## Appends text added to log file to display
+  #
+  #  Only last \b \e LOG_WINDOW_MAX_LINES lines are kept.
+  def TailLog(self):
+    reset, text = self.ReadLogChanges()
+
+    if reset and self.LogLines:
+      self.DspLog.Clear()
+      self.LogLines.clear()
 
-      if not self.DspLog.IsEmpty():
-        self.DspLog.Clear()
+    if not text:
+      return
+
+    lines = text.split("\n")[:-1]
+    if len(lines) > LOG_WINDOW_MAX_LINES:
+      lines = lines[-LOG_WINDOW_MAX_LINES:]
+      text = "\n".join(lines) + "\n"
+
+    try:
+      text_ctrl = self.DspLog.GetTextCtrl()
+
+      # Remove oldest lines before adding new ones
+      excess = len(self.LogLines) + len(lines) - LOG_WINDOW_MAX_LINES
+      if excess > 0:
+        removed = 0
+        for INDEX in range(excess):
+          removed += self.LogLines.popleft()
 
-      self.DspLog.SetValue(log_data)
+        text_ctrl.Remove(0, removed)
 
-      try:
-        # Yield here to make sure last line is displayed
-        # FIXME: Causes delay when debug enabled
-        wx.SafeYield()
-        self.DspLog.ShowPosition(self.DspLog.GetLastPosition())
+      text_ctrl.AppendText(text)
+      self.LogLines.extend(len(L) + 1 for L in lines)
 
-      except wx.PyDeadObjectError:
-        tb_error = GS(traceback.format_exc())
+      self.DspLog.ShowPosition(self.DspLog.GetLastPosition())
 
-        logger.warn("Error refreshing log window. Details below:\n\n{}".format(tb_error))
+    except wx.PyDeadObjectError:
+      tb_error = GS(traceback.format_exc())
+
+      logger.warn("Error refreshing log window. Details below:\n\n{}".format(tb_error))
 
 
   ## Changes the file to be loaded & displayed
@@ -257,6 +352,9 @@ class LogWindow(wx.Dialog):
     self.RefreshLog()
     self.SetTitle()
 
+    if self.IsShown():
+      self.WatchLog()
+
 
   ## Updates the window's title using path of log file
   def SetTitle(self):
@@ -269,11 +367,10 @@ class LogWindow(wx.Dialog):
   def ShowLog(self):
     self.RefreshLog()
     self.Show(True)
+    self.WatchLog()
 
-    if not self.LogPollThread.IsActive():
-      logger.debug("Starting log polling thread ...")
 
-      self.LogPollThread.Start()
-
-    else:
-      logger.debug("Log polling thread is already started")
+  ## Watches directory of log file for changes
+  def WatchLog(self):
+    self.LogWatcher.Clear()
+    self.LogWatcher.Watch(os.path.dirname(self.LogFile.GetPath()))
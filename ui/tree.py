@@ -11,6 +11,10 @@ import util
 from dbr.colors      import COLOR_executable
 from dbr.colors      import COLOR_link
 from dbr.colors      import COLOR_warn
+from dbr.event       import EVT_FILE_SYSTEM
+from dbr.event       import EVT_MIME_TYPES
+from dbr.event       import FileSystemEvent
+from dbr.event       import MimeTypesEvent
 from dbr.functions   import MouseInsideWindow
 from dbr.image       import GetCursor
 from dbr.imagelist   import sm_DirectoryImageList as ImageList
@@ -20,7 +24,12 @@ from globals.devices import GetMountedStorageDevices
 from globals.execute import ExecuteCommand
 from globals.execute import GetExecutable
 from globals.ident   import menuid
-from globals.mime    import GetFileMimeType
+from globals.mime    import GetFileMimeTypes
+from globals.mime    import GuessFileMimeType
+from globals.threads import Thread
+from globals.watcher import FS_MODIFY
+from globals.watcher import FS_OVERFLOW
+from globals.watcher import FileWatcher
 from ui.dialog       import ConfirmationDialog
 from ui.dialog       import ShowErrorDialog
 from ui.layout       import BoxSizer
@@ -30,6 +39,12 @@ from wiz.helper      import GetMainWindow
 
 logger = util.getLogger()
 
+## Delay, in milliseconds, before checking visible items with unresolved MIME types
+mime_interval = 100
+
+## Maximum number of MIME types resolved by a single background thread
+mime_batch_size = 128
+
 ## A wxcustom tree item
 #
 #  \param item
@@ -48,48 +63,72 @@ class PathItem:
     self.Children = []
     self.Type = ""
 
+    # Set to True when real MIME type has been read from file
+    self.Resolved = False
+
     if self.Path:
-      self.Type = GetFileMimeType(self.Path)
+      # Don't use MIME type 'inode' for directories (symlinks are inodes)
+      if os.path.isdir(self.Path):
+        self.Resolved = True
+        self.SetMimeType("folder")
 
-      executables_binary = (
-        "x-executable",
-        )
+      else:
+        # Real type is resolved later by DirectoryTree, so only the
+        # filename & permissions are used here
+        mime = GuessFileMimeType(self.Path)
+        if not mime and os.access(self.Path, os.X_OK):
+          mime = "application/x-executable"
 
-      executables_text = (
-        "x-python",
-        "x-shellscript",
-        )
+        self.SetMimeType(mime)
 
-      # Don't use MIME type 'inode' for directories (symlinks are inodes)
-      if os.path.isdir(self.Path):
-        self.Type = "folder"
 
-      elif self.Type.startswith("image"):
-        self.Type = "image"
+  ## Sets type & image index from a MIME type
+  #
+  #  \param mime
+  #  \b \e string : MIME type or "folder"
+  def SetMimeType(self, mime):
+    executables_binary = (
+      "x-executable",
+      "x-pie-executable",
+      "x-sharedlib",
+      )
 
-      elif self.Type.startswith("audio"):
-        self.Type = "audio"
+    executables_text = (
+      "x-python",
+      "x-shellscript",
+      )
 
-      elif self.Type.startswith("video"):
-        self.Type = "video"
+    self.Type = mime
 
-      else:
-        # Exctract second part of MIME type
-        self.Type = self.Type.split("/")[-1]
+    if self.Type == "folder":
+      pass
+
+    elif self.Type.startswith("image"):
+      self.Type = "image"
+
+    elif self.Type.startswith("audio"):
+      self.Type = "audio"
+
+    elif self.Type.startswith("video"):
+      self.Type = "video"
+
+    else:
+      # Exctract second part of MIME type
+      self.Type = self.Type.split("/")[-1]
 
-        if self.Type in executables_binary:
-          self.Type = "executable-binary"
+      if self.Type in executables_binary:
+        self.Type = "executable-binary"
 
-        elif self.Type in executables_text:
-          self.Type = "executable-script"
+      elif self.Type in executables_text:
+        self.Type = "executable-script"
 
-      self.ImageIndex = ImageList.GetImageIndex(self.Type)
+    self.ImageIndex = ImageList.GetImageIndex(self.Type)
 
-      # Use generic 'file' image as default
-      if self.ImageIndex == ImageList.GetImageIndex("failsafe"):
-        self.ImageIndex = ImageList.GetImageIndex("file")
+    # Use generic 'file' image as default
+    if self.ImageIndex == ImageList.GetImageIndex("failsafe"):
+      self.ImageIndex = ImageList.GetImageIndex("file")
 
-      logger.debug("PathItem type: {} ({})".format(self.Type, self.Path))
+    logger.debug("PathItem type: {} ({})".format(self.Type, self.Path))
 
 
   ## TODO: Doxygen
@@ -201,6 +240,7 @@ class DirectoryTree(wx.TreeCtrl):
     self.root_item = self.AddRoot(GT("System"), ImageList.GetImageIndex("computer"))
 
     self.COLOR_default = self.GetItemBackgroundColour(self.root_item)
+    self.COLOR_text = self.GetItemTextColour(self.root_item)
 
     # List of sub-root items that shouldn't be deleted if they exist on filesystem
     # FIXME: Should not need to use a root list now with GetDeviceMountPoints function
@@ -233,6 +273,16 @@ class DirectoryTree(wx.TreeCtrl):
     # Tells app if user is currently dragging an item from tree
     self.dragging = False
 
+    # Lists of (parent, children) with MIME types not yet resolved
+    self.mime_pending = []
+    # Incremented when all items are deleted so results for old items are discarded
+    self.mime_generation = 0
+    self.mime_thread = None
+    self.mime_timer = wx.Timer(self)
+
+    # Expanded directories are watched so changes are shown without refreshing
+    self.watcher = FileWatcher(self.OnFileSystemChanges)
+
     # *** Event handlers *** #
 
     self.Bind(wx.EVT_LEFT_DCLICK, self.OnDoubleClick)
@@ -254,6 +304,14 @@ class DirectoryTree(wx.TreeCtrl):
 
     self.Bind(wx.EVT_TREE_END_LABEL_EDIT, self.OnEndLabelEdit)
 
+    self.Bind(wx.EVT_TIMER, self.OnMimeTimer, self.mime_timer)
+    # Items may become visible without being expanded
+    self.Bind(wx.EVT_SCROLLWIN, self.OnScroll)
+    self.Bind(wx.EVT_MOUSEWHEEL, self.OnScroll)
+    self.Bind(wx.EVT_SIZE, self.OnScroll)
+    EVT_MIME_TYPES(self, wx.ID_ANY, self.OnMimeTypes)
+    EVT_FILE_SYSTEM(self, wx.ID_ANY, self.OnFileSystemEvent)
+
     self.Bind(wx.EVT_TREE_BEGIN_DRAG, self.OnDragBegin)
     self.Bind(wx.EVT_LEFT_UP, self.OnDragEnd)
 
@@ -304,8 +362,8 @@ class DirectoryTree(wx.TreeCtrl):
       #    or other errors?
       self.SetItemHasChildren(tree_item)
 
-    elif os.access(path, os.X_OK):
-      self.SetItemTextColour(base_item, COLOR_executable)
+    else:
+      self.UpdateItemColour(tree_item)
 
     if os.path.islink(path):
       self.SetItemTextColour(base_item, COLOR_link)
@@ -333,6 +391,10 @@ class DirectoryTree(wx.TreeCtrl):
   #  TODO: Test if PathItem is actually removed from memory
   def Delete(self, item):
     if item:
+      # Don't update images of deleted items
+      self.SetResolved(item)
+      self.UnwatchItem(item)
+
       deleted = wx.TreeCtrl.Delete(self, item.GetBaseItem())
 
       item_index = 0
@@ -358,6 +420,10 @@ class DirectoryTree(wx.TreeCtrl):
   def DeleteAllItems(self):
     self.DeleteChildren(self.root_item)
 
+    self.watcher.Clear()
+    self.mime_pending = []
+    self.mime_generation += 1
+
     # ???: Redundant
     for I in reversed(self.item_list):
       del I
@@ -396,6 +462,8 @@ class DirectoryTree(wx.TreeCtrl):
         # FIXME: Should use regular expressions for filter
         item_path = item.GetPath()
 
+        self.Freeze()
+
         try:
           for LABEL in os.listdir(item_path):
             # Ignore filtered items
@@ -424,15 +492,27 @@ class DirectoryTree(wx.TreeCtrl):
 
             item.AddChild(child)
 
+          pending = []
           for FILE, PATH in sorted(files):
             child = self.AppendItem(item, FILE, PATH)
             self.SetItemImage(child, child.ImageIndex, wx.TreeItemIcon_Normal)
 
             item.AddChild(child)
+            pending.append(child)
+
+          # Images are updated when items become visible
+          if pending:
+            self.mime_pending.append((item, pending,))
+
+          if not self.watcher.IsWatched(item_path):
+            self.watcher.Watch(item_path)
 
         except OSError:
           logger.warn("No such file or directory: {}".format(item_path))
 
+        finally:
+          self.Thaw()
+
     # Recursively expand parent items
     parent = self.GetItemParent(item)
     if parent:
@@ -441,6 +521,8 @@ class DirectoryTree(wx.TreeCtrl):
     if isinstance(item, PathItem):
       item = item.GetBaseItem()
 
+    self.QueueMimeTypes()
+
     return wx.TreeCtrl.Expand(self, item)
 
 
@@ -623,6 +705,54 @@ class DirectoryTree(wx.TreeCtrl):
     return tuple(selected)
 
 
+  ## Retrieves items that are shown in the visible area of the tree
+  #
+  #  \param items
+  #  \b \e List of sibling \b \e PathItem instances in display order
+  #  \return
+  #  \b \e List of visible items
+  def GetVisibleItems(self, items):
+    height = self.GetClientSize()[1]
+
+    ## Retrieves vertical position of an item relative to visible area
+    def GetTop(index):
+      rect = self.GetBoundingRect(items[index].GetBaseItem())
+      if not rect:
+        return None
+
+      return rect.y
+
+    if GetTop(0) == None:
+      return []
+
+    # Items are in display order, so binary search for first & last visible
+    first = 0
+    last = len(items)
+    while first < last:
+      middle = (first + last) // 2
+      if GetTop(middle) < 0:
+        first = middle + 1
+
+      else:
+        last = middle
+
+    # Include item that is partially shown at top
+    if first > 0:
+      first -= 1
+
+    last = len(items)
+    low = first
+    while low < last:
+      middle = (low + last) // 2
+      if GetTop(middle) <= height:
+        low = middle + 1
+
+      else:
+        last = middle
+
+    return items[first:last]
+
+
   ## Expands the user's home directory
   def InitDirectoryLayout(self):
     if self.mount_list:
@@ -943,6 +1073,55 @@ class DirectoryTree(wx.TreeCtrl):
     return self.Expand(item)
 
 
+  ## Passes changes from watcher thread to main thread
+  #
+  #  \param changes
+  #  \b \e List of (action, path) tuples
+  def OnFileSystemChanges(self, changes):
+    if self:
+      wx.PostEvent(self, FileSystemEvent(0, changes=changes))
+
+
+  ## Updates items of watched directories that have changed
+  def OnFileSystemEvent(self, event=None):
+    reload_dirs = set()
+    modified = set()
+
+    for ACTION, PATH in event.changes:
+      if ACTION == FS_OVERFLOW:
+        # Changes were lost
+        self.ReCreateTree()
+        return
+
+      if ACTION == FS_MODIFY:
+        modified.add(PATH)
+
+      else:
+        reload_dirs.add(os.path.dirname(PATH))
+
+    reload_items = []
+    for ITEM in self.item_list:
+      if ITEM.Path in reload_dirs and self.watcher.IsWatched(ITEM.Path):
+        reload_items.append(ITEM)
+
+      elif ITEM.Path in modified and ITEM.IsFile():
+        self.UpdateItemColour(ITEM)
+
+    # Deepest directories first so reloading a parent does not leave
+    # deleted items to be reloaded
+    reload_items.sort(key=lambda I: I.Path.count(os.sep), reverse=True)
+
+    if reload_items:
+      self.Freeze()
+
+      try:
+        for ITEM in reload_items:
+          self.ReloadChildren(ITEM)
+
+      finally:
+        self.Thaw()
+
+
   ## Catch mouse left down event for custom selection behavior
   #
   #  Resets selection to only currently selected item if modifiers are not present.
@@ -983,11 +1162,69 @@ class DirectoryTree(wx.TreeCtrl):
         self.SendToTrash(selected)
 
 
+  ## Starts a background thread to resolve MIME types of visible items
+  #
+  #  Timer is not restarted if no pending items are visible. It is queued
+  #  again when items are expanded or scrolled into view, or after thread
+  #  has finished.
+  def OnMimeTimer(self, event=None):
+    if self.mime_thread and self.mime_thread.is_alive():
+      # Check again after thread finishes
+      self.mime_timer.StartOnce(mime_interval)
+      return
+
+    visible = []
+    for GROUP in list(self.mime_pending):
+      parent, children = GROUP
+      children[:] = [C for C in children if not C.Resolved]
+      if not children:
+        self.mime_pending.remove(GROUP)
+        continue
+
+      if len(visible) < mime_batch_size and self.IsExpanded(parent):
+        visible += self.GetVisibleItems(children)
+
+    if visible:
+      visible = visible[:mime_batch_size]
+      self.mime_thread = Thread(self.ResolveMimeTypes, visible, self.mime_generation)
+      self.mime_thread.Start()
+
+
+  ## Updates images of items after MIME types are resolved
+  #
+  #  More visible items may be pending if batch was full.
+  def OnMimeTypes(self, event=None):
+    if event and event.generation == self.mime_generation:
+      self.Freeze()
+
+      try:
+        for ITEM, MIME in zip(event.items, event.types):
+          if ITEM.Resolved:
+            continue
+
+          ITEM.Resolved = True
+          ITEM.SetMimeType(MIME)
+          self.SetItemImage(ITEM, ITEM.ImageIndex, wx.TreeItemIcon_Normal)
+
+      finally:
+        self.Thaw()
+
+    self.QueueMimeTypes()
+
+
   ## Catches menu event to refresh/recreate tree
   def OnRefresh(self, event=None):
     self.ReCreateTree()
 
 
+  ## Checks for pending items that were scrolled into view
+  def OnScroll(self, event=None):
+    self.QueueMimeTypes()
+
+    if event:
+      event.Skip()
+
+
   ## Sets the current path to the newly selected item's path
   #
   #  FIXME: Behavior is different between wx 2.8 & 3.0.
@@ -1016,6 +1253,15 @@ class DirectoryTree(wx.TreeCtrl):
     return self.ctx_menu.FindItemById(menuid.TOGGLEHIDDEN).IsChecked()
 
 
+  ## Starts timer to resolve MIME types of items that may have become visible
+  #
+  #  Timer only runs once, so it does not keep waking up while no pending
+  #  items are visible.
+  def QueueMimeTypes(self):
+    if self.mime_pending and not self.mime_timer.IsRunning():
+      self.mime_timer.StartOnce(mime_interval)
+
+
   ## Refreshes the tree's displayed layout
   def ReCreateTree(self):
     selected = self.GetSelection()
@@ -1074,6 +1320,21 @@ class DirectoryTree(wx.TreeCtrl):
       self.SelectItem(selected)
 
 
+  ## Reads MIME types of items from files
+  #
+  #  Called from a background thread. Results are posted to tree in a
+  #  single event.
+  #
+  #  \param items
+  #  \b \e List of \b \e PathItem instances
+  #  \param generation
+  #  Value of \b \e mime_generation when thread was started
+  def ResolveMimeTypes(self, items, generation):
+    types = GetFileMimeTypes([I.Path for I in items])
+
+    wx.PostEvent(self, MimeTypesEvent(0, items=items, types=types, generation=generation))
+
+
   ## Send that selected item's path to trash
   def SendToTrash(self, item_list):
     path_list = []
@@ -1144,6 +1405,48 @@ class DirectoryTree(wx.TreeCtrl):
     return wx.TreeCtrl.SetItemImage(self, item, image_index, state)
 
 
+  ## Re-reads children of a directory item from filesystem
+  #
+  #  \param item
+  #  \b \e PathItem instance
+  def ReloadChildren(self, item):
+    expanded = self.IsExpanded(item)
+
+    children = item.GetChildren()
+    for CHILD in children:
+      self.SetResolved(CHILD)
+      self.UnwatchItem(CHILD)
+
+    removed = set()
+    pending = list(children)
+    while pending:
+      CHILD = pending.pop()
+      removed.add(id(CHILD))
+      pending += CHILD.GetChildren()
+
+    self.item_list = [I for I in self.item_list if id(I) not in removed]
+
+    wx.TreeCtrl.DeleteChildren(self, item.GetBaseItem())
+    item.RemoveChildren()
+
+    if expanded:
+      self.Expand(item)
+
+    else:
+      self.SetItemHasChildren(item)
+
+
+  ## Marks an item & its children so their images are not updated by background threads
+  #
+  #  \param item
+  #  \b \e PathItem instance
+  def SetResolved(self, item):
+    item.Resolved = True
+
+    for CHILD in item.GetChildren():
+      self.SetResolved(CHILD)
+
+
   ## Sets the currently selected path
   #
   #  \param path
@@ -1152,6 +1455,18 @@ class DirectoryTree(wx.TreeCtrl):
     self.current_path = path
 
 
+  ## Stops watching an item's directory & directories of its children
+  #
+  #  \param item
+  #  \b \e PathItem instance
+  def UnwatchItem(self, item):
+    if self.watcher.IsWatched(item.Path):
+      self.watcher.Unwatch(item.Path)
+
+    for CHILD in item.GetChildren():
+      self.UnwatchItem(CHILD)
+
+
   ## Sets the visible cursor on the Files page dependent on drag-&-drop state
   #
   #  FIXME: Does not work for wx 2.8
@@ -1177,6 +1492,21 @@ class DirectoryTree(wx.TreeCtrl):
       logger.error("\n	{}\n	{}\n\n{}".format(err_l1, err_l2, traceback.format_exc()))
 
 
+  ## Sets text colour of a file item depending on executable bit
+  #
+  #  \param item
+  #  \b \e PathItem instance
+  def UpdateItemColour(self, item):
+    if os.path.islink(item.Path):
+      return
+
+    if os.access(item.Path, os.X_OK):
+      self.SetItemTextColour(item.GetBaseItem(), COLOR_executable)
+
+    else:
+      self.SetItemTextColour(item.GetBaseItem(), self.COLOR_text)
+
+
 ## Directory tree with a nicer border
 class DirectoryTreePanel(BorderedPanel):
   def __init__(self, parent, w_id=wx.ID_ANY, pos=wx.DefaultPosition, size=wx.DefaultSize,
@@ -6,13 +6,12 @@
 # * See: docs/LICENSE.txt for details.               *
 # ****************************************************
 
-import errno, os, sys
+import atexit, errno, os, queue, sys, threading, time
 
 from globals          import paths
 from globals.dateinfo import GetDate
 from globals.dateinfo import GetTime
 from globals.dateinfo import dtfmt
-from libdbr.fileio    import appendFile
 
 
 ## Logs events to console & log file.
@@ -51,6 +50,26 @@ class LogLevel:
 class Logger:
   loglevel = LogLevel.INFO
   logfile = None
+  # open handle for appending to log file
+  logstream = None
+  # approximate size of log file in bytes
+  logsize = 0
+  lastflush = 0
+  lock = threading.Lock()
+  # messages waiting for writer thread when queued logging is used
+  msgqueue = None
+  writer = None
+  # held while adding to queue, so nothing is added after it is stopped
+  queuelock = threading.Lock()
+
+  # number of bytes buffered before written to log file
+  buffer_size = 64 * 1024
+  # maximum number of seconds between writes to log file
+  flush_interval = 1.0
+  # log file is rotated when it reaches this number of bytes
+  max_size = 5 * 1024 * 1024
+  # number of rotated log files kept
+  max_backups = 5
 
   def startLogging(self):
     dir_logs = paths.getLogsDir()
@@ -66,15 +85,141 @@ class Logger:
     date_time = "{} {}".format(date_start, time_start)
     header = "--------------- Log Start: {} ---------------\n".format(date_time)
     # write header to log file
-    appendFile(self.logfile, header)
+    with self.lock:
+      self.openStream()
+      self.writeStream(header, True)
 
   def endLogging(self):
-    if not self.logfile or not os.path.isfile(self.logfile):
-      # initialization failed or user deleted log file
+    self.stopQueue()
+    with self.lock:
+      if not self.logstream:
+        # initialization failed
+        return
+      date_time = "{} {}".format(GetDate(dtfmt.LOG), GetTime(dtfmt.LOG))
+      footer = "\n--------------- Log End:   {} ---------------\n\n".format(date_time)
+      self.writeStream(footer, True)
+      self.closeStream()
+
+  ## Opens log file for appending.
+  def openStream(self):
+    try:
+      self.logstream = open(self.logfile, "a", encoding="utf-8", buffering=self.buffer_size)
+    except OSError as e:
+      self.logstream = None
+      sys.stderr.write("ERROR:   cannot open log file: {} ({})\n".format(self.logfile, e.strerror))
+      return
+    self.logsize = self.logstream.tell()
+    self.lastflush = time.monotonic()
+
+  ## Writes buffered messages & closes log file.
+  def closeStream(self):
+    if self.logstream:
+      try:
+        self.logstream.close()
+      except OSError:
+        pass
+      self.logstream = None
+
+  ## Moves log file to numbered backup & starts a new file.
+  #
+  #  Oldest backup is removed when there are more than `max_backups`.
+  def rotate(self):
+    self.closeStream()
+    try:
+      for idx in range(self.max_backups - 1, 0, -1):
+        backup = "{}.{}".format(self.logfile, idx)
+        if os.path.isfile(backup):
+          os.replace(backup, "{}.{}".format(self.logfile, idx + 1))
+      os.replace(self.logfile, self.logfile + ".1")
+    except OSError as e:
+      sys.stderr.write("ERROR:   cannot rotate log file: {} ({})\n".format(self.logfile, e.strerror))
+    self.openStream()
+
+  ## Appends text to log file.
+  #
+  #  Must be called with `lock` held. Text is buffered & written when
+  #  buffer is full, `flush_interval` has passed or `flush` is set.
+  #
+  #  @param text
+  #    String to write.
+  #  @param flush
+  #    If `True`, writes buffer to file immediately.
+  def writeStream(self, text, flush=False):
+    if not self.logstream:
+      return
+    try:
+      self.logstream.write(text)
+      self.logsize += len(text)
+      now = time.monotonic()
+      if flush or now - self.lastflush >= self.flush_interval:
+        self.logstream.flush()
+        self.lastflush = now
+    except OSError:
+      # don't try to write to log file again
+      self.closeStream()
+      return
+    if self.logsize >= self.max_size:
+      self.rotate()
+
+  ## Starts writer thread for queued logging.
+  #
+  #  Messages are formatted & written to console & log file by the
+  #  writer thread, so logging does not block calling thread.
+  def startQueue(self):
+    if self.writer:
+      return
+    self.msgqueue = queue.Queue()
+    self.writer = threading.Thread(target=self.processQueue, name="logger")
+    # don't prevent app from exiting
+    self.writer.daemon = True
+    self.writer.start()
+    # make sure queued messages are written
+    atexit.register(self.stopQueue)
+
+  ## Writes remaining queued messages & stops writer thread.
+  def stopQueue(self):
+    if not self.writer:
       return
-    date_time = "{} {}".format(GetDate(dtfmt.LOG), GetTime(dtfmt.LOG))
-    footer = "\n--------------- Log End:   {} ---------------\n\n".format(date_time)
-    appendFile(self.logfile, footer)
+    with self.queuelock:
+      msgqueue = self.msgqueue
+      # new messages are written directly
+      self.msgqueue = None
+      msgqueue.put(None)
+    self.writer.join()
+    self.writer = None
+
+  ## Waits until queued messages have been written to console & log file.
+  #
+  #  Should be called before printing directly to console so that output
+  #  is not interleaved with log messages.
+  def sync(self):
+    msgqueue = self.msgqueue
+    if msgqueue:
+      msgqueue.join()
+
+  ## Writer thread loop.
+  def processQueue(self):
+    msgqueue = self.msgqueue
+    while True:
+      try:
+        record = msgqueue.get(timeout=self.flush_interval)
+      except queue.Empty:
+        self.flush()
+        continue
+      if record == None:
+        msgqueue.task_done()
+        break
+      try:
+        self.write(*record)
+      finally:
+        msgqueue.task_done()
+    self.flush()
+
+  ## Writes buffered messages to log file.
+  def flush(self):
+    with self.lock:
+      if self.logstream:
+        self.writeStream("", True)
 
   def setLevel(self, loglevel):
     if type(loglevel) == str:
@@ -91,14 +236,31 @@ class Logger:
     return self.logfile
 
   def debugging(self):
-    return self.getLevel() >= LogLevel.DEBUG
+    return self.enabled(LogLevel.DEBUG)
+
+  ## Checks if messages of a level are shown.
+  #
+  #  Can be used to skip formatting messages that would be discarded.
+  def enabled(self, lvl):
+    return self.loglevel != LogLevel.SILENT and self.loglevel >= lvl
 
   def log(self, lvl, msg="", details=None, newline=False):
     if not msg:
       msg = lvl
       lvl = LogLevel.INFO
-    if self.loglevel == LogLevel.SILENT or self.loglevel < lvl:
+    if not self.enabled(lvl):
       return
+    if details and type(details) != str:
+      # caller may change list before it is written
+      details = tuple(details)
+    with self.queuelock:
+      if self.msgqueue:
+        self.msgqueue.put((lvl, msg, details, newline))
+        return
+    self.write(lvl, msg, details, newline)
+
+  ## Formats a message & writes it to console & log file.
+  def write(self, lvl, msg, details=None, newline=False):
     stream = sys.stdout
     if lvl == LogLevel.ERROR:
       stream = sys.stderr
@@ -113,8 +275,9 @@ class Logger:
       msg = "\n" + msg
     stream.write(msg + "\n")
     # output to log file
-    if self.logfile and os.path.isfile(self.logfile):
-      appendFile(self.logfile, msg)
+    if self.logstream:
+      with self.lock:
+        self.writeStream(msg + "\n", lvl == LogLevel.ERROR)
 
   def debug(self, msg, details=None, newline=False):
     self.log(LogLevel.DEBUG, msg, details, newline)
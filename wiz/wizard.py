@@ -10,30 +10,31 @@ import traceback, wx
 
 import util
 
-from dbr.event        import ChangePageEvent
-from dbr.language     import GT
-from globals.ident    import btnid
-from globals.ident    import chkid
-from globals.ident    import inputid
-from globals.ident    import listid
-from globals.ident    import menuid
-from globals.ident    import page_ids
-from globals.ident    import pgid
-from globals.ident    import selid
-from globals.system   import mimport
-from globals.tooltips import TT_wiz_next
-from globals.tooltips import TT_wiz_prev
-from input.markdown   import MarkdownDialog
-from startup.tests    import GetTestList
-from ui.button        import CreateButton
-from ui.dialog        import ShowDialog
-from ui.dialog        import ShowErrorDialog
-from ui.layout        import BoxSizer
-from ui.panel         import ScrolledPanel
-from wiz.helper       import FieldEnabled
-from wiz.helper       import GetField
-from wiz.helper       import GetMainWindow
-from wiz.helper       import GetMenu
+from dbr.event           import ChangePageEvent
+from dbr.language        import GT
+from globals.ident       import btnid
+from globals.ident       import chkid
+from globals.ident       import inputid
+from globals.ident       import listid
+from globals.ident       import menuid
+from globals.ident       import page_ids
+from globals.ident       import pgid
+from globals.ident       import selid
+from globals.projectfile import ParseLegacySections
+from globals.system      import mimport
+from globals.tooltips    import TT_wiz_next
+from globals.tooltips    import TT_wiz_prev
+from input.markdown      import MarkdownDialog
+from startup.tests       import GetTestList
+from ui.button           import CreateButton
+from ui.dialog           import ShowDialog
+from ui.dialog           import ShowErrorDialog
+from ui.layout           import BoxSizer
+from ui.panel            import ScrolledPanel
+from wiz.helper          import FieldEnabled
+from wiz.helper          import GetField
+from wiz.helper          import GetMainWindow
+from wiz.helper          import GetMenu
 
 
 logger = util.getLogger()
@@ -608,6 +609,23 @@ class WizardPage(ScrolledPanel):
     self.PLabel = label
 
 
+  ## Retrieves page data for saving to a project in chunks
+  #
+  #  Pages with large data can override this so the data is written
+  #  without building a single string.
+  #
+  #  \return
+  #  <b><i>Tuple</i></b> of section name & iterable of strings forming
+  #  section data, or <b><i>None</i></b> if page has no project data
+  def GetSaveSection(self):
+    sections = ParseLegacySections(self.GetSaveData())
+
+    for NAME in sections:
+      return (NAME, (sections[NAME],),)
+
+    return None
+
+
   ## Retrieves all fields that cannot be left blank for build
   #
   #  FIXME: Should only require page ID
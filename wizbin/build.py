@@ -4,33 +4,33 @@
 # See: docs/LICENSE.txt
 
 
-import os, shutil, subprocess, traceback, wx
+import os, subprocess, traceback, wx
 
 import util
 
-from dbr.functions      import FileUnstripped
+from dbr.builder        import Builder
+from dbr.builder        import GetCompressionLevels
+from dbr.builder        import compressors
 from dbr.language       import GT
-from dbr.md5            import WriteMD5
+from dbr.project        import ProjectModel
 from globals.bitmaps    import ICON_EXCLAMATION
 from globals.bitmaps    import ICON_INFORMATION
 from globals.errorcodes import dbrerrno
-from globals.execute    import ExecuteCommand
 from globals.execute    import GetExecutable
 from globals.execute    import GetSystemInstaller
 from globals.ident      import btnid
 from globals.ident      import chkid
 from globals.ident      import inputid
 from globals.ident      import pgid
+from globals.ident      import selid
 from globals.paths      import getAppDir
-from globals.strings    import GS
 from globals.strings    import RemoveEmptyLines
 from globals.strings    import TextIsEmpty
-from globals.system     import PY_VER_MAJ
 from globals.tooltips   import SetPageToolTips
+from input.select       import ChoiceESS
 from input.toggle       import CheckBox
 from input.toggle       import CheckBoxESS
 from libdbr.fileio      import readFile
-from libdbr.fileio      import writeFile
 from startup.tests      import UsingTest
 from ui.button          import CreateButton
 from ui.checklist       import CheckListDialog
@@ -66,11 +66,16 @@ class Page(WizardPage):
     pnl_options = BorderedPanel(self)
 
     self.chk_md5 = CheckBoxESS(pnl_options, chkid.MD5, GT("Create md5sums file"),
-        name="MD5", defaultValue=True, commands="md5sum")
-    # The » character denotes that an alternate tooltip should be shown if the control is disabled
-    self.chk_md5.tt_name = "md5»"
+        name="MD5", defaultValue=True)
+    self.chk_md5.tt_name = "md5"
     self.chk_md5.col = 0
 
+    # Additional checksums file
+    self.chk_sha256 = CheckBoxESS(pnl_options, chkid.SHA256, GT("Create sha256sums file"),
+        name="SHA256", defaultValue=False)
+    self.chk_sha256.tt_name = "sha256"
+    self.chk_sha256.col = 1
+
     # Option to strip binaries
     self.chk_strip = CheckBoxESS(pnl_options, chkid.STRIP, GT("Strip binaries"),
         name="strip»", defaultValue=True, commands="strip")
@@ -93,6 +98,21 @@ class Page(WizardPage):
     self.chk_install.tt_name = "install»"
     self.chk_install.col = 0
 
+    # Compression format & level of package archives
+    txt_compression = wx.StaticText(self, label=GT("Compression"))
+    self.sel_compression = ChoiceESS(self, selid.COMPRESSION, choices=(GT("Default"),) + compressors,
+        name="compression")
+
+    # Choices are set from selected format
+    txt_level = wx.StaticText(self, label=GT("Level"))
+    self.sel_level = ChoiceESS(self, selid.COMPRESSLEVEL, choices=(GT("Default"),),
+        name="compression level")
+
+    txt_threads = wx.StaticText(self, label=GT("Threads"))
+    self.sel_threads = ChoiceESS(self, selid.THREADS,
+        choices=[GT("Automatic")] + [str(N) for N in range(1, (os.cpu_count() or 1) + 1)],
+        name="threads")
+
     # *** Lintian Overrides *** #
 
     if UsingTest("alpha"):
@@ -112,6 +132,7 @@ class Page(WizardPage):
     # *** Event Handling *** #
 
     btn_build.Bind(wx.EVT_BUTTON, self.OnBuild)
+    self.sel_compression.Bind(wx.EVT_CHOICE, self.OnSelectCompression)
 
     # *** Layout *** #
 
@@ -137,6 +158,14 @@ class Page(WizardPage):
     pnl_options.SetAutoLayout(True)
     pnl_options.Layout()
 
+    lyt_compression = BoxSizer(wx.HORIZONTAL)
+    lyt_compression.Add(txt_compression, 0, lyt.ALGN_CV)
+    lyt_compression.Add(self.sel_compression, 0, wx.LEFT, 5)
+    lyt_compression.Add(txt_level, 0, lyt.ALGN_CV|wx.LEFT, 10)
+    lyt_compression.Add(self.sel_level, 0, wx.LEFT, 5)
+    lyt_compression.Add(txt_threads, 0, lyt.ALGN_CV|wx.LEFT, 10)
+    lyt_compression.Add(self.sel_threads, 0, wx.LEFT, 5)
+
     lyt_buttons = BoxSizer(wx.HORIZONTAL)
     lyt_buttons.Add(btn_build, 1)
 
@@ -146,6 +175,8 @@ class Page(WizardPage):
         lyt.ALGN_L|wx.LEFT, 5)
     lyt_main.Add(pnl_options, 0, wx.LEFT, 5)
     lyt_main.AddSpacer(5)
+    lyt_main.Add(lyt_compression, 0, wx.LEFT, 5)
+    lyt_main.AddSpacer(5)
 
     if UsingTest("alpha"):
       #lyt_main.Add(wx.StaticText(self, label=GT("Lintian overrides")), 0, wx.LEFT, 5)
@@ -159,6 +190,8 @@ class Page(WizardPage):
     self.SetSizer(lyt_main)
     self.Layout()
 
+    self.OnSelectCompression()
+
 
   ## Method that builds the actual Debian package
   #
@@ -175,438 +208,49 @@ class Page(WizardPage):
     build_progress = None
 
     try:
-      # Other mandatory tasks that will be processed
-      mandatory_tasks = (
-        "stage",
-        "install_size",
-        "control",
-        "build",
-        )
-
-      # Add other mandatory tasks
-      for T in mandatory_tasks:
-        task_list[T] = None
-
-      task_count = len(task_list)
+      project = self.GetProject(task_list)
+      builder = Builder(project, build_path, filename, onWarning=self.OnBuildWarning,
+          jobs=project.Threads)
 
-      # Add each file for updating progress dialog
-      if "files" in task_list:
-        task_count += len(task_list["files"])
-
-      # Add each script for updating progress dialog
-      if "scripts" in task_list:
-        task_count += len(task_list["scripts"])
+      task_count = builder.GetTaskCount()
 
       if logger.debugging():
         task_msg = GT("Total tasks: {}").format(task_count)
         print("DEBUG: [{}] {}".format(__name__, task_msg))
-        for T in task_list:
+        for T in builder.GetTaskList():
           print("\t{}".format(T))
 
-      create_changelog = "changelog" in task_list
-      create_copyright = "copyright" in task_list
-
-      pg_control = GetPage(pgid.CONTROL)
-      pg_menu = GetPage(pgid.MENU)
-
-      stage_dir = "{}/{}__dbp__".format(build_path, filename)
-
-      if os.path.isdir("{}/DEBIAN".format(stage_dir)):
-        try:
-          shutil.rmtree(stage_dir)
-
-        except OSError:
-          ShowErrorDialog(GT("Could not free stage directory: {}").format(stage_dir),
-              title=GT("Cannot Continue"))
-
-          return (dbrerrno.EEXIST, None)
-
-      # Actual path to new .deb
-      deb = "\"{}/{}.deb\"".format(build_path, filename)
-
-      progress = 0
-
-      task_msg = GT("Preparing build tree")
-      logger.debug(task_msg)
-
       wx.GetApp().Yield()
-      build_progress = ProgressDialog(GetMainWindow(), GT("Building"), task_msg,
+      build_progress = ProgressDialog(GetMainWindow(), GT("Building"), GT("Preparing build tree"),
           maximum=task_count,
           style=PD_DEFAULT_STYLE|wx.PD_ELAPSED_TIME|wx.PD_ESTIMATED_TIME|wx.PD_CAN_ABORT)
 
-      DIR_debian = os.path.join(stage_dir, "DEBIAN")
-
-      # Make a fresh build tree
-      os.makedirs(DIR_debian)
-      progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      def UpdateProgress(current_task, message=None):
-        task_eval = "{} / {}".format(current_task, task_count)
+      def UpdateProgress(current_task, total, message=None):
+        wx.GetApp().Yield()
 
         if message:
-          logger.debug("{} ({})".format(message, task_eval))
-
-          wx.GetApp().Yield()
           build_progress.Update(current_task, message)
 
-          return
-
-        wx.GetApp().Yield()
-        build_progress.Update(current_task)
-
-      # *** Files *** #
-      if "files" in task_list:
-        UpdateProgress(progress, GT("Copying files"))
-
-        no_follow_link = GetField(GetPage(pgid.FILES), chkid.SYMLINK).IsChecked()
-
-        # TODO: move this into a file functions module
-        def _copy(f_src, f_tgt, exe=False):
-          # NOTE: Python 3 appears to have follow_symlinks option for shutil.copy
-          # FIXME: copying nested symbolic link may not work
-
-          if os.path.isdir(f_src):
-            if os.path.islink(f_src) and no_follow_link:
-              logger.debug("Adding directory symbolic link to stage: {}".format(f_tgt))
-
-              os.symlink(os.readlink(f_src), f_tgt)
-            else:
-              logger.debug("Adding directory to stage: {}".format(f_tgt))
-
-              shutil.copytree(f_src, f_tgt)
-              os.chmod(f_tgt, 0o0755)
-          elif os.path.isfile(f_src):
-            if os.path.islink(f_src) and no_follow_link:
-              logger.debug("Adding file symbolic link to stage: {}".format(f_tgt))
-
-              os.symlink(os.readlink(f_src), f_tgt)
-            else:
-              if exe:
-                logger.debug("Adding executable to stage: {}".format(f_tgt))
-              else:
-                logger.debug("Adding file to stage: {}".format(f_tgt))
-
-              shutil.copy(f_src, f_tgt)
-
-              # Set FILE permissions
-              if exe:
-                os.chmod(f_tgt, 0o0755)
-
-              else:
-                os.chmod(f_tgt, 0o0644)
-
-        files_data = task_list["files"]
-        for FILE in files_data:
-          file_defs = FILE.split(" -> ")
-
-          source_file = file_defs[0]
-          target_file = "{}{}/{}".format(stage_dir, file_defs[2], file_defs[1])
-          target_dir = os.path.dirname(target_file)
-
-          if not os.path.isdir(target_dir):
-            os.makedirs(target_dir)
-
-          # Remove asteriks from exectuables
-          exe = False
-          if source_file[-1] == "*":
-            exe = True
-            source_file = source_file[:-1]
-
-          _copy(source_file, "{}/{}".format(target_dir, os.path.basename(source_file)), exe)
-
-          # Individual files
-          progress += 1
-          UpdateProgress(progress)
-
-        # Entire file task
-        progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      # *** Strip files ***#
-      # FIXME: Needs only be run if 'files' step is used
-      if "strip" in task_list:
-        UpdateProgress(progress, GT("Stripping binaries"))
-
-        for ROOT, DIRS, FILES in os.walk(stage_dir): #@UnusedVariable
-          for F in FILES:
-            # Don't check files in DEBIAN directory
-            if ROOT != DIR_debian:
-              F = os.path.join(ROOT, F)
-
-              if FileUnstripped(F):
-                logger.debug("Unstripped file: {}".format(F))
-
-                # FIXME: Strip command should be set as class member?
-                ExecuteCommand(GetExecutable("strip"), F)
-
-        progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      package = GetField(pg_control, inputid.PACKAGE).GetValue()
-
-      # Make sure that the directory is available in which to place documentation
-      if create_changelog or create_copyright:
-        doc_dir = "{}/usr/share/doc/{}".format(stage_dir, package)
-        if not os.path.isdir(doc_dir):
-          os.makedirs(doc_dir)
-
-      # *** Changelog *** #
-      if create_changelog:
-        UpdateProgress(progress, GT("Creating changelog"))
-
-        # If changelog will be installed to default directory
-        changelog_target = task_list["changelog"][0]
-        if changelog_target == "STANDARD":
-          changelog_target = os.path.join("{}/usr/share/doc".format(stage_dir), package)
-
         else:
-          changelog_target = os.path.join(stage_dir, changelog_target)
-
-        if not os.path.isdir(changelog_target):
-          os.makedirs(changelog_target)
-
-        writeFile("{}/changelog".format(changelog_target), task_list["changelog"][1])
+          build_progress.Update(current_task)
 
-        CMD_gzip = GetExecutable("gzip")
-
-        if CMD_gzip:
-          UpdateProgress(progress, GT("Compressing changelog"))
-          res = subprocess.run([CMD_gzip, "-n", "--best", "{}/changelog".format(changelog_target)], stdout=subprocess.PIPE)
-          if res.returncode != 0:
-            ShowErrorDialog(GT("Could not compress changelog"), res.stdout.decode("utf-8"), warn=True, title=GT("Warning"))
-
-        progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
+        return not build_progress.WasCancelled()
 
-      # *** Copyright *** #
-      if create_copyright:
-        UpdateProgress(progress, GT("Creating copyright"))
+      builder.OnProgress = UpdateProgress
 
-        writeFile("{}/usr/share/doc/{}/copyright".format(stage_dir, package), task_list["copyright"])
-
-        progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      # Characters that should not be in filenames
-      invalid_chars = (" ", "/", "\\")
-
-      # *** Menu launcher *** #
-      if "launcher" in task_list:
-        UpdateProgress(progress, GT("Creating menu launcher"))
-
-        # This might be changed later to set a custom directory
-        menu_dir = "{}/usr/share/applications".format(stage_dir)
-
-        menu_filename = pg_menu.GetOutputFilename()
-
-        # Remove invalid characters from filename
-        for char in invalid_chars:
-          menu_filename = menu_filename.replace(char, "_")
-
-        if not os.path.isdir(menu_dir):
-          os.makedirs(menu_dir)
-
-        writeFile("{}/{}.desktop".format(menu_dir, menu_filename), task_list["launcher"])
-
-        progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      # *** md5sums file *** #
-      # Good practice to create hashes before populating DEBIAN directory
-      if "md5sums" in task_list:
-        UpdateProgress(progress, GT("Creating md5sums"))
-
-        if not WriteMD5(stage_dir, parent=build_progress):
-          # Couldn't call md5sum command
-          build_progress.Cancel()
-
-        progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
+      ret_code, result = builder.Build()
 
-      # *** Scripts *** #
-      if "scripts" in task_list:
-        UpdateProgress(progress, GT("Creating scripts"))
+      if builder.LintianOutput:
+        e1 = GT("Lintian found some issues with the package.")
+        e2 = GT("Details saved to {}").format(filename)
 
-        scripts = task_list["scripts"]
-        for SCRIPT in scripts:
-          script_name = SCRIPT
-          script_text = scripts[SCRIPT]
-
-          script_filename = os.path.join(stage_dir, "DEBIAN", script_name)
-
-          writeFile(script_filename, script_text)
-
-          # Make sure scipt path is wrapped in quotes to avoid whitespace errors
-          # FIXME: both commands appear to do the same thing?
-          os.chmod(script_filename, 0o0755)
-          os.system(("chmod +x \"{}\"".format(script_filename)))
-
-          # Individual scripts
-          progress += 1
-          UpdateProgress(progress)
-
-        # Entire script task
-        progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      # *** Control file *** #
-      UpdateProgress(progress, GT("Getting installed size"))
-
-      # Get installed-size
-      installed_size = os.popen(("du -hsk \"{}\"".format(stage_dir))).readlines()
-      installed_size = installed_size[0].split("\t")
-      installed_size = installed_size[0]
-
-      # Insert Installed-Size into control file
-      control_data = pg_control.Get().split("\n")
-      control_data.insert(2, "Installed-Size: {}".format(installed_size))
-
-      progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      # Create final control file
-      UpdateProgress(progress, GT("Creating control file"))
-
-      # dpkg fails if there is no newline at end of file
-      control_data = "\n".join(control_data).strip("\n")
-      # Ensure there is only one empty trailing newline
-      # Two '\n' to show physical empty line, but not required
-      # Perhaps because string is not null terminated???
-      control_data = "{}\n\n".format(control_data)
-
-      writeFile("{}/DEBIAN/control".format(stage_dir), control_data)
-
-      progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      # *** Final build *** #
-      UpdateProgress(progress, GT("Running dpkg"))
-
-      working_dir = os.path.split(stage_dir)[0]
-      c_tree = os.path.split(stage_dir)[1]
-      deb_package = "{}.deb".format(filename)
-
-      # Move the working directory becuase dpkg seems to have problems with spaces in path
-      os.chdir(working_dir)
-
-      # HACK to fix file/dir permissions
-      for ROOT, DIRS, FILES in os.walk(stage_dir):
-        for D in DIRS:
-          D = "{}/{}".format(ROOT, D)
-          os.chmod(D, 0o0755)
-        for F in FILES:
-          F = "{}/{}".format(ROOT, F)
-          if os.access(F, os.X_OK):
-            os.chmod(F, 0o0755)
-          else:
-            os.chmod(F, 0o0644)
-
-      # FIXME: Should check for working fakeroot & dpkg-deb executables
-      res = subprocess.run([GetExecutable("fakeroot"), GetExecutable("dpkg-deb"), "-b", c_tree, deb_package])
-      build_status = (res.returncode, res.stdout)
-
-      progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      # *** Delete staged directory *** #
-      if "rmstage" in task_list:
-        UpdateProgress(progress, GT("Removing temp directory"))
-
-        try:
-          shutil.rmtree(stage_dir)
-
-        except OSError:
-          ShowErrorDialog(GT("An error occurred when trying to delete the build tree"),
-              parent=build_progress)
-
-        progress += 1
-
-      if build_progress.WasCancelled():
-        build_progress.Destroy()
-        return (dbrerrno.ECNCLD, None)
-
-      # *** ERROR CHECK
-      if "lintian" in task_list:
-        UpdateProgress(progress, GT("Checking package for errors"))
-
-        # FIXME: Should be set as class memeber?
-        CMD_lintian = GetExecutable("lintian")
-        errors = subprocess.run([CMD_lintian, deb]).stdout
-
-        if errors != wx.EmptyString:
-          e1 = GT("Lintian found some issues with the package.")
-          e2 = GT("Details saved to {}").format(filename)
-
-          writeFile("{}/{}.lintian".format(build_path, filename), errors)
-
-          DetailedMessageDialog(build_progress, GT("Lintian Errors"),
-              ICON_INFORMATION, "{}\n{}.lintian".format(e1, e2), errors).ShowModal()
-
-        progress += 1
+        DetailedMessageDialog(build_progress, GT("Lintian Errors"),
+            ICON_INFORMATION, "{}\n{}.lintian".format(e1, e2), builder.LintianOutput).ShowModal()
 
       # Close progress dialog
-      wx.GetApp().Yield()
-      build_progress.Update(progress)
       build_progress.Destroy()
 
-      # Build completed successfullly
-      if not build_status[0]:
-        return (dbrerrno.SUCCESS, deb_package)
-
-      if PY_VER_MAJ <= 2:
-        # Unicode decoder has trouble with certain characters. Replace any
-        # non-decodable characters with � (0xFFFD).
-        build_output = list(build_status[1])
-
-        # String & unicode string incompatibilities
-        index = 0
-        for C in build_output:
-          try:
-            GS(C)
-
-          except UnicodeDecodeError:
-            build_output[index] = "�"
-
-          index += 1
-
-        build_status = (build_status[0], "".join(build_output))
-
-      # Build failed
-      return (build_status[0], build_status[1])
+      return (ret_code, result)
 
     except:
       if build_progress:
@@ -620,6 +264,12 @@ class Page(WizardPage):
   #  \return
   #      \b \e tuple containing Return code & build details
   def BuildPrep(self):
+    # Building a partial file list would leave files out of package
+    if GetPage(pgid.FILES).IsLoading():
+      ShowErrorDialog(GT("Cannot build"),
+          GT("Project files are still loading, try again when they have been added."))
+      return (dbrerrno.ECNCLD, None)
+
     # Declare these here in case of error before dialogs created
     save_dia = None
     prebuild_progress = None
@@ -702,6 +352,7 @@ class Page(WizardPage):
       # 'build' should be after 'control'
       other_checks = (
         (self.chk_md5, "md5sums"),
+        (self.chk_sha256, "sha256sums"),
         (self.chk_strip, "strip"),
         (self.chk_rmstage, "rmstage"),
         (self.chk_lint, "lintian"),
@@ -758,6 +409,50 @@ class Page(WizardPage):
       return (dbrerrno.EUNKNOWN, traceback.format_exc())
 
 
+  ## Creates a display independent project from page data
+  #
+  #  \param task_list
+  #      \b \e dict : Task string IDs & page data
+  #  \return
+  #      \b \e dbr.project.ProjectModel instance
+  def GetProject(self, task_list):
+    project = ProjectModel()
+    project.Control = GetPage(pgid.CONTROL).Get()
+    project.NoFollowLinks = GetField(GetPage(pgid.FILES), chkid.SYMLINK).IsChecked()
+
+    if "files" in task_list:
+      project.SetFiles(task_list["files"])
+
+    if "scripts" in task_list:
+      project.Scripts = task_list["scripts"]
+
+    if "changelog" in task_list:
+      project.Changelog = task_list["changelog"]
+
+    if "copyright" in task_list:
+      project.Copyright = task_list["copyright"]
+
+    if "launcher" in task_list:
+      project.Launcher = task_list["launcher"]
+      project.LauncherFilename = GetPage(pgid.MENU).GetOutputFilename()
+
+    for O in project.Options:
+      project.Options[O] = O in task_list
+
+    # First item is "Default"
+    if self.sel_compression.GetSelection() > 0:
+      project.Compression = self.sel_compression.GetStringSelection()
+
+    if self.sel_level.GetSelection() > 0:
+      project.CompressionLevel = int(self.sel_level.GetStringSelection())
+
+    # First item is "Automatic"
+    if self.sel_threads.GetSelection() > 0:
+      project.Threads = int(self.sel_threads.GetStringSelection())
+
+    return project
+
+
   ## TODO: Doxygen
   def GetSaveData(self):
     build_list = []
@@ -778,6 +473,18 @@ class Page(WizardPage):
     if self.chk_strip.GetValue():
       build_list.append("strip")
 
+    if self.chk_sha256.GetValue():
+      build_list.append("sha256")
+
+    if self.sel_compression.GetSelection() > 0:
+      build_list.append("compression={}".format(self.sel_compression.GetStringSelection()))
+
+    if self.sel_level.GetSelection() > 0:
+      build_list.append("compression-level={}".format(self.sel_level.GetStringSelection()))
+
+    if self.sel_threads.GetSelection() > 0:
+      build_list.append("threads={}".format(self.sel_threads.GetStringSelection()))
+
     return "<<BUILD>>\n{}\n<</BUILD>>".format("\n".join(build_list))
 
 
@@ -887,6 +594,31 @@ class Page(WizardPage):
       ShowErrorDialog(GT("Build preparation failed with unknown error"))
 
 
+  ## Shows non-fatal errors that occur during build
+  def OnBuildWarning(self, message, details=None):
+    ShowErrorDialog(message, details, warn=True, title=GT("Warning"))
+
+
+  ## Limits compression level choices to levels accepted by selected format
+  #
+  #  Level is disabled for formats that do not use it.
+  def OnSelectCompression(self, event=None):
+    compression = None
+
+    # First item is "Default"
+    if self.sel_compression.GetSelection() > 0:
+      compression = self.sel_compression.GetStringSelection()
+
+    levels = GetCompressionLevels(compression)
+
+    # Selected level is kept if new format accepts it
+    self.sel_level.Set([GT("Default")] + [str(L) for L in levels])
+    if self.sel_level.GetSelection() == wx.NOT_FOUND:
+      self.sel_level.Reset()
+
+    self.sel_level.Enable(len(levels) > 0)
+
+
   ## TODO: Doxygen
   #
   #  TODO: Show warning dialog that this could take a while
@@ -968,6 +700,13 @@ class Page(WizardPage):
       return False
 
 
+  ## Resets fields & compression level choices to default
+  def Reset(self):
+    WizardPage.Reset(self)
+
+    self.OnSelectCompression()
+
+
   ## TODO: Doxygen
   #
   #  TODO: Use string names in project file but retain
@@ -978,12 +717,11 @@ class Page(WizardPage):
     self.Reset()
     build_data = data.split("\n")
 
-    if GetExecutable("md5sum"):
-      try:
-        self.chk_md5.SetValue(int(build_data[0]))
+    try:
+      self.chk_md5.SetValue(int(build_data[0]))
 
-      except IndexError:
-        pass
+    except IndexError:
+      pass
 
     try:
       self.chk_rmstage.SetValue(int(build_data[1]))
@@ -999,6 +737,25 @@ class Page(WizardPage):
         pass
 
     self.chk_strip.SetValue(GetExecutable("strip") and "strip" in build_data)
+    self.chk_sha256.SetValue("sha256" in build_data)
+
+    for LINE in build_data:
+      # Saved before level, so level choices are updated first
+      if LINE.startswith("compression="):
+        self.sel_compression.SetStringSelection(LINE.split("=", 1)[1])
+        self.OnSelectCompression()
+
+      elif LINE.startswith("compression-level="):
+        self.sel_level.SetStringSelection(LINE.split("=", 1)[1])
+
+      elif LINE.startswith("threads="):
+        threads = LINE.split("=", 1)[1]
+        if threads.isdigit() and int(threads) > 0:
+          # Project may have been saved on a system with more CPUs
+          if self.sel_threads.FindString(threads) == wx.NOT_FOUND:
+            self.sel_threads.Append(threads)
+
+          self.sel_threads.SetStringSelection(threads)
 
 
   ## TODO: Doxygen
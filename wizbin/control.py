@@ -4,7 +4,7 @@
 # See: docs/LICENSE.txt
 
 
-import os, wx
+import os, time, wx
 
 from wx.adv import OwnerDrawnComboBox
 
@@ -16,6 +16,7 @@ from globals.ident      import btnid
 from globals.ident      import inputid
 from globals.ident      import pgid
 from globals.strings    import TextIsEmpty
+from globals.threads    import Thread
 from globals.tooltips   import SetPageToolTips
 from input.select       import ChoiceESS
 from input.select       import ComboBoxESS
@@ -31,6 +32,7 @@ from ui.dialog          import ShowDialog
 from ui.dialog          import ShowErrorDialog
 from ui.layout          import BoxSizer
 from ui.panel           import BorderedPanel
+from ui.progress        import ProgressDialog
 from ui.style           import layout as lyt
 from ui.textpreview     import TextPreview
 from wiz.helper         import FieldEnabled
@@ -459,8 +461,55 @@ class Page(WizardPage):
 
 
   ## Creates a formatted preview of the control file text
+  #
+  #  Installed-Size is estimated from the files & documentation that
+  #  are currently set on the other pages. Source directories are walked
+  #  in a background thread, so the window is not blocked by large trees.
   def OnPreviewControl(self, event=None):
-    ctrl_info = self.GetCtrlInfo()
+    ctrl_info = self.GetCtrlInfo().split("\n")
+
+    task_list = {}
+    for PID, id_string in ((pgid.FILES, "files"), (pgid.CHANGELOG, "changelog"),
+        (pgid.COPYRIGHT, "copyright"), (pgid.MENU, "launcher")):
+      wizard_page = GetPage(PID)
+      if wizard_page.IsOkay():
+        task_list[id_string] = wizard_page.Get()
+
+    project = GetPage(pgid.BUILD).GetProject(task_list)
+    result = []
+
+    def calculate():
+      result.append(project.GetInstalledSize())
+
+    thread = Thread(calculate)
+    thread.Start()
+
+    # Progress is only shown if calculation takes noticeably long
+    start = time.monotonic()
+    while thread.is_alive() and time.monotonic() - start < 0.25:
+      time.sleep(0.01)
+
+    if thread.is_alive():
+      progress = ProgressDialog(GetMainWindow(), GT("Preview"), GT("Calculating installed size ..."),
+          style=wx.PD_APP_MODAL|wx.PD_AUTO_HIDE|wx.PD_CAN_ABORT)
+      progress.Show()
+
+      while thread.is_alive() and not progress.WasCancelled():
+        wx.GetApp().Yield()
+        progress.Pulse()
+        time.sleep(0.05)
+
+      cancelled = progress.WasCancelled()
+      progress.Destroy()
+
+      # Thread finishes in background & its result is discarded
+      if cancelled:
+        return
+
+    if result:
+      ctrl_info.insert(2, "Installed-Size: {}".format(result[0]))
+
+    ctrl_info = "\n".join(ctrl_info)
 
     preview = TextPreview(title=GT("Control File Preview"),
         text=ctrl_info, size=(600,400))
@@ -4,22 +4,27 @@
 # See: docs/LICENSE.txt
 
 
-import os, traceback, wx
+import os, queue, traceback, wx
 
 import util
 
+from dbr.event          import EVT_FILES_LOADED
+from dbr.event          import FilesLoadedEvent
 from dbr.language       import GT
 from globals.bitmaps    import ICON_ERROR
 from globals.bitmaps    import ICON_EXCLAMATION
 from globals.errorcodes import dbrerrno
+from globals.filemodel  import FLAG_MISSING
+from globals.filemodel  import GetFileFlags
 from globals.ident      import btnid
 from globals.ident      import chkid
 from globals.ident      import inputid
 from globals.ident      import pgid
+from globals.scanner    import FileScanner
 from globals.strings    import TextIsEmpty
+from globals.threads    import Thread
 from globals.tooltips   import SetPageToolTips
 from input.filelist     import FileListESS
-from input.filelist     import columns
 from input.text         import TextArea
 from input.toggle       import CheckBoxCFG
 from libdbr.fileio      import readFile
@@ -47,8 +52,40 @@ logger = util.getLogger()
 ## Maximum file count to process before showing progress dialog
 efficiency_threshold = 250
 
-## Maximum file count to process before showing warning dialog
-warning_threshhold = 1000
+## Number of files added to list between progress updates
+batch_size = 1000
+
+
+## Parses file list section of a project
+#
+#  \param data
+#      The text information to parse
+#  \return
+#      \b \e List of (filename, sourceDir, targetDir, executable) tuples
+def ParseFilesData(data):
+  files_data = data.split("\n")
+  if not int(files_data[0]):
+    return []
+
+  files = []
+  for LINE in files_data[1:]:
+    executable = False
+
+    file_info = LINE.split(" -> ")
+    absolute_filename = file_info[0]
+
+    if absolute_filename[-1] == "*":
+      # Set executable flag and remove "*"
+      executable = True
+      absolute_filename = absolute_filename[:-1]
+
+    filename = file_info[1]
+    source_dir = absolute_filename[:len(absolute_filename) - len(filename)]
+    target_dir = file_info[2]
+
+    files.append((filename, source_dir, target_dir, executable,))
+
+  return files
 
 
 ## Class defining controls for the "Paths" page
@@ -115,6 +152,15 @@ class Page(WizardPage):
     # Display area for files added to list
     self.lst_files = FileListESS(self, inputid.LIST, name="filelist")
 
+    # Shows progress while project files are loaded in background
+    self.gauge_load = wx.Gauge(self)
+    self.gauge_load.Hide()
+
+    # Incremented to discard batches of a previous background load
+    self.load_generation = 0
+    self.load_missing = []
+    self.loading = False
+
     # *** Event Handling *** #
 
     # create an event to enable/disable custom widget
@@ -140,6 +186,8 @@ class Page(WizardPage):
 
     self.Bind(wx.EVT_DROP_FILES, self.OnDropFiles)
 
+    EVT_FILES_LOADED(self, wx.ID_ANY, self.OnFilesLoaded)
+
     # *** Layout *** #
 
     lyt_treeopts = BoxSizer(wx.VERTICAL)
@@ -185,6 +233,7 @@ class Page(WizardPage):
     lyt_right.Add(pnl_target, 0)
     lyt_right.Add(lyt_buttons, 0, wx.EXPAND)
     lyt_right.Add(self.lst_files, 5, wx.EXPAND|wx.TOP, 5)
+    lyt_right.Add(self.gauge_load, 0, wx.EXPAND|wx.TOP, 5)
 
     PROP_LEFT = 0
     PROP_RIGHT = 1
@@ -208,54 +257,18 @@ class Page(WizardPage):
     SetPageToolTips(self)
 
 
-  ## Adds files to file list
+  ## Stops adding files from a background load
   #
-  #  \param dirs
-  #      <b><i>dict</i></b>: dict[dir] = [file list]
-  #  \param fileCount
-  #      Number of explicit files being added to list
-  #  \param showDialog
-  #      If <b><i>True</i></b>, displays a progress dialog
-  def AddPaths(self, dirs, fileCount=None, showDialog=False):
-    target = self.GetTarget()
-
-    if fileCount == None:
-      fileCount = 0
-      for D in dirs:
-        for F in dirs[D]:
-          fileCount += 1
-
-    progress = None
-
-    logger.debug("Adding {} files ...".format(fileCount))
-
-    if showDialog:
-      progress = ProgressDialog(GetMainWindow(), GT("Adding Files"), maximum=fileCount,
-          style=PD_DEFAULT_STYLE|wx.PD_CAN_ABORT)
-      progress.Show()
-
-    completed = 0
-    for D in sorted(dirs):
-      for F in sorted(dirs[D]):
-        if progress and progress.WasCancelled():
-          progress.Destroy()
-          return False
-
-        if progress:
-          wx.GetApp().Yield()
-          progress.Update(completed, GT("Adding file {}").format(F))
-
-        self.lst_files.AddFile(F, D, target)
-
-        completed += 1
-
-    if progress:
-      wx.GetApp().Yield()
-      progress.Update(completed)
-
-      progress.Destroy()
+  #  Batches already posted by the load thread are discarded.
+  def CancelLoad(self):
+    self.load_generation += 1
 
-    return True
+    if self.loading:
+      self.loading = False
+      self.load_missing = []
+      self.gauge_load.Hide()
+      self.Layout()
+      GetMainWindow().SetStatusText("")
 
 
   ## TODO: Doxygen
@@ -324,39 +337,44 @@ class Page(WizardPage):
   #  \return
   #      List formatted text
   def GetSaveData(self):
-    file_list = []
-    item_count = self.lst_files.GetItemCount()
+    return "<<FILES>>\n{}\n<</FILES>>".format("".join(self.IterSaveData()))
+
 
-    if item_count > 0:
-      count = 0
-      while count < item_count:
-        filename = self.lst_files.GetItemText(count)
-        source = self.lst_files.GetItem(count, columns.SOURCE).GetText()
-        target = self.lst_files.GetItem(count, columns.TARGET).GetText()
-        absolute_filename = os.path.join(source, filename)
+  ## Retrieves file list for saving to project in chunks
+  #
+  #  \return
+  #      \b \e tuple : Section name & generator of section text
+  def GetSaveSection(self):
+    return ("FILES", self.IterSaveData(),)
 
-        # Populate list with tuples of ('src', 'file', 'dest')
-        if self.lst_files.GetItemTextColour(count) == (255, 0, 0):
-          # Mark file as executable
-          file_list.append(("{}*".format(absolute_filename), filename, target))
 
-        else:
-          file_list.append((absolute_filename, filename, target))
+  ## Generates file list text in chunks of rows
+  #
+  #  Each line is formatted as "source -> filename -> target". Executable
+  #  files have "*" appended to source.
+  #
+  #  \return
+  #      Generator of strings
+  def IterSaveData(self):
+    item_count = self.lst_files.GetItemCount()
+
+    if not item_count:
+      # Place a "0" in FILES field if we are not saving any files
+      yield "0"
+      return
 
-        count += 1
+    yield "1"
 
-      return_list = []
-      for F in file_list:
-        f0 = "{}".format(F[0])
-        f1 = "{}".format(F[1])
-        f2 = "{}".format(F[2])
-        return_list.append("{} -> {} -> {}".format(f0, f1, f2))
+    lines = []
+    for ROW in range(item_count):
+      lines.append("\n{}".format(self.lst_files.GetSaveLine(ROW)))
 
-      return "<<FILES>>\n1\n{}\n<</FILES>>".format("\n".join(return_list))
+      if len(lines) >= batch_size:
+        yield "".join(lines)
+        lines = []
 
-    else:
-      # Place a "0" in FILES field if we are not saving any files
-      return "<<FILES>>\n0\n<</FILES>>"
+    if lines:
+      yield "".join(lines)
 
 
   ## Retrieves the target output directory
@@ -406,17 +424,11 @@ class Page(WizardPage):
 
           targets_list.append((target, L, executable))
 
-    missing_files = []
-
+    files = []
     for T in targets_list:
-      # FIXME: Create method in FileList class to retrieve all missing files
-      if not os.path.exists(T[1]):
-        missing_files.append(T[1])
-
-      source_file = os.path.basename(T[1])
-      source_dir = os.path.dirname(T[1])
+      files.append((os.path.basename(T[1]), os.path.dirname(T[1]), T[0], T[2], None,))
 
-      self.lst_files.AddFile(source_file, source_dir, T[0], executable=T[2])
+    missing_files = self.lst_files.AddFiles(files)
 
     if len(missing_files):
       main_window = GetMainWindow()
@@ -430,6 +442,11 @@ class Page(WizardPage):
     return 0
 
 
+  ## Checks if files of a project are being added in background
+  def IsLoading(self):
+    return self.loading
+
+
   ## Checks if the page is ready for export/build
   #
   #  \return
@@ -438,13 +455,53 @@ class Page(WizardPage):
     return not self.lst_files.IsEmpty()
 
 
-  ## Reads files & directories & preps for loading into list
+  ## Reads flags of project files & posts them to page in batches
+  #
+  #  Called from a background thread started by \b \e SetInBackground.
+  #  Stops early if load is cancelled.
+  #
+  #  \param data
+  #      Text of project's files section
+  #  \param generation
+  #      Value of \b \e load_generation when thread was started
+  def LoadFiles(self, data, generation):
+    try:
+      files = ParseFilesData(data)
+
+    except (ValueError, IndexError):
+      logger.error("Could not parse project files:\n{}".format(traceback.format_exc()))
+      files = []
+
+    total = len(files)
+    if not total:
+      wx.PostEvent(self, FilesLoadedEvent(0, rows=[], count=0, total=0, generation=generation))
+      return
+
+    for INDEX in range(0, total, batch_size):
+      if generation != self.load_generation:
+        return
+
+      rows = []
+      for FILENAME, SOURCE, TARGET, EXECUTABLE in files[INDEX:INDEX+batch_size]:
+        flags = GetFileFlags(os.path.join(SOURCE, FILENAME), EXECUTABLE)
+        rows.append((FILENAME, SOURCE, TARGET, flags,))
+
+      wx.PostEvent(self, FilesLoadedEvent(0, rows=rows, count=min(INDEX + batch_size, total),
+          total=total, generation=generation))
+
+
+  ## Reads files & directories & adds them to list
+  #
+  #  Directories are scanned in a background thread. Files are added to
+  #  the list in batches as they are found. If the scan is cancelled,
+  #  files that were already found remain in the list.
   #
   #  \param pathsList
   #      <b><i>List/Tuple</i></b> of <b><i>string</i></b> values representing
   #      files & directories to be added
   #  \return
-  #      Value of wizbin.files.Page.AddPaths, or <b><i>False</i></b> in case of error
+  #      <b><i>True</i></b> if all files were added, <b><i>False</i></b> if
+  #      cancelled or in case of error
   def LoadPaths(self, pathsList):
     if isinstance(pathsList, tuple):
       pathsList = list(pathsList)
@@ -452,128 +509,55 @@ class Page(WizardPage):
     if not pathsList or not isinstance(pathsList, list):
       return False
 
-    file_list = []
-    dir_list = {}
+    target = self.GetTarget()
+    scanner = FileScanner(pathsList, self.chk_individuals.GetValue(),
+        self.chk_preserve_top.GetValue())
+    batches = queue.Queue()
+    result = []
 
-    prep = ProgressDialog(GetMainWindow(), GT("Processing Files"), GT("Scanning files ..."),
-        style=wx.PD_APP_MODAL|wx.PD_AUTO_HIDE|wx.PD_CAN_ABORT)
+    def scan():
+      try:
+        result.append(scanner.Scan(batches.put))
 
-    # Only update the gauge every N files (hack until I figure out timer)
-    update_interval = 450
-    count = 0
+      except:
+        result.append(traceback.format_exc())
 
+    prep = ProgressDialog(GetMainWindow(), GT("Processing Files"), GT("Scanning files ..."),
+        style=wx.PD_APP_MODAL|wx.PD_AUTO_HIDE|wx.PD_CAN_ABORT)
     prep.Show()
 
-    if not self.chk_preserve_top.GetValue():
-      for INDEX in reversed(range(len(pathsList))):
-        path = pathsList[INDEX]
-        if os.path.isdir(path):
-          # Remove top-level directory from list
-          pathsList.pop(INDEX)
-
-          insert_index = INDEX
-          for P in os.listdir(path):
-            pathsList.insert(insert_index, os.path.join(path, P))
-            insert_index += 1
-
-    try:
-      for P in pathsList:
-        if prep.WasCancelled():
-          prep.Destroy()
-          return False
-
-        count += 1
-        if count >= update_interval:
-          wx.GetApp().Yield()
-          prep.Pulse()
-          count = 0
-
-        if not self.chk_individuals.GetValue() or os.path.isfile(P):
-          file_list.append(P)
-          continue
-
-        if os.path.isdir(P):
-          parent_dir = os.path.dirname(P)
+    thread = Thread(scan)
+    thread.Start()
 
-          if parent_dir not in dir_list:
-            dir_list[parent_dir] = []
+    while thread.is_alive() or not batches.empty():
+      if prep.WasCancelled():
+        scanner.Cancel()
 
-          for ROOT, DIRS, FILES in os.walk(P):
-            if prep.WasCancelled():
-              prep.Destroy()
-              return False
+      try:
+        batch = batches.get(timeout=0.05)
+        self.lst_files.AddFiles([(F, S, target, False, E,) for F, S, E in batch])
 
-            wx.GetApp().Yield()
-            prep.SetMessage(GT("Scanning directory {} ...").format(ROOT))
+      except queue.Empty:
+        pass
 
-            count += 1
-            if count >= update_interval:
-              wx.GetApp().Yield()
-              prep.Pulse()
-              count = 0
-
-            for F in FILES:
-              if prep.WasCancelled():
-                prep.Destroy()
-                return False
-
-              count += 1
-              if count >= update_interval:
-                wx.GetApp().Yield()
-                prep.Pulse()
-                count = 0
-
-              # os.path.dirname preserves top level directory
-              ROOT = ROOT.replace(os.path.dirname(P), "").strip(os.sep)
-              F = "{}/{}".format(ROOT, F).strip(os.sep)
-
-              if F not in dir_list[parent_dir]:
-                dir_list[parent_dir].append(F)
-
-    except:
-      prep.Destroy()
-
-      ShowErrorDialog(GT("Could not retrieve file list"), traceback.format_exc())
-
-      return False
-
-    wx.GetApp().Yield()
-    prep.Pulse(GT("Counting Files"))
-
-    file_count = len(file_list)
-
-    count = 0
-    for D in dir_list:
-      for F in dir_list[D]:
-        file_count += 1
+      wx.GetApp().Yield()
+      if scanner.Current:
+        prep.Pulse(GT("Scanning directory {} ...").format(scanner.Current))
 
-        count += 1
-        if count >= update_interval:
-          wx.GetApp().Yield()
-          prep.Pulse()
-          count = 0
+      else:
+        prep.Pulse()
 
+    thread.Join()
     prep.Destroy()
 
-    # Add files to directory list
-    for F in file_list:
-      f_name = os.path.basename(F)
-      f_dir = os.path.dirname(F)
+    logger.debug("Added {} files".format(scanner.Count))
 
-      if f_dir not in dir_list:
-        dir_list[f_dir] = []
+    if result and result[0] not in (True, False):
+      ShowErrorDialog(GT("Could not retrieve file list"), result[0])
 
-      dir_list[f_dir].append(f_name)
-
-    if file_count > warning_threshhold:
-      count_warnmsg = GT("Importing {} files".format(file_count))
-      count_warnmsg = "{}. {}.".format(count_warnmsg, GT("This could take a VERY long time"))
-      count_warnmsg = "{}\n{}".format(count_warnmsg, GT("Are you sure you want to continue?"))
-
-      if not ConfirmationDialog(GetMainWindow(), text=count_warnmsg).Confirmed():
-        return False
+      return False
 
-    return self.AddPaths(dir_list, file_count, showDialog=file_count >= efficiency_threshold)
+    return result == [True]
 
 
   ## Handles event emitted by 'browse' button
@@ -594,6 +578,7 @@ class Page(WizardPage):
     if self.lst_files.GetItemCount():
       if ConfirmationDialog(GetMainWindow(), GT("Confirm"),
             GT("Clear all files?")).Confirmed():
+        self.CancelLoad()
         self.lst_files.DeleteAllItems()
 
 
@@ -610,6 +595,41 @@ class Page(WizardPage):
     return self.LoadPaths(fileList)
 
 
+  ## Adds a batch of files read by \b \e LoadFiles to list
+  #
+  #  Shows missing files when last batch has been added.
+  def OnFilesLoaded(self, event=None):
+    if not event or event.generation != self.load_generation:
+      return
+
+    # Loaded files are already in project, so are not tracked as changes
+    self.lst_files.AddRows(event.rows, track=False)
+
+    for FILENAME, SOURCE, TARGET, FLAGS in event.rows:
+      if FLAGS & FLAG_MISSING:
+        missing = os.path.join(SOURCE, FILENAME)
+        logger.warn(GT("File not found: {}").format(missing))
+        self.load_missing.append(missing)
+
+    if event.count < event.total:
+      self.gauge_load.SetRange(event.total)
+      self.gauge_load.SetValue(event.count)
+      GetMainWindow().SetStatusText(GT("Imported file {} of {}").format(event.count, event.total))
+      return
+
+    missing_files = self.load_missing
+    self.CancelLoad()
+
+    logger.debug("Missing file count: {}".format(len(missing_files)))
+
+    # If files are missing show a message
+    if missing_files:
+      alert = DetailedMessageDialog(GetMainWindow(), GT("Missing Files"),
+          ICON_EXCLAMATION, GT("Could not locate the following files:"),
+          "\n".join(missing_files))
+      alert.ShowModal()
+
+
   ## Handles files & directories added from ui.tree.DirectoryTreePanel object
   #  (self.tree_dirs)
   #
@@ -663,6 +683,8 @@ class Page(WizardPage):
   #  \return
   #      Value of self.lst_files.Reset
   def Reset(self):
+    self.CancelLoad()
+
     return self.lst_files.Reset()
 
 
@@ -682,11 +704,11 @@ class Page(WizardPage):
   #      <b><i>True</i></b> if the data was imported correctly
   def Set(self, data):
     # Clear files list
+    self.CancelLoad()
     self.lst_files.DeleteAllItems()
-    files_data = data.split("\n")
-    if int(files_data[0]):
-      # Get file count from list minus first item "1"
-      files_total = len(files_data)
+    files = [F + (None,) for F in ParseFilesData(data)]
+    if files:
+      files_total = len(files)
 
       # Store missing files here
       missing_files = []
@@ -700,8 +722,8 @@ class Page(WizardPage):
         wx.GetApp().Yield()
         progress.Show()
 
-      current_file = files_total
-      while current_file > 1:
+      # Files are added in batches so progress can be shown
+      for INDEX in range(0, len(files), batch_size):
         if progress and progress.WasCancelled():
           progress.Destroy()
 
@@ -715,30 +737,15 @@ class Page(WizardPage):
 
           return False
 
-        current_file -= 1
-        executable = False
-
-        file_info = files_data[current_file].split(" -> ")
-        absolute_filename = file_info[0]
-
-        if absolute_filename[-1] == "*":
-          # Set executable flag and remove "*"
-          executable = True
-          absolute_filename = absolute_filename[:-1]
-
-        filename = file_info[1]
-        source_dir = absolute_filename[:len(absolute_filename) - len(filename)]
-        target_dir = file_info[2]
-
-        if not self.lst_files.AddFile(filename, source_dir, target_dir, executable):
-          logger.warn(GT("File not found: {}").format(absolute_filename))
-          missing_files.append(absolute_filename)
+        for MISSING in self.lst_files.AddFiles(files[INDEX:INDEX+batch_size]):
+          logger.warn(GT("File not found: {}").format(MISSING))
+          missing_files.append(MISSING)
 
         if progress:
-          update_value = files_total - current_file
+          update_value = min(INDEX + batch_size, len(files))
 
           wx.GetApp().Yield()
-          progress.Update(update_value+1, GT("Imported file {} of {}").format(update_value, files_total))
+          progress.Update(update_value, GT("Imported file {} of {}").format(update_value, len(files)))
 
       if progress:
         progress.Destroy()
@@ -753,3 +760,24 @@ class Page(WizardPage):
         alert.ShowModal()
 
       return True
+
+
+  ## Sets the page's fields without blocking the interface
+  #
+  #  Files are read in a background thread & added to the list in
+  #  batches. Progress is shown under the list while other pages can
+  #  still be edited.
+  #
+  #  \param data
+  #      The text information to parse
+  def SetInBackground(self, data):
+    self.CancelLoad()
+    self.lst_files.DeleteAllItems()
+
+    self.loading = True
+    self.load_missing = []
+    self.gauge_load.SetValue(0)
+    self.gauge_load.Show()
+    self.Layout()
+
+    Thread(self.LoadFiles, data, self.load_generation).Start()